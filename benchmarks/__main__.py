@@ -0,0 +1,46 @@
+"""
+Run the benchmark suite, optionally saving the results and comparing them against a baseline.
+
+usage: python -m benchmarks [-k PATTERN] [--repeat N] [--output results.json] [--baseline baseline.json] [--threshold 0.25]
+
+Exits with status 1 if any benchmark is slower than the baseline by more than the threshold.
+"""
+import argparse
+import sys
+
+import core.creature  # noqa: F401 - must be imported before the combat modules
+import benchmarks.combat  # noqa: F401 - registers the benchmarks
+from benchmarks.runner import (
+    DEFAULT_REPEAT, DEFAULT_THRESHOLD, get_benchmarks, run_benchmarks, save_results, load_results,
+    compare_results, print_comparison, format_time,
+)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Run the combat core benchmarks.')
+    parser.add_argument('-k', dest='pattern', help='only run benchmarks whose name contains this')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('-o', '--output', help='save the results as JSON')
+    parser.add_argument('-b', '--baseline', help='compare against results saved by a previous run')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='flag benchmarks that are slower than the baseline by more than this fraction')
+    args = parser.parse_args()
+
+    baseline = load_results(args.baseline) if args.baseline is not None else None
+
+    def report(result):
+        print(f'{result.name:<36} {format_time(result.best):>10} best, {format_time(result.median):>10} median')
+
+    results = run_benchmarks(get_benchmarks(args.pattern), args.repeat, report=report)
+    if args.output is not None:
+        save_results(args.output, results)
+
+    if baseline is not None:
+        print()
+        regressions = print_comparison(compare_results(results, baseline), args.threshold)
+        if len(regressions) > 0:
+            print(f'\n{len(regressions)} regression(s) beyond {args.threshold:.0%}')
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
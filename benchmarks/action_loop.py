@@ -0,0 +1,64 @@
+"""
+Benchmark for the ActionLoop priority queue, with large numbers of entities.
+
+Every resolved action schedules a follow-up action, and half of them also reschedule the action of some other entity,
+which cancels its pending action. Usage: python -m benchmarks.action_loop [resolves] [entity counts...]
+"""
+from __future__ import annotations
+
+import sys
+import time
+from typing import Optional, Sequence, List
+
+from core.action import Action, ActionLoop, Entity
+from core.rng import RandomStream
+
+DEFAULT_ENTITY_COUNTS = (100, 1000, 10000)
+DEFAULT_RESOLVES = 5000
+
+class _BenchEntity(Entity):
+    pass
+
+class _BenchAction(Action):
+    def __init__(self, windup: int, entities: List[Entity]):
+        self.windup = windup
+        self.entities = entities
+
+    def get_windup_duration(self) -> float:
+        return self.windup
+
+    def resolve(self) -> Optional[Action]:
+        rng = self.loop.rng
+        if rng.random() < 0.5:
+            other = self.entities[rng.randrange(len(self.entities))]
+            if other is not self.owner:
+                other.set_current_action(_BenchAction(rng.randint(50, 150), self.entities))
+        return _BenchAction(rng.randint(50, 150), self.entities)
+
+def create_action_loop(num_entities: int, seed: int = 0) -> ActionLoop:
+    """An action loop in which every entity has an action scheduled"""
+    loop = ActionLoop(RandomStream(seed))
+    entities = []
+    for _ in range(num_entities):
+        entity = _BenchEntity()
+        entity.set_action_loop(loop)
+        entity.set_current_action(_BenchAction(loop.rng.randint(50, 150), entities))
+        entities.append(entity)
+    return loop
+
+def run_action_loop(num_entities: int, resolves: int, seed: int = 0) -> float:
+    """Returns the mean time per resolved action, in seconds"""
+    loop = create_action_loop(num_entities, seed)
+    start = time.perf_counter()
+    for _ in range(resolves):
+        loop.resolve_next()
+    return (time.perf_counter() - start) / resolves
+
+def main(resolves: int = DEFAULT_RESOLVES, entity_counts: Sequence[int] = DEFAULT_ENTITY_COUNTS) -> None:
+    for num_entities in entity_counts:
+        elapsed = run_action_loop(num_entities, resolves)
+        print(f'{num_entities:>6} entities: {elapsed*1e6:8.1f} us per action')
+
+if __name__ == '__main__':
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*args[:1], *([args[1:]] if len(args) > 1 else []))
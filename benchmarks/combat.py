@@ -0,0 +1,131 @@
+"""
+Benchmarks for the combat core, registered with benchmarks.runner.
+
+Every benchmark is seeded, so each run does the same work.
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, List
+
+from core.action import ActionLoop
+from core.creature import Creature
+from core.creature.pool import CreaturePool
+from core.dice import dice
+from core.contest import ContestResult, ContestModifier, SKILL_AXE, get_roll_table, get_keep_highest_table
+from core.combat.damage import ArmorTable
+from core.combat.melee import join_melee_combat
+from core.combat.resolver import MeleeCombatResolver
+from core.rng import RandomStream
+from core.sim.fight import create_combatant, run_fight
+
+from benchmarks.runner import benchmark
+from benchmarks.action_loop import create_action_loop
+
+from defines.units.barbarians import CREATURE_ORC_BARBARIAN
+from defines.units.wildalliance import CREATURE_GNOLL_WARRIOR, CREATURE_MINOTAUR_CHAMPION
+
+SEED = 0
+
+def _create_melee(template_a, template_b, seed: int = SEED) -> List[Creature]:
+    rng = RandomStream(seed)
+    loop = ActionLoop(rng)
+    combatants = [ create_combatant(template, rng) for template in (template_a, template_b) ]
+    for creature in combatants:
+        creature.set_action_loop(loop)
+    join_melee_combat(*combatants)
+    return combatants
+
+## Dice and Contests
+
+@benchmark('dice.roll', number=10000)
+def bench_dice_roll() -> Callable[[], Any]:
+    pool = dice(3, 6) + 2
+    rng = RandomStream(SEED)
+    return lambda: pool.get_roll_result(rng)
+
+@benchmark('dice.roll_many', number=100)
+def bench_dice_roll_many() -> Callable[[], Any]:
+    pool = dice(3, 6) + 2
+    rng = RandomStream(SEED).numpy()
+    return lambda: pool.roll_many(1000, rng)
+
+# the expression MeleeAttack.damage evaluates every time the AI looks at an attack
+@benchmark('dice.arithmetic', number=10000)
+def bench_dice_arithmetic() -> Callable[[], Any]:
+    pool = dice(1,10) + dice(1,3)
+    return lambda: (pool + 2).mean()
+
+@benchmark('contest.roll_table', number=20)
+def bench_roll_table() -> Callable[[], Any]:
+    def build_tables():
+        get_roll_table.cache_clear()
+        get_keep_highest_table.cache_clear()
+        for bonus_dice in range(6):
+            get_roll_table(bonus_dice)
+    return build_tables
+
+@benchmark('contest.result', number=5000)
+def bench_contest_result() -> Callable[[], Any]:
+    creature, _ = _create_melee(CREATURE_ORC_BARBARIAN, CREATURE_GNOLL_WARRIOR)
+    modifier = ContestModifier(2)
+    return lambda: ContestResult(creature, SKILL_AXE, modifier)
+
+## Creatures
+
+@benchmark('creature.spawn', number=500)
+def bench_creature_spawn() -> Callable[[], Any]:
+    rng = RandomStream(SEED)
+    return lambda: Creature(CREATURE_MINOTAUR_CHAMPION, rng=rng)
+
+@benchmark('creature.pool_acquire', number=500)
+def bench_creature_pool_acquire() -> Callable[[], Any]:
+    rng = RandomStream(SEED)
+    pool = CreaturePool()
+    pool.release(Creature(CREATURE_MINOTAUR_CHAMPION, rng=rng))
+    def acquire():
+        pool.release(pool.acquire(CREATURE_MINOTAUR_CHAMPION, rng))
+    return acquire
+
+## Melee
+
+@benchmark('armor.get_wounds[1000]', number=200)
+def bench_armor_get_wounds() -> Callable[[], Any]:
+    _, defender = _create_melee(CREATURE_ORC_BARBARIAN, CREATURE_GNOLL_WARRIOR)
+    table = ArmorTable(defender)
+    rng = RandomStream(SEED).numpy()
+    damage = rng.integers(1, 13, 1000)
+    armpen = rng.integers(0, 5, 1000)
+    hitloc = rng.integers(0, len(list(defender.get_bodyparts())), 1000)
+    damage_mult = rng.choice([0.5, 1.0], 1000)
+    return lambda: table.get_wounds(damage, armpen, hitloc, damage_mult)
+
+# minotaur champions are tough enough to take a few hundred attacks without the fight ending
+@benchmark('resolver.attack', number=200)
+def bench_resolver_attack() -> Callable[[], Any]:
+    attacker, defender = _create_melee(CREATURE_MINOTAUR_CHAMPION, CREATURE_MINOTAUR_CHAMPION)
+    def resolve_attack():
+        resolver = MeleeCombatResolver(attacker, defender)
+        if resolver.generate_attack_results():
+            resolver.resolve_damage()
+    return resolve_attack
+
+@benchmark('mind.next_combat_action', number=500)
+def bench_next_combat_action() -> Callable[[], Any]:
+    creature, _ = _create_melee(CREATURE_ORC_BARBARIAN, CREATURE_GNOLL_WARRIOR)
+    return creature.mind.next_combat_action
+
+## Action Loop
+
+def _bench_action_loop(num_entities: int) -> Callable[[], Any]:
+    return create_action_loop(num_entities, SEED).resolve_next
+
+for _num_entities in (2, 100, 10000):
+    benchmark(f'action_loop.resolve_next[{_num_entities}]', number=2000)(
+        lambda num_entities=_num_entities: _bench_action_loop(num_entities)
+    )
+
+## Fights
+
+@benchmark('arena.fight', number=5)
+def bench_arena_fight() -> Callable[[], Any]:
+    return lambda: run_fight(CREATURE_ORC_BARBARIAN, CREATURE_GNOLL_WARRIOR, RandomStream(SEED))
@@ -0,0 +1,162 @@
+"""
+A minimal benchmark runner, in the style of asv.
+
+A benchmark is a setup function that prepares its state and returns the callable to be timed. The setup is run once
+per repeat, then the callable is timed over a number of calls, so that the per-call time does not include the setup.
+Results can be saved as JSON and compared against a stored baseline to flag regressions.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import platform
+import statistics
+import sys
+import time
+from typing import Any, Callable, Iterable, List, Mapping, MutableMapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+RESULTS_VERSION = 1
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25  # a benchmark that is more than this fraction slower than the baseline is a regression
+
+class Benchmark(NamedTuple):
+    name: str
+    setup: Callable[[], Callable[[], Any]]
+    number: int  # calls timed per repeat
+
+_registry: MutableMapping[str, Benchmark] = {}
+
+def benchmark(name: str, number: int = 1) -> Callable:
+    """Decorator that registers a benchmark setup function"""
+    def register(setup: Callable[[], Callable[[], Any]]) -> Callable[[], Callable[[], Any]]:
+        if name in _registry:
+            raise ValueError(f'duplicate benchmark: {name}')
+        _registry[name] = Benchmark(name, setup, number)
+        return setup
+    return register
+
+def get_benchmarks(pattern: Optional[str] = None) -> Sequence[Benchmark]:
+    return [ bench for name, bench in _registry.items() if pattern is None or pattern in name ]
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    number: int
+    times: Sequence[float]  # mean seconds per call, for each repeat
+
+    @property
+    def best(self) -> float:
+        return min(self.times)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.times)
+
+    def to_json(self) -> Mapping[str, Any]:
+        return { 'number': self.number, 'times': list(self.times), 'best': self.best, 'median': self.median }
+
+    @classmethod
+    def from_json(cls, name: str, data: Mapping[str, Any]) -> BenchmarkResult:
+        return cls(name, data['number'], tuple(data['times']))
+
+def run_benchmark(bench: Benchmark, repeat: int = DEFAULT_REPEAT) -> BenchmarkResult:
+    times = []
+    for _ in range(repeat):
+        func = bench.setup()
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for _ in range(bench.number):
+                func()
+            elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        times.append(elapsed / bench.number)
+    return BenchmarkResult(bench.name, bench.number, tuple(times))
+
+def run_benchmarks(benchmarks: Iterable[Benchmark], repeat: int = DEFAULT_REPEAT,
+                   *, report: Optional[Callable[[BenchmarkResult], None]] = None) -> Sequence[BenchmarkResult]:
+    results = []
+    for bench in benchmarks:
+        result = run_benchmark(bench, repeat)
+        if report is not None:
+            report(result)
+        results.append(result)
+    return results
+
+## Results Files
+
+def get_environment() -> Mapping[str, str]:
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+def save_results(path: str, results: Iterable[BenchmarkResult]) -> None:
+    data = {
+        'version': RESULTS_VERSION,
+        'timestamp': time.time(),
+        'environment': get_environment(),
+        'benchmarks': { result.name : result.to_json() for result in results },
+    }
+    with open(path, 'w') as file:
+        json.dump(data, file, indent=2)
+
+def load_results(path: str) -> Mapping[str, BenchmarkResult]:
+    with open(path) as file:
+        data = json.load(file)
+    if data.get('version') != RESULTS_VERSION:
+        raise ValueError(f'unsupported benchmark results version: {data.get("version")}')
+    return { name : BenchmarkResult.from_json(name, value) for name, value in data['benchmarks'].items() }
+
+## Comparison
+
+class Comparison(NamedTuple):
+    name: str
+    baseline: float  # best time per call, in seconds
+    current: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current / self.baseline if self.baseline > 0 else float('inf')
+
+    def is_regression(self, threshold: float = DEFAULT_THRESHOLD) -> bool:
+        return self.ratio > 1.0 + threshold
+
+    def is_improvement(self, threshold: float = DEFAULT_THRESHOLD) -> bool:
+        return self.ratio < 1.0/(1.0 + threshold)
+
+def compare_results(results: Iterable[BenchmarkResult], baseline: Mapping[str, BenchmarkResult]) -> Sequence[Comparison]:
+    """Compare the best time of each benchmark that is also in the baseline.
+    The best time is used since it is the least sensitive to noise from the rest of the system."""
+    return [
+        Comparison(result.name, baseline[result.name].best, result.best)
+        for result in results if result.name in baseline
+    ]
+
+def format_time(seconds: float) -> str:
+    for unit, scale in (('s', 1.0), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds/scale:.2f}{unit}'
+    return f'{seconds/1e-9:.0f}ns'
+
+def print_comparison(comparisons: Sequence[Comparison], threshold: float = DEFAULT_THRESHOLD, file=sys.stdout) -> List[Comparison]:
+    """Print the comparison and return the regressions"""
+    regressions = []
+    for comp in comparisons:
+        if comp.is_regression(threshold):
+            status = 'REGRESSION'
+            regressions.append(comp)
+        elif comp.is_improvement(threshold):
+            status = 'improved'
+        else:
+            status = ''
+        print(
+            f'{comp.name:<36} {format_time(comp.baseline):>10} -> {format_time(comp.current):>10} '
+            f'{comp.ratio:6.2f}x {status}', file=file
+        )
+    return regressions
@@ -0,0 +1,38 @@
+"""
+Run the exactness checks, which compare the closed-form and batched paths of the combat core against the code that
+they stand in for.
+
+usage: python -m checks [-k PATTERN] [--seed N] [--max-mismatches N]
+
+Exits with status 1 if any check finds a mismatch.
+"""
+import argparse
+import sys
+
+import core.creature  # noqa: F401 - must be imported before the combat modules
+import checks.contest  # noqa: F401 - registers the checks
+import checks.damage  # noqa: F401
+from checks.runner import DEFAULT_SEED, get_checks, run_checks
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog='python -m checks', description='Run the combat core exactness checks.')
+    parser.add_argument('-k', dest='pattern', help='only run checks whose name contains this')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--max-mismatches', type=int, default=10, help='the most mismatches to print for each check')
+    args = parser.parse_args()
+
+    def report(result):
+        status = 'ok' if result.passed else f'{len(result.mismatches)} mismatch(es)'
+        print(f'{result.name:<36} {status:<20} {result.elapsed:6.1f}s')
+        for mismatch in result.mismatches[:args.max_mismatches]:
+            print(f'    {mismatch}')
+
+    results = run_checks(get_checks(args.pattern), args.seed, report=report)
+    failed = [ result for result in results if not result.passed ]
+    if len(failed) > 0:
+        print(f'\n{len(failed)} check(s) failed (seed: {args.seed})')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,95 @@
+"""
+Checks for the exact contest distributions, against sampled contests.
+"""
+from __future__ import annotations
+
+import math
+from collections import Counter
+from typing import TYPE_CHECKING, List, Mapping, Sequence
+
+from core.action import ActionLoop
+from core.contest import (
+    Contest, ContestResult, DifficultyGrade, OpposedResult, UnopposedResult, ContestOutcome, SKILL_EVADE,
+)
+from core.rng import RandomStream
+from core.sim.fight import create_combatant
+from core.sim.units import get_unit_templates
+
+from checks.runner import check
+
+if TYPE_CHECKING:
+    from core.creature import Creature
+
+SAMPLE_STRIDE = 5  # use every nth unit template
+SAMPLES = 20000  # contests sampled for each case
+MAX_DEVIATION = 5.0  # in standard errors of the sampled frequency
+
+def _get_creatures(seed: int) -> Sequence[Creature]:
+    rng = RandomStream(seed)
+    loop = ActionLoop(rng)
+    creatures = [ create_combatant(template, rng) for template in get_unit_templates()[::SAMPLE_STRIDE] ]
+    for creature in creatures:
+        creature.set_action_loop(loop)
+    return creatures
+
+def _get_best_combat_test(creature: Creature) -> Contest:
+    attacks = creature.get_melee_attacks()
+    return max((attack.combat_test for attack in attacks), key=lambda contest: creature.get_skill_level(contest).value)
+
+@check('contest.opposed_outcomes')
+def check_opposed_outcomes(seed: int) -> List[str]:
+    """Contest.get_opposed_outcomes() against the outcomes of OpposedResults rolled between unit templates, with the
+    difficulty grades applied to either side"""
+    creatures = _get_creatures(seed)
+    grades = list(DifficultyGrade)
+    mismatches = []
+    for index, (protagonist, antagonist) in enumerate(zip(creatures, creatures[1:] + creatures[:1])):
+        pro_contest = _get_best_combat_test(protagonist)
+        ant_contest = _get_best_combat_test(antagonist) if index % 2 == 0 else SKILL_EVADE
+        pro_modifier = grades[index % len(grades)].to_modifier()
+        ant_modifier = grades[(index * 2 + 1) % len(grades)].to_modifier()
+
+        expected = Contest.get_opposed_outcomes(
+            protagonist, pro_contest, antagonist, ant_contest, pro_modifier - ant_modifier,
+        )
+        sampled = Counter()
+        for _ in range(SAMPLES):
+            result = OpposedResult(
+                ContestResult(protagonist, pro_contest, pro_modifier), ContestResult(antagonist, ant_contest, ant_modifier),
+            )
+            sampled[ContestOutcome(result.success, result.crit_level)] += 1
+
+        case = f'{protagonist} {pro_contest.name}{pro_modifier.contest:+d} vs {antagonist} {ant_contest.name}{ant_modifier.contest:+d}'
+        mismatches.extend(_compare_outcomes(case, expected, sampled))
+    return mismatches
+
+@check('contest.unopposed_outcomes')
+def check_unopposed_outcomes(seed: int) -> List[str]:
+    """Contest.get_unopposed_outcomes() against the outcomes of UnopposedResults rolled by unit templates, with a
+    difficulty grade applied and the target offset as MeleeCombatResolver does"""
+    grades = list(DifficultyGrade)
+    mismatches = []
+    for index, protagonist in enumerate(_get_creatures(seed)):
+        contest = _get_best_combat_test(protagonist)
+        modifier = grades[index % len(grades)].to_modifier()
+        target = UnopposedResult.DEFAULT_TARGET + grades[(index * 2 + 1) % len(grades)].contest_mod
+
+        expected = contest.get_unopposed_outcomes(protagonist, target, modifier)
+        sampled = Counter()
+        for _ in range(SAMPLES):
+            result = UnopposedResult(ContestResult(protagonist, contest, modifier), target)
+            sampled[ContestOutcome(result.success, result.crit_level if result.success else 0)] += 1
+
+        case = f'{protagonist} {contest.name}{modifier.contest:+d} vs {target}'
+        mismatches.extend(_compare_outcomes(case, expected, sampled))
+    return mismatches
+
+def _compare_outcomes(case: str, expected: Mapping[ContestOutcome, float], sampled: Counter) -> List[str]:
+    mismatches = []
+    for outcome in sorted(set(expected) | set(sampled)):
+        p = expected.get(outcome, 0.0)
+        frequency = sampled[outcome] / SAMPLES
+        tolerance = MAX_DEVIATION * math.sqrt(p * (1.0 - p) / SAMPLES) + 1.0 / SAMPLES
+        if abs(frequency - p) > tolerance:
+            mismatches.append(f'{case}: {outcome} exact {p:.4f}, sampled {frequency:.4f}')
+    return mismatches
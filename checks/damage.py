@@ -0,0 +1,53 @@
+"""
+Checks for the batched damage paths, against applying each hit to a creature.
+"""
+from __future__ import annotations
+
+from typing import List
+
+from core.action import ActionLoop
+from core.creature.pool import CreaturePool
+from core.combat.damage import ArmorTable
+from core.rng import RandomStream
+from core.sim.fight import create_combatant
+from core.sim.units import get_unit_templates
+
+from checks.runner import check
+
+HITS = 500  # random hits against each unit template
+
+@check('damage.armor_table')
+def check_armor_table(seed: int) -> List[str]:
+    """ArmorTable.get_wounds() against the wounds that BodyPart.apply_damage() returns, for random hits against every
+    unit template, including negative damage and armpen and the fractional multipliers of parries and blocks"""
+    rng = RandomStream(seed).numpy()
+    pool = CreaturePool()
+    mismatches = []
+    for index, template in enumerate(get_unit_templates()):
+        # every hit is applied to a freshly spawned creature, with the same loadout rolled from the same stream
+        def spawn():
+            stream = RandomStream(seed, (index,))
+            creature = create_combatant(template, stream, pool)
+            creature.set_action_loop(ActionLoop(stream))
+            return creature
+
+        creature = spawn()
+        nbodyparts = len(list(creature.get_bodyparts()))
+        damage = rng.integers(-3, 25, HITS)
+        armpen = rng.integers(-8, 12, HITS)
+        hitloc = rng.integers(0, nbodyparts, HITS)
+        damage_mult = rng.choice([0.0, 0.25, 1/3, 0.5, 2/3, 1.0], HITS)
+        wounds = ArmorTable(creature).get_wounds(damage, armpen, hitloc, damage_mult)
+        pool.release(creature)
+
+        for i in range(HITS):
+            creature = spawn()
+            bodypart = list(creature.get_bodyparts())[hitloc[i]]
+            wound = bodypart.apply_damage(int(damage[i]) * float(damage_mult[i]), int(armpen[i]) * float(damage_mult[i]))
+            pool.release(creature)
+            if wound != wounds[i]:
+                mismatches.append(
+                    f'{template.name} {bodypart}: damage={damage[i]} armpen={armpen[i]} mult={damage_mult[i]:.3f} '
+                    f'apply_damage={wound!r} get_wounds={float(wounds[i])!r}'
+                )
+    return mismatches
@@ -0,0 +1,52 @@
+"""
+A minimal runner for exactness checks.
+
+A check compares one of the closed-form or batched paths of the combat core against the code that it stands in for,
+over seeded random inputs, and returns a description of each mismatch that it finds. Given the same seed, a check
+always looks at the same inputs.
+"""
+from __future__ import annotations
+
+import time
+from typing import Callable, Iterable, MutableMapping, NamedTuple, Optional, Sequence
+
+DEFAULT_SEED = 0
+
+class Check(NamedTuple):
+    name: str
+    run: Callable[[int], Sequence[str]]  # given a seed, returns the mismatches found
+
+_registry: MutableMapping[str, Check] = {}
+
+def check(name: str) -> Callable:
+    """Decorator that registers a check"""
+    def register(run: Callable[[int], Sequence[str]]) -> Callable[[int], Sequence[str]]:
+        if name in _registry:
+            raise ValueError(f'duplicate check: {name}')
+        _registry[name] = Check(name, run)
+        return run
+    return register
+
+def get_checks(pattern: Optional[str] = None) -> Sequence[Check]:
+    return [ item for name, item in _registry.items() if pattern is None or pattern in name ]
+
+class CheckResult(NamedTuple):
+    name: str
+    mismatches: Sequence[str]
+    elapsed: float  # in seconds
+
+    @property
+    def passed(self) -> bool:
+        return len(self.mismatches) == 0
+
+def run_checks(checks: Iterable[Check], seed: int = DEFAULT_SEED,
+               *, report: Optional[Callable[[CheckResult], None]] = None) -> Sequence[CheckResult]:
+    results = []
+    for item in checks:
+        start = time.perf_counter()
+        mismatches = item.run(seed)
+        result = CheckResult(item.name, mismatches, time.perf_counter() - start)
+        if report is not None:
+            report(result)
+        results.append(result)
+    return results
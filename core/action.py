@@ -12,12 +12,17 @@ may be modified as the sequence resolves, for example, to append new actions to
 from __future__ import annotations
 
 import heapq
+from random import Random
 from enum import Enum
 from functools import total_ordering
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING, Optional, Iterable, MutableMapping, List, Any
+from typing import TYPE_CHECKING, Optional, Iterable, MutableMapping, List, Any, Callable
+
+from core.rng import RandomStream, get_default_stream
+from core.events import EventBus, get_default_bus
+
 if TYPE_CHECKING:
-    pass
+    from core.profiling import PhaseProfiler
 
 
 class ActionStatus(Enum):
@@ -117,12 +122,35 @@ class Action(ABC):
 #     def setup_action(self, owner: 'Entity', loop: 'ActionLoop') -> None:
 
 class Entity:
+    __slots__ = ()
+
     loop: ActionLoop = None
 
     @property
     def tiebreaker_priority(self) -> float:
         return 0
 
+    @property
+    def rng(self) -> Random:
+        """The random stream used for everything this entity does"""
+        if self.loop is not None:
+            return self.loop.rng
+        return get_default_stream()
+
+    @property
+    def events(self) -> EventBus:
+        """The event bus that this entity reports to"""
+        if self.loop is not None:
+            return self.loop.events
+        return get_default_bus()
+
+    @property
+    def profiler(self) -> Optional[PhaseProfiler]:
+        """The profiler that times what this entity does, if profiling is enabled"""
+        if self.loop is not None:
+            return self.loop.profiler
+        return None
+
     def set_action_loop(self, loop: Optional[ActionLoop]):
         if self.loop != loop:
             if self.loop is not None:
@@ -144,34 +172,53 @@ class Entity:
 # ActionLoop
 @total_ordering
 class ActionQueueItem:
-    windup: int
+    __slots__ = ('end_tick', 'priority', 'action', 'cancelled')
+
+    end_tick: int  # the tick at which the windup completes
+    priority: float  # the owner's tiebreaker priority when the action was scheduled
     action: Action
+    cancelled: bool
 
-    def __init__(self, windup: int, action: Action):
-        self.windup = windup
+    def __init__(self, end_tick: int, priority: float, action: Action):
+        self.end_tick = end_tick
+        self.priority = priority
         self.action = action
+        self.cancelled = False
 
-    def elapse(self, amount: int) -> None:
-        self.windup -= amount
-
+    ## since every queued item is compared at the same tick, ordering by end tick is the same as ordering by remaining windup
+    ## the sort key must not change while the item is queued, so the priority is the one stored on the item
     @property
     def _sort_key(self) -> Any:
-        return self.windup, -self.action.owner.tiebreaker_priority, self.action.start_tick
+        return self.end_tick, -self.priority, self.action.start_tick
 
     def __eq__(self, other: ActionQueueItem) -> bool:
         return self._sort_key == other._sort_key
     def __lt__(self, other: ActionQueueItem) -> bool:
         return self._sort_key < other._sort_key
 
+## Cancelled items are left in the queue and skipped when they reach the front (lazy deletion).
+## Once they make up more than this fraction of the queue, it is compacted to bound its size.
+_MAX_CANCELLED_FRACTION = 0.5
+
 class ActionLoop:
     entity_actions: MutableMapping[Entity, Optional[Action]]
-    queue_items: MutableMapping[Action, ActionQueueItem]
+    queue_items: MutableMapping[Action, ActionQueueItem]  # only the items that have not been cancelled
     action_queue: List[ActionQueueItem]
-    def __init__(self):
+    conditional_actions: MutableMapping[Action, None]  # queued actions that override can_resolve(), in queue order
+    def __init__(self, rng: Optional[RandomStream] = None, events: Optional[EventBus] = None,
+                 profiler: Optional[PhaseProfiler] = None):
+        self.rng = rng or RandomStream()
+        self.events = events or EventBus()
+        self.profiler = profiler  # None unless profiling is enabled
+
+        ## if set, only the conditional actions of the entities this returns are rechecked after an entity's action
+        ## resolves, instead of every conditional action in the loop
+        self.recheck_scope: Optional[Callable[[Entity], Iterable[Entity]]] = None
         self.elapsed = 0  # in TU
         self.entity_actions = {}
         self.action_queue = []
         self.queue_items = {}
+        self.conditional_actions = {}
 
     def get_tick(self) -> int:
         return self.elapsed
@@ -196,7 +243,10 @@ class ActionLoop:
         return self.entity_actions[entity] is None
 
     def queued_action_count(self) -> int:
-        return len(self.action_queue)
+        return len(self.queue_items)
+
+    def get_queued_actions(self) -> Iterable[Action]:
+        return (item.action for item in self.action_queue if not item.cancelled)
 
     def get_current_action(self, entity: Entity) -> Optional[Action]:
         return self.entity_actions[entity]
@@ -204,7 +254,7 @@ class ActionLoop:
     def get_remaining_windup(self, action: Action) -> Optional[float]:
         item = self.queue_items.get(action, None)
         if item is not None:
-            return item.windup
+            return item.end_tick - self.elapsed
         return None
 
     def schedule_action(self, entity: Entity, action: Action) -> None:
@@ -216,9 +266,11 @@ class ActionLoop:
         windup = action.get_windup_duration()
 
         self.entity_actions[entity] = action
-        item = ActionQueueItem(round(windup), action)
+        item = ActionQueueItem(self.elapsed + round(windup), entity.tiebreaker_priority, action)
         self.queue_items[action] = item
         heapq.heappush(self.action_queue, item)
+        if type(action).can_resolve is not Action.can_resolve:
+            self.conditional_actions[action] = None
 
         action.status = ActionStatus.Pending
         action.started()
@@ -231,45 +283,77 @@ class ActionLoop:
         if entity is not None and self.entity_actions[entity] == action:
             self.entity_actions[entity] = None
         item = self.queue_items.pop(action)
-        self.action_queue.remove(item)
-        heapq.heapify(self.action_queue)
+        item.cancelled = True
+        self.conditional_actions.pop(action, None)
         action.status = ActionStatus.Inactive
 
+        if len(self.action_queue) - len(self.queue_items) > len(self.action_queue) * _MAX_CANCELLED_FRACTION:
+            self.action_queue = [ item for item in self.action_queue if not item.cancelled ]
+            heapq.heapify(self.action_queue)
+
+    def _pop_next_item(self) -> Optional[ActionQueueItem]:
+        while len(self.action_queue) > 0:
+            item = heapq.heappop(self.action_queue)
+            if not item.cancelled:
+                return item
+        return None
+
     def resolve_next(self) -> None:
-        if len(self.action_queue) == 0:
+        item = self._pop_next_item()
+        if item is None:
             return  # nothing scheduled
 
-        item = heapq.heappop(self.action_queue)
-        elapsed, current_action = item.windup, item.action
-        del self.queue_items[current_action]
-        self.elapsed += elapsed
-
-        # first, update the windup counters of all other actions
-        # since this does not change the ordering, this can be done by efficiently rebuilding the queue
-        for item in self.action_queue:
-            item.elapse(elapsed)
-
-        # next, resolve the current action
-        entity = current_action.owner
-        current_action.status = ActionStatus.Resolving
-        if current_action.can_resolve():
-            next_action = current_action.resolve()
-        else:
-            next_action = current_action.resolve_failed()
-        current_action.status = ActionStatus.Resolved
-
-        force_next = current_action.force_next
-        if force_next is not None:
-            force_next.set_force_next(next_action)
-            next_action = force_next
-
-        self.entity_actions[entity] = None  # this must come before schedule_action() and after the current action has resolved
-        if next_action is not None:
-            self.schedule_action(entity, next_action)
-
-        # recheck can_resolve on all other actions
-        for action in list(self.queue_items.keys()):
-            if not action.can_resolve():
-                self.cancel_action(action)
+        ## profiling is checked explicitly rather than with profile_phase(), as this is the hottest path
+        profiler = self.profiler
+        if profiler is not None:
+            depth = profiler.get_depth()
+            profiler.push('loop.resolve_next')
+
+        try:
+            current_action = item.action
+            del self.queue_items[current_action]
+            self.conditional_actions.pop(current_action, None)
+            self.elapsed = item.end_tick
+
+            # resolve the current action
+            entity = current_action.owner
+            current_action.status = ActionStatus.Resolving
+            if profiler is not None:
+                profiler.push('action.' + type(current_action).__name__)
+            if current_action.can_resolve():
+                next_action = current_action.resolve()
+            else:
+                next_action = current_action.resolve_failed()
+            if profiler is not None:
+                profiler.pop()
+            current_action.status = ActionStatus.Resolved
+
+            force_next = current_action.force_next
+            if force_next is not None:
+                force_next.set_force_next(next_action)
+                next_action = force_next
+
+            self.entity_actions[entity] = None  # this must come before schedule_action() and after the current action has resolved
+            if next_action is not None:
+                self.schedule_action(entity, next_action)
+
+            # recheck can_resolve on all other actions (the rest can always resolve)
+            if profiler is not None:
+                profiler.push('loop.recheck')
+            if self.recheck_scope is None:
+                recheck = list(self.conditional_actions.keys())
+            else:
+                recheck = [
+                    action for other in self.recheck_scope(entity)
+                    if (action := self.entity_actions.get(other)) in self.conditional_actions
+                ]
+            for action in recheck:
+                if not action.can_resolve():
+                    self.cancel_action(action)
+            if profiler is not None:
+                profiler.pop()  # loop.recheck
+        finally:
+            if profiler is not None:
+                profiler.unwind(depth)  # loop.resolve_next, and any phases left open if an action raised
 
 # MeleeEngagement
\ No newline at end of file
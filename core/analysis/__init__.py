@@ -0,0 +1,8 @@
+from core.analysis.markov import FightEstimate, estimate_fight, estimate_matchup
+
+SAMPLE_STRIDE = 4  # the comparison scripts use every nth unit template
+
+def get_decisive_share(wins_a: float, wins_b: float) -> float:
+    """Fights that time out are draws in the simulation, so compare the share of decisive fights won"""
+    total = wins_a + wins_b
+    return wins_a / total if total > 0 else 0.5
@@ -0,0 +1,46 @@
+"""
+Compare the analytic fight estimates against simulated fights, for a round-robin between a sample of the unit templates.
+
+usage: python -m core.analysis [fights per matchup] [seed]
+"""
+import sys
+import time
+
+from core.analysis import SAMPLE_STRIDE, estimate_matchup, get_decisive_share
+from core.sim import run_tournament
+from core.sim.units import get_unit_templates
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    templates = get_unit_templates()[::SAMPLE_STRIDE]
+    start = time.perf_counter()
+    results = run_tournament(templates, n, seed)
+    sim_elapsed = time.perf_counter() - start
+    seed = results[0].seed
+
+    index = { template.name : i for i, template in enumerate(templates) }
+    errors = []
+    est_elapsed = 0.0
+    for result in results:
+        i, j = index[result.names[0]], index[result.names[1]]
+        start = time.perf_counter()
+        estimate = estimate_matchup(templates[i], templates[j], n, seed, key=(i, j))
+        est_elapsed += time.perf_counter() - start
+
+        simulated = get_decisive_share(*result.wins)
+        estimated = get_decisive_share(*estimate.win_chance)
+        errors.append(abs(estimated - simulated))
+        print(
+            f'{result.names[0]:<24} vs {result.names[1]:<24} '
+            f'sim {result.win_rate(0):6.1%} / {result.win_rate(1):6.1%} ({result.draws:3d} draws) '
+            f'est {estimate.win_chance[0]:6.1%} / {estimate.win_chance[1]:6.1%} '
+            f'decisive share {simulated:6.1%} vs {estimated:6.1%}'
+        )
+
+    fights = n * len(results)
+    print()
+    print(f'{len(results)} matchups, {fights} fights (seed: {seed})')
+    print(f'simulated in {sim_elapsed:.1f}s, estimated in {est_elapsed:.1f}s ({est_elapsed/fights*1000:.1f}ms per loadout)')
+    print(f'mean absolute error in decisive share: {sum(errors)/len(errors):.1%}, max: {max(errors):.1%}')
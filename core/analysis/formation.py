@@ -0,0 +1,53 @@
+"""
+Compare one on one formation fights against simulated fights, for a round-robin between a sample of the unit templates.
+
+Each formation fight is between two formations of one soldier, with the loadouts that run_fight() rolls for the same
+stream, so the differences come from what FormationMelee leaves out.
+
+usage: python -m core.analysis.formation [fights per matchup] [seed]
+"""
+import sys
+import time
+
+from core.analysis import SAMPLE_STRIDE, get_decisive_share
+from core.rng import RandomStream
+from core.sim import run_tournament
+from core.sim.units import get_unit_templates
+from core.world.formation import FormationTemplate, FormationMelee
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    templates = get_unit_templates()[::SAMPLE_STRIDE]
+    results = run_tournament(templates, n, seed)
+    seed = results[0].seed
+
+    index = { template.name : i for i, template in enumerate(templates) }
+    errors = []
+    start = time.perf_counter()
+    for result in results:
+        i, j = index[result.names[0]], index[result.names[1]]
+        wins = [0, 0]
+        for k in range(n):
+            # the same substream as fight k of the matchup in run_tournament()
+            rng = RandomStream(seed, (i, j, k))
+            formations = [ FormationTemplate(template.name, template).create(1, rng) for template in (templates[i], templates[j]) ]
+            winner = FormationMelee(*formations, rng).run()
+            if winner is not None:
+                wins[winner] += 1
+
+        simulated = get_decisive_share(*result.wins)
+        formation = get_decisive_share(*wins)
+        errors.append(abs(formation - simulated))
+        print(
+            f'{result.names[0]:<24} vs {result.names[1]:<24} '
+            f'sim {result.win_rate(0):6.1%} / {result.win_rate(1):6.1%} ({result.draws:3d} draws) '
+            f'formation {wins[0]/n:6.1%} / {wins[1]/n:6.1%} '
+            f'decisive share {simulated:6.1%} vs {formation:6.1%}'
+        )
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(f'{len(results)} matchups, {n * len(results)} fights (seed: {seed}), formations fought in {elapsed:.1f}s')
+    print(f'mean absolute error in decisive share: {sum(errors)/len(errors):.1%}, max: {max(errors):.1%}')
@@ -0,0 +1,631 @@
+"""
+Analytic estimates of 1v1 melee fights.
+
+A fight is modelled as a Markov chain over the health of both combatants and their separation. Each exchange, one of
+the combatants acts, chosen in proportion to their action rate. They either try to change the separation, as the AI
+would, or attack. The outcome of an attack is computed exactly from the contest tables: the attack and defence are
+chosen the same way the AI chooses them, the defence or evade and any shield block use get_parry_damage_mult(), hit
+locations are weighted by exposure, and wounds are computed against the armor of each body part. Whenever a wound
+leaves the defender at or below 0 health they must pass an Endurance test against the attack to stay conscious, and
+a defender at or below -max_health is always taken out of the fight. The crit levels of each attack are computed
+exactly as well, and each side may use them to close or open the range as CloseRangeCritical and OpenRangeCritical do.
+
+Health is discretized into steps of health_step. Each wound is split between the two nearest steps so that the
+expected wound is preserved. The chance of winning and the expected number of exchanges from every state are then
+found by dynamic programming, working back from the most wounded states.
+
+Not modelled: the other critical effects, injuries, stuns, knockdown and stance, and weapon switching. Nor is the
+timing of actions: in a fight, defending against an attack replaces whatever action the defender was winding up, so a
+creature whose opponent attacks sooner or more often loses most of its own actions, whereas here every exchange is a
+whole action taken by one side or the other. Estimates are least reliable for a short weapon against a long or quick
+one; python -m core.analysis compares them against run_tournament().
+"""
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, NamedTuple, Optional, Tuple, Type, Iterable, Mapping, MutableMapping, Sequence, Any
+
+import numpy as np
+
+from core.action import ActionLoop
+from core.constants import MeleeRange
+from core.creature.actions import can_interrupt_action
+from core.creature.traits import EvadeTrait
+from core.creature.mind.tactics import get_melee_attack_priority, choose_melee_range
+from core.contest import (
+    Contest, ContestOutcome, DifficultyGrade, UnopposedResult, SKILL_ENDURANCE, SKILL_EVADE, get_roll_table,
+)
+from core.combat.criticals import DEFAULT_CRITICALS, CriticalUsage, CloseRangeCritical, OpenRangeCritical
+from core.combat.melee import MeleeSeparation, join_melee_combat
+from core.combat.resolver import get_parry_damage_mult
+from core.rng import RandomStream
+from core.sim.fight import create_combatant
+
+if TYPE_CHECKING:
+    from core.creature import Creature
+    from core.creature.template import CreatureTemplate
+    from core.combat.attack import MeleeAttack
+    from core.combat.shield import ShieldBlock
+    from core.combat.criticals import CriticalEffect
+
+DEFAULT_HEALTH_STEP = 0.5
+
+
+class FightEstimate(NamedTuple):
+    win_chance: Tuple[float, float]
+    expected_exchanges: float  # attacks resolved before the fight ends, inf if it can stall
+
+    @property
+    def draw_chance(self) -> float:
+        """The chance that neither combatant can ever take the other out of the fight"""
+        return max(0.0, 1.0 - sum(self.win_chance))
+
+    def __str__(self) -> str:
+        return f'{self.win_chance[0]:.1%} vs {self.win_chance[1]:.1%}, {self.expected_exchanges:.1f} exchanges'
+
+
+## Contest Totals
+
+class _Totals(NamedTuple):
+    """Distribution of contest totals, equivalent to ContestResult.contest_total"""
+    values: np.ndarray
+    probs: np.ndarray
+
+    def chance_above(self, x: np.ndarray) -> np.ndarray:
+        return (self.values[None, :] > x[:, None]) @ self.probs
+
+    def chance_at_most(self, x: np.ndarray) -> np.ndarray:
+        return (self.values[None, :] <= x[:, None]) @ self.probs
+
+def _get_totals(creature: Creature, contest: Contest, modifier: int = 0) -> _Totals:
+    skill_level = creature.get_skill_level(contest)
+    contest_mod = contest.get_attribute_modifier(creature) + contest.get_skill_modifier(skill_level) + modifier
+    roll_table = get_roll_table(skill_level.bonus_dice)
+    values = np.fromiter(roll_table.keys(), dtype=int, count=len(roll_table)) + contest_mod
+    probs = np.fromiter(roll_table.values(), dtype=float, count=len(roll_table))
+    return _Totals(values, probs)
+
+# equivalent to get_combat_difficulty() and get_block_difficulty() for a standing creature
+def _get_difficulty(seriously_wounded: bool) -> DifficultyGrade:
+    return DifficultyGrade.Standard.get_step(+1) if seriously_wounded else DifficultyGrade.Standard
+
+
+## Choices
+
+def _split_ties(priority: Mapping[Any, Any]) -> Mapping[Any, float]:
+    """The AI breaks ties at random"""
+    best = max(priority.values(), default=None)
+    top = [ key for key, value in priority.items() if value == best ]
+    return { key : 1.0/len(top) for key in top }
+
+def get_attack_choices(attacker: Creature, target: Creature, attacks: Iterable[MeleeAttack]) -> Mapping[MeleeAttack, float]:
+    """The chance of the AI using each attack, as in choose_attack()"""
+    attack_priority = get_melee_attack_priority(attacker, target, attacks)
+    best_value = max(attack_priority.values(), default=None)
+    if best_value is None:
+        return {}
+    top = { attack : value**3 for attack, value in attack_priority.items() if value > 0.75*best_value }
+    total = sum(top.values())
+    return { attack : weight/total for attack, weight in top.items() }
+
+def get_defence_choices(defender: Creature, attack: MeleeAttack, separation: MeleeRange) -> Mapping[Optional[MeleeAttack], float]:
+    """The chance of the AI using each defence, as in CombatTactics.get_melee_defence()"""
+    defend_priority = {}
+    for defence in defender.get_melee_attacks():
+        if defence.can_defend(separation):
+            skill_level = defender.get_skill_level(defence.combat_test).value
+            block_effectiveness = 1.0 - get_parry_damage_mult(attack.force, defence.force)
+            defend_priority[defence] = (skill_level, block_effectiveness, defence.force)
+    return _split_ties(defend_priority) or { None : 1.0 }
+
+def get_shield_block(defender: Creature, separation: MeleeRange) -> Optional[ShieldBlock]:
+    """As in CombatTactics.get_melee_block()"""
+    block_priority = {
+        block : (block.contest_modifier, block.force)
+        for block in defender.get_shield_blocks() if block.can_block(separation)
+    }
+    return max(block_priority.keys(), key=lambda k: block_priority[k], default=None)
+
+
+## Wounds
+
+class _WoundTable:
+    """The distribution of wounds from an attack against the target, in health steps.
+    Index i is the chance of a positive wound that takes the target down i steps."""
+    def __init__(self, target: Creature, health_step: float, max_steps: int):
+        self.health_step = health_step
+        self.max_steps = max_steps
+        bodyparts = list(target.get_bodyparts())
+        exposure = np.array([bp.exposure for bp in bodyparts], dtype=float)
+        self._hitloc = exposure / exposure.sum()
+        self._armor = np.array([bp.get_armor() for bp in bodyparts], dtype=float)
+        self._wound_mult = np.array([bp.get_wound_multiplier() for bp in bodyparts], dtype=float)
+        self._rows: MutableMapping[Any, np.ndarray] = {}
+
+    def get_wounds(self, attack: MeleeAttack, damage_mult: float) -> np.ndarray:
+        key = attack.template, attack.str_modifier, damage_mult
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = self._calc_row(attack, damage_mult)
+        return row
+
+    def _calc_row(self, attack: MeleeAttack, damage_mult: float) -> np.ndarray:
+        damage_pmf, armpen_pmf = attack.damage.pmf(), attack.armpen.pmf()
+        damage_values = np.fromiter(damage_pmf.keys(), dtype=float, count=len(damage_pmf)) * damage_mult
+        armpen_values = np.fromiter(armpen_pmf.keys(), dtype=float, count=len(armpen_pmf)) * damage_mult
+        weights = (
+            np.fromiter(damage_pmf.values(), dtype=float, count=len(damage_pmf))[:, None, None]
+            * np.fromiter(armpen_pmf.values(), dtype=float, count=len(armpen_pmf))[None, :, None]
+            * self._hitloc[None, None, :]
+        )
+
+        # [damage, armpen, bodypart], matches BodyPart.apply_damage()
+        d = damage_values[:, None, None]
+        effective = np.maximum(d - self._armor, np.minimum(armpen_values[None, :, None], d))
+        wounds = np.where(d > 0, effective, 0) * self._wound_mult
+
+        wounds, weights = wounds.ravel(), np.broadcast_to(weights, wounds.shape).ravel()
+        positive = wounds > 0
+        steps = np.minimum(wounds[positive] / self.health_step, self.max_steps)
+        weights = weights[positive]
+
+        # split each wound between the nearest steps, preserving the expected wound
+        lower = np.floor(steps)
+        upper_frac = steps - lower
+        row = np.zeros(self.max_steps + 2)
+        np.add.at(row, lower.astype(int), weights * (1.0 - upper_frac))
+        np.add.at(row, lower.astype(int) + 1, weights * upper_frac)
+        row[self.max_steps] += row[self.max_steps + 1]
+        return row[:self.max_steps + 1]
+
+
+## Exchanges
+
+class _HealthTrack:
+    """The discretized health states of one combatant"""
+    def __init__(self, creature: Creature, health_step: float):
+        max_health = creature.max_health
+        self.serious_steps = math.ceil(max_health / health_step - 1e-9)  # at or below 0 health
+        self.out_steps = math.ceil(2 * max_health / health_step - 1e-9)  # at or below -max_health
+        self.start = min(round((max_health - creature.health) / health_step), self.out_steps)
+
+    def is_seriously_wounded(self, steps: np.ndarray) -> np.ndarray:
+        return steps >= self.serious_steps
+
+class _Wounds(NamedTuple):
+    """The chance of an outcome, and of it together with each wound (in steps), and of that wound together with the
+    defender failing the Endurance test against the attack"""
+    chance: float
+    hit: np.ndarray
+    hit_fail: np.ndarray
+
+    def __add__(self, other: _Wounds) -> _Wounds:
+        return _Wounds(self.chance + other.chance, self.hit + other.hit, self.hit_fail + other.hit_fail)
+
+    def scale(self, weight: float) -> _Wounds:
+        return _Wounds(weight * self.chance, weight * self.hit, weight * self.hit_fail)
+
+class _Outcome(NamedTuple):
+    """The wounds from one attack against one defence, split by whether the attack succeeds, and the chance of the
+    attacker or the defender winning with each crit level"""
+    success: _Wounds
+    failure: _Wounds
+    attacker_crits: np.ndarray
+    defender_crits: np.ndarray
+
+_CRIT_LEVELS = np.arange(Contest.MAX_CRIT + 1)
+_SERIOUS = ((False, False), (False, True), (True, False), (True, True))  # (attacker, defender) seriously wounded
+
+class _AttackOutcomes:
+    """The outcomes of attacks made by the attacker against the defender, following MeleeCombatResolver.
+
+    Outcomes are cached by everything that the resolution depends on, since the same attack is usually resolved the
+    same way at several separations."""
+    def __init__(self, attacker: Creature, defender: Creature, wound_table: _WoundTable):
+        self.attacker = attacker
+        self.defender = defender
+        self.wound_table = wound_table
+        self._endurance = _get_totals(defender, SKILL_ENDURANCE)
+        self._cache: MutableMapping[Any, _Outcome] = {}
+        self._range_crits: MutableMapping[Any, RangeCritical] = {}
+        self._range_priorities = attacker.mind.get_melee_range_priority(defender), defender.mind.get_melee_range_priority(attacker)
+        self._totals: MutableMapping[Any, _Totals] = {}
+
+    def get_outcomes(self, attacks: Iterable[Tuple[MeleeAttack, MeleeRange, float]], *, opportunity_attack: bool = False,
+                     ) -> Mapping[Tuple[bool, bool], Mapping[Optional[MeleeRange], _Wounds]]:
+        """The outcomes of a single attack, given the chance of making each attack at each separation, for whether the
+        (attacker, defender) are seriously wounded. Each is split by the separation that a critical effect changes it
+        to (None if it does not change). Opportunity attacks don't change it."""
+        no_wounds = _Wounds(0.0, np.zeros(self.wound_table.max_steps + 1), np.zeros(self.wound_table.max_steps + 1))
+        result = { serious : { None : no_wounds } for serious in _SERIOUS }
+        for attack, separation, attack_weight in attacks:
+            if opportunity_attack:
+                defences, can_evade = { None : 1.0 }, True  # as in _resolve_melee_evade()
+            else:
+                defences, can_evade = get_defence_choices(self.defender, attack, separation), self.defender.has_trait(EvadeTrait)
+            shield = get_shield_block(self.defender, separation)
+            attack_crit = self._get_range_critical(True, separation, attack)
+
+            for defence, defence_weight in defences.items():
+                weight = attack_weight * defence_weight
+                defence_crit = self._get_range_critical(False, separation, defence)
+                for serious in _SERIOUS:
+                    key = attack.template, attack.str_modifier, defence, can_evade, shield, serious
+                    outcome = self._cache.get(key)
+                    if outcome is None:
+                        outcome = self._cache[key] = self._calc_outcome(attack, defence, can_evade, shield, *serious)
+
+                    branches = result[serious]
+                    if opportunity_attack:
+                        branches[None] += (outcome.success + outcome.failure).scale(weight)
+                        continue
+
+                    # assumes that the crit level does not depend on how the attack lands, e.g. whether it is blocked
+                    for range_crit, wounds, crits in (
+                        (attack_crit, outcome.success, outcome.attacker_crits),
+                        (defence_crit, outcome.failure, outcome.defender_crits),
+                    ):
+                        change = crits @ range_crit.get_change_chance(_CRIT_LEVELS) / wounds.chance if wounds.chance > 0 else 0.0
+                        if range_crit.chance > 0:
+                            dest = range_crit.separation
+                            branches[dest] = branches.get(dest, no_wounds) + wounds.scale(weight * change)
+                        branches[None] += wounds.scale(weight * (1.0 - change))
+        return result
+
+    def _get_range_critical(self, offensive: bool, separation: MeleeRange, attack: Optional[MeleeAttack]) -> RangeCritical:
+        criticals = tuple(attack.get_criticals()) if attack is not None else None
+        key = offensive, separation, criticals
+        range_crit = self._range_crits.get(key)
+        if range_crit is None:
+            if criticals is None:
+                range_crit = RangeCritical(0.0, separation)
+            else:
+                target = choose_melee_range(self._range_priorities[0 if offensive else 1], separation)
+                usage = (CriticalUsage.Offensive if offensive else CriticalUsage.Defensive) | CriticalUsage.Melee
+                range_crit = get_range_critical(target, separation, usage, criticals)
+            self._range_crits[key] = range_crit
+        return range_crit
+
+    def _get_totals(self, creature: Creature, contest: Contest, modifier: int) -> _Totals:
+        key = creature is self.attacker, contest, modifier
+        totals = self._totals.get(key)
+        if totals is None:
+            totals = self._totals[key] = _get_totals(creature, contest, modifier)
+        return totals
+
+    def _calc_outcome(self, attack: MeleeAttack, defence: Optional[MeleeAttack], can_evade: bool,
+                      shield: Optional[ShieldBlock], attacker_serious: bool, defender_serious: bool) -> _Outcome:
+        attacker, defender = self.attacker, self.defender
+        attack_difficulty = _get_difficulty(attacker_serious)
+        defend_difficulty = _get_difficulty(defender_serious)
+
+        # the chance of success as a function of the attacker's contest total, and the chance of each crit level
+        if defence is not None:
+            attack_totals = self._get_totals(attacker, attack.combat_test, attack_difficulty.contest_mod)
+            defend_totals = self._get_totals(defender, defence.combat_test, defend_difficulty.contest_mod)
+            success = defend_totals.chance_at_most(attack_totals.values - 1)
+            fail_mult = get_parry_damage_mult(attack.force, defence.force)
+            crits = Contest.get_opposed_outcomes(
+                attacker, attack.combat_test, defender, defence.combat_test,
+                attack_difficulty.to_modifier() - defend_difficulty.to_modifier(),
+            )
+        elif can_evade:
+            attack_totals = self._get_totals(attacker, attack.combat_test, attack_difficulty.contest_mod)
+            evade_totals = self._get_totals(defender, SKILL_EVADE, defend_difficulty.contest_mod)
+            success = evade_totals.chance_at_most(attack_totals.values - 1)
+            fail_mult = 0.0
+            crits = Contest.get_opposed_outcomes(
+                attacker, attack.combat_test, defender, SKILL_EVADE,
+                attack_difficulty.to_modifier() - defend_difficulty.to_modifier(),
+            )
+            crits = { outcome : p for outcome, p in crits.items() if outcome.success }  # evading gets no crits
+        else:
+            attack_modifier = attack_difficulty.get_step(-1).to_modifier()
+            attack_totals = self._get_totals(attacker, attack.combat_test, attack_modifier.contest)
+            attack_target = UnopposedResult.DEFAULT_TARGET + defend_difficulty.contest_mod
+            success = (attack_totals.values > attack_target).astype(float)
+            fail_mult = 0.0
+            crits = attack.combat_test.get_unopposed_outcomes(attacker, attack_target, attack_modifier)
+
+        return _Outcome(
+            self._get_wounds(attack, shield, defender_serious, attack_totals, success, 1.0),
+            self._get_wounds(attack, shield, defender_serious, attack_totals, 1.0 - success, fail_mult),
+            np.array([ crits.get(ContestOutcome(True, level), 0.0) for level in _CRIT_LEVELS ]),
+            np.array([ crits.get(ContestOutcome(False, level), 0.0) for level in _CRIT_LEVELS ]),
+        )
+
+    def _get_wounds(self, attack: MeleeAttack, shield: Optional[ShieldBlock], defender_serious: bool,
+                    attack_totals: _Totals, chance: np.ndarray, damage_mult: float) -> _Wounds:
+        """The wounds from an attack that lands with the damage multiplier, given the chance of that for each of the
+        attacker's contest totals"""
+        total = float(chance @ attack_totals.probs)
+        branches = { damage_mult : chance }
+
+        # the defender may attempt to block whenever it would reduce the damage
+        if shield is not None:
+            block_mult = get_parry_damage_mult(attack.force, shield.force)
+            if block_mult < damage_mult:
+                block_modifier = _get_difficulty(defender_serious).contest_mod + shield.contest_modifier.contest
+                block_totals = self._get_totals(self.defender, shield.combat_test, block_modifier)
+                block_success = block_totals.chance_above(attack_totals.values)
+                branches = { damage_mult : chance * (1.0 - block_success), block_mult : chance * block_success }
+
+        hit = np.zeros(self.wound_table.max_steps + 1)
+        hit_fail = np.zeros(self.wound_table.max_steps + 1)
+        endurance_fail = self._endurance.chance_at_most(attack_totals.values)
+        for damage_mult, chance in branches.items():
+            if damage_mult <= 0:
+                continue
+            wounds = self.wound_table.get_wounds(attack, damage_mult)
+            hit += (chance @ attack_totals.probs) * wounds
+            hit_fail += ((chance * endurance_fail) @ attack_totals.probs) * wounds
+        return _Wounds(total, hit, hit_fail)
+
+def _get_wound_transitions(outcomes: Mapping[bool, _Wounds], track: _HealthTrack) -> Tuple[np.ndarray, np.ndarray]:
+    """Given the attack outcomes for (defender not seriously wounded, seriously wounded), the chance of the defender
+    moving between health states as an upper triangular matrix, and the chance of being taken out from each state"""
+    n = track.out_steps
+    start = np.arange(n)[:, None]
+    serious = track.is_seriously_wounded(start)
+    hit = np.where(serious, outcomes[True].hit, outcomes[False].hit)  # [start, wound]
+    hit_fail = np.where(serious, outcomes[True].hit_fail, outcomes[False].hit_fail)
+    chance = np.where(serious[:, 0], outcomes[True].chance, outcomes[False].chance)
+
+    end = start + np.arange(hit.shape[1])
+    remain = np.where(track.is_seriously_wounded(end), hit - hit_fail, hit)
+    remain[end >= n] = 0
+
+    move = np.zeros((n, n + hit.shape[1]))
+    move[np.broadcast_to(start, end.shape), end] = remain
+    move = move[:, :n]
+    move[start[:, 0], start[:, 0]] += chance - hit.sum(axis=1)
+    taken_out = hit.sum(axis=1) - remain.sum(axis=1)
+    return move, taken_out
+
+
+## Range Changes
+
+class RangeChange(NamedTuple):
+    chance: float  # the chance of trying to change range instead of attacking
+    dest: int  # index of the resulting separation
+    opportunity_attack: bool  # the opponent responds with an attack of opportunity
+    success: float
+
+def get_range_change(creature: Creature, opponent: Creature, ranges: Sequence[MeleeRange], index: int,
+                     *, range_priorities: Tuple[Mapping[MeleeRange, float], Mapping[MeleeRange, float]] = None) -> RangeChange:
+    """As in CreatureMind._possibly_change_melee_range() and CombatTactics.choose_change_range_response().
+    The range priority of the creature against the opponent and the opponent against the creature may be given if
+    they are already known."""
+    separation = ranges[index]
+    if range_priorities is None:
+        range_priorities = creature.mind.get_melee_range_priority(opponent), opponent.mind.get_melee_range_priority(creature)
+    desired_ranges = range_priorities[0]
+    best_range = max(
+        desired_ranges, default=None, key=lambda r: (desired_ranges[r], 1 if r == separation else 0, r),
+    )
+    if best_range is None or best_range == separation:
+        return RangeChange(0.0, index, False, 0.0)
+
+    change_desire = creature.mind.get_range_change_desire(opponent, separation, best_range, range_priority=range_priorities[0])
+    shift = min(abs(best_range - separation), MeleeSeparation.MAX_RANGE_SHIFT)
+    final_range = separation.get_step(shift if best_range > separation else -shift)
+    change = RangeChange(min(max(0.0, change_desire), 1.0), ranges.index(final_range), False, 1.0)
+
+    change_score = opponent.mind.get_range_change_desire(creature, separation, best_range, range_priority=range_priorities[1])
+    if change_score >= 0:
+        return change
+
+    contest_chance = Contest.get_opposed_chance(creature, SKILL_EVADE, opponent)
+    pass_ranges = list(MeleeRange.between(separation, final_range))
+    can_opportunity_attack = (
+        best_range < separation and can_interrupt_action(opponent)
+        and any(attack.can_attack(r) for attack in opponent.get_melee_attacks() for r in pass_ranges)
+    )
+    if can_opportunity_attack and contest_chance > min(-change_score, 2/3):
+        return change._replace(opportunity_attack=True)
+    return change._replace(success=contest_chance)
+
+class RangeCritical(NamedTuple):
+    chance: float  # the chance that each critical effect the user gets changes the separation
+    separation: MeleeRange  # the separation it is changed to
+
+    def get_change_chance(self, crit_level: np.ndarray) -> np.ndarray:
+        """Each critical effect is chosen separately, and once the separation changes it can't be chosen again"""
+        return 1.0 - (1.0 - self.chance)**crit_level
+
+_RANGE_CRITICALS = (CloseRangeCritical, OpenRangeCritical)
+
+def get_range_critical(target: Optional[MeleeRange], separation: MeleeRange, usage: CriticalUsage,
+                       criticals: Iterable[Type[CriticalEffect]]) -> RangeCritical:
+    """As CloseRangeCritical and OpenRangeCritical in MeleeCombatResolver.resolve_critical_effects() for a standing
+    user with the given desired melee range, counting all of the other critical effects as usable"""
+    if target is None or target == separation:
+        return RangeCritical(0.0, separation)
+
+    range_crit = CloseRangeCritical if target < separation else OpenRangeCritical
+    criticals = dict.fromkeys(crit for crit in (*DEFAULT_CRITICALS, *criticals) if usage in crit.usage)
+    if range_crit not in criticals:
+        return RangeCritical(0.0, separation)
+
+    total = sum(crit.get_weight(usage) for crit in criticals if crit is range_crit or crit not in _RANGE_CRITICALS)
+    shift = min(abs(target - separation), MeleeSeparation.MAX_RANGE_SHIFT)
+    return RangeCritical(
+        range_crit.get_weight(usage) / total, separation.get_step(shift if target > separation else -shift),
+    )
+
+def _get_opportunity_attacks(attacker: Creature, target: Creature,
+                             pass_ranges: Sequence[MeleeRange]) -> Iterable[Tuple[MeleeAttack, MeleeRange, float]]:
+    """As in ChangeMeleeRangeAction.resolve(), each attack is made at the longest range that it can reach"""
+    attacks = (attack for attack in attacker.get_melee_attacks() if any(attack.can_attack(r) for r in pass_ranges))
+    for attack, weight in get_attack_choices(attacker, target, attacks).items():
+        separation = max(r for r in pass_ranges if attack.can_attack(r))
+        yield attack, separation, weight
+
+
+## Fights
+
+class _Combatant:
+    """Everything one combatant can do to the other, for each separation"""
+    def __init__(self, creature: Creature, opponent: Creature, ranges: Sequence[MeleeRange],
+                 range_changes: Sequence[RangeChange], opponent_range_changes: Sequence[RangeChange],
+                 opponent_track: _HealthTrack, health_step: float):
+        outcomes = _AttackOutcomes(creature, opponent, _WoundTable(opponent, health_step, opponent_track.out_steps))
+        self.range_changes = range_changes
+
+        # [separation] -> (resulting separation, [attacker seriously wounded] -> transitions of the opponent's health)
+        self.attacks = []
+        self.can_attack = []
+        for index, separation in enumerate(ranges):
+            attacks = (attack for attack in creature.get_melee_attacks() if attack.can_attack(separation))
+            choices = [ (attack, separation, weight) for attack, weight in get_attack_choices(creature, opponent, attacks).items() ]
+            self.can_attack.append(len(choices) > 0)
+            self.attacks.append([
+                (ranges.index(dest) if dest in ranges else index, transitions)
+                for dest, transitions in self._get_transitions(outcomes, choices, opponent_track).items()
+            ])
+
+        # [separation][attacker seriously wounded] -> opportunity attacks made when the opponent moves in
+        self.opportunity_attacks = []
+        for separation, change in zip(ranges, opponent_range_changes):
+            if not change.opportunity_attack:
+                self.opportunity_attacks.append(None)
+                continue
+            pass_ranges = list(MeleeRange.between(separation, ranges[change.dest]))
+            choices = list(_get_opportunity_attacks(creature, opponent, pass_ranges))
+            self.opportunity_attacks.append(
+                self._get_transitions(outcomes, choices, opponent_track, opportunity_attack=True)[None]
+            )
+
+    @staticmethod
+    def _get_transitions(outcomes: _AttackOutcomes, choices: Sequence[Tuple[MeleeAttack, MeleeRange, float]],
+                         opponent_track: _HealthTrack, **kwargs: Any) -> Mapping[Optional[MeleeRange], Sequence[Tuple[np.ndarray, np.ndarray]]]:
+        """[attacker seriously wounded] -> transitions, by the separation that the attack changes it to"""
+        wounds = outcomes.get_outcomes(choices, **kwargs)
+        return {
+            dest : [
+                _get_wound_transitions({
+                    defender_serious : wounds[attacker_serious, defender_serious][dest] for defender_serious in (False, True)
+                }, opponent_track)
+                for attacker_serious in (False, True)
+            ]
+            for dest in wounds[False, False]
+        }
+
+## Without this a fight in which neither side can make progress (e.g. both keep changing range) has no solution.
+## Each exchange leaks a negligible chance of ending in a draw instead.
+_STALL_LEAK = 1e-9
+
+def estimate_fight(a: Creature, b: Creature, *, health_step: float = DEFAULT_HEALTH_STEP) -> FightEstimate:
+    """Estimate the outcome of a melee fight between two creatures, starting from their current health and separation.
+    The creatures must already be engaged in melee with each other, as they are in run_fight().
+
+    The AI's choice of range is evaluated at the starting health of both creatures."""
+    melee = a.get_melee_combat(b)
+    track_a, track_b = _HealthTrack(a, health_step), _HealthTrack(b, health_step)
+    na, nb = track_a.out_steps, track_b.out_steps
+    if track_a.start >= na or track_b.start >= nb:
+        return FightEstimate((float(track_b.start >= nb), float(track_a.start >= na)), 0.0)
+
+    max_range = max(melee.get_separation(), a.get_melee_engage_distance(), b.get_melee_engage_distance())
+    ranges = list(MeleeRange.between(melee.get_min_separation(), max_range))
+    nr = len(ranges)
+
+    priority_a, priority_b = a.mind.get_melee_range_priority(b), b.mind.get_melee_range_priority(a)
+    changes_a = [ get_range_change(a, b, ranges, index, range_priorities=(priority_a, priority_b)) for index in range(nr) ]
+    changes_b = [ get_range_change(b, a, ranges, index, range_priorities=(priority_b, priority_a)) for index in range(nr) ]
+    side_a = _Combatant(a, b, ranges, changes_a, changes_b, track_b, health_step)  # moves b's health
+    side_b = _Combatant(b, a, ranges, changes_b, changes_a, track_a, health_step)  # moves a's health
+    rate_a, rate_b = a.get_action_rate(), b.get_action_rate()
+    pa, pb = rate_a/(rate_a + rate_b), rate_b/(rate_a + rate_b)
+
+    serious_a = track_a.is_seriously_wounded(np.arange(na))
+    serious_b = track_b.is_seriously_wounded(np.arange(nb))
+    same_b = np.arange(nb)
+
+    # every way an exchange can go, as (chance, transitions, separation, resulting separation), by whose health it moves
+    moves_a, moves_b = [], []
+    stay = np.zeros((nr, nr))  # exchanges that only change the separation
+    for r in range(nr):
+        for side, p, attack_moves, opportunity_moves in ((side_a, pa, moves_b, moves_a), (side_b, pb, moves_a, moves_b)):
+            change = side.range_changes[r]
+            attack_chance = (1.0 - change.chance) if side.can_attack[r] else 0.0
+            idle_chance = 1.0 - change.chance - attack_chance
+
+            if attack_chance > 0:
+                for dest, transitions in side.attacks[r]:
+                    attack_moves.append((p * attack_chance, transitions, r, dest))
+            stay[r, r] += p * idle_chance
+
+            if change.chance > 0:
+                if change.opportunity_attack:
+                    opponent = side_b if side is side_a else side_a
+                    opportunity_moves.append((p * change.chance, opponent.opportunity_attacks[r], r, change.dest))
+                else:
+                    stay[r, change.dest] += p * change.chance * change.success
+                    stay[r, r] += p * change.chance * (1.0 - change.success)
+
+    # a's health transitions depend on whether b is seriously wounded, which varies along a row of a's health
+    def a_moves(transitions, i):
+        (move_0, out_0), (move_1, out_1) = transitions
+        move = np.where(serious_b[:, None], move_1[i], move_0[i])  # [b steps, a steps]
+        out = np.where(serious_b, out_1[i], out_0[i])
+        return move, out
+
+    # Within a row, the unknowns are coupled through b's wounds, changes of separation, and a not being wounded. All of
+    # these depend on the row only through whether a is seriously wounded, so there are just two systems to solve.
+    systems = {}
+    def get_system(i):
+        serious = bool(serious_a[i])
+        if serious not in systems:
+            coeffs = np.zeros((nb, nr, nb, nr))
+            rhs = np.zeros((nb, nr, 3))
+            rhs[..., 2] = 1.0
+            coeffs[same_b, :, same_b, :] += stay
+            for weight, transitions, r, dest in moves_b:
+                move, out = transitions[int(serious)]
+                coeffs[:, r, :, dest] += weight * move
+                rhs[:, r, 0] += weight * out
+            for weight, transitions, r, dest in moves_a:
+                move, out = a_moves(transitions, i)
+                coeffs[same_b, r, same_b, dest] += weight * move[:, i]
+            system = np.eye(nb*nr) - (1.0 - _STALL_LEAK) * coeffs.reshape(nb*nr, nb*nr)
+            systems[serious] = np.linalg.inv(system), rhs
+        return systems[serious]
+
+    # [a steps, b steps, separation, (a wins, b wins, exchanges)], solved one row of a's health at a time, starting from
+    # the most wounded
+    values = np.zeros((na, nb, nr, 3))
+    for i in range(na - 1, -1, -1):
+        inverse, rhs = get_system(i)
+        rhs = rhs.copy()
+        for weight, ((move_0, out_0), (move_1, out_1)), r, dest in moves_a:
+            later = values[i+1:, :, dest, :]
+            rhs[:, r, :] += weight * np.where(
+                serious_b[:, None], np.einsum('i,ijk->jk', move_1[i, i+1:], later), np.einsum('i,ijk->jk', move_0[i, i+1:], later),
+            )
+            rhs[:, r, 1] += weight * np.where(serious_b, out_1[i], out_0[i])
+        values[i] = (inverse @ rhs.reshape(nb*nr, 3)).reshape(nb, nr, 3)
+
+    win_a, win_b, exchanges = values[track_a.start, track_b.start, ranges.index(melee.get_separation())]
+    if win_a + win_b < 1.0 - 1e-6:
+        exchanges = math.inf
+    return FightEstimate((float(win_a), float(win_b)), float(exchanges))
+
+def estimate_matchup(template_a: CreatureTemplate, template_b: CreatureTemplate, n: int, seed: int,
+                     *, key: Tuple[int, ...] = (), health_step: float = DEFAULT_HEALTH_STEP) -> FightEstimate:
+    """Average the estimates over the loadouts that run_matchup() would roll for the same seed.
+    Since loadouts are random, each one is estimated separately. For a run_tournament() matchup, the key is (index a, index b)."""
+    estimates = []
+    for i in range(n):
+        rng = RandomStream(seed, key + (i,))
+        loop = ActionLoop(rng)
+        combatants = [ create_combatant(template, rng) for template in (template_a, template_b) ]
+        for creature in combatants:
+            creature.set_action_loop(loop)
+        join_melee_combat(*combatants)
+        estimates.append(estimate_fight(*combatants, health_step=health_step))
+
+    win_a = sum(e.win_chance[0] for e in estimates) / n
+    win_b = sum(e.win_chance[1] for e in estimates) / n
+    exchanges = sum(e.expected_exchanges for e in estimates) / n
+    return FightEstimate((win_a, win_b), exchanges)
@@ -75,6 +75,8 @@ class MeleeAttackTemplate:
         return format_damage(self.damage, self.armpen, self.damtype)
 
 class MeleeAttack:
+    __slots__ = ('template', 'user', 'use_hands', 'source', 'traits', 'max_reach', 'min_reach')
+
     def __init__(self, template: MeleeAttackTemplate, user: Creature, use_hands: int, source: Any):
         self.template = template
         self.user = user
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import random
 from enum import Flag, auto
 from typing import TYPE_CHECKING, Optional
 
@@ -8,6 +7,7 @@ from core.dice import dice
 from core.constants import Stance
 from core.creature.actions import DisruptedAction
 from core.contest import ContestResult, OpposedResult, DifficultyGrade, SKILL_ACROBATICS
+from core.events import ContestRolled, RangeChanged, StanceChanged
 
 if TYPE_CHECKING:
     from core.constants import MeleeRange
@@ -35,6 +35,11 @@ class CriticalEffect:
         self.usage = usage
         self.setup()
 
+    @classmethod
+    def get_weight(cls, usage: CriticalUsage) -> float:
+        """The relative chance of choosing this effect over the others that can be used, when used as given"""
+        return cls.weight
+
     def setup(self) -> None:
         pass
 
@@ -72,14 +77,11 @@ class HitLocationCritical(CriticalEffect):
     def setup(self) -> None:
         attack = self.combat.use_attack
         target = self.combat.melee.get_opponent(self.user)
-        hitlocs = {
-            bp : bp.get_effective_damage(attack.damage.mean(), attack.armpen.mean())
-            for bp in target.get_bodyparts()
-        }
+        hitlocs = dict(zip(target.get_bodyparts(), target.expected_damage.get_bodypart_damage(attack).tolist()))
 
         self.hitloc = None
         if len(hitlocs) > 0 and max(hitlocs.values()) > min(hitlocs.values()):
-            self.hitloc = max(hitlocs.keys(), key=lambda k: (hitlocs[k], random.random()))
+            self.hitloc = max(hitlocs.keys(), key=lambda k: (hitlocs[k], self.user.rng.random()))
 
     def can_use(self) -> bool:
         return self.combat.is_effective_hit() and self.combat.hitloc != self.hitloc and self.hitloc is not None
@@ -138,9 +140,9 @@ class DisruptCritical(CriticalEffect):
     name = 'Disrupt Opponent'
     usage = CriticalUsage.General | CriticalUsage.Melee
 
-    @property
-    def weight(self) -> float:
-        if CriticalUsage.Defensive in self.usage:
+    @classmethod
+    def get_weight(cls, usage: CriticalUsage) -> float:
+        if CriticalUsage.Defensive in usage:
             return 9  # really valuable in defence as otherwise we may not be able to attack
         return 3
 
@@ -178,7 +180,8 @@ class CloseRangeCritical(CriticalEffect):
     def apply(self) -> None:
         prev = self.combat.melee.get_separation()
         self.combat.melee.change_separation(self.target_range)
-        print(f'{self.user} closes distance with {self.combat.melee.get_opponent(self.user)} ({prev} -> {self.combat.melee.get_separation()}).')
+        self.user.events.emit(RangeChanged, creature=self.user, opponent=self.combat.melee.get_opponent(self.user),
+                              from_range=prev, to_range=self.combat.melee.get_separation())
 
     def __str__(self) -> str:
         return f'{self.name}: {self.target_range}'
@@ -201,7 +204,8 @@ class OpenRangeCritical(CriticalEffect):
     def apply(self) -> None:
         prev = self.combat.melee.get_separation()
         self.combat.melee.change_separation(self.target_range)
-        print(f'{self.user} opens distance with {self.combat.melee.get_opponent(self.user)} ({prev} -> {self.combat.melee.get_separation()}).')
+        self.user.events.emit(RangeChanged, creature=self.user, opponent=self.combat.melee.get_opponent(self.user),
+                              from_range=prev, to_range=self.combat.melee.get_separation())
 
     def __str__(self) -> str:
         return f'{self.name}: {self.target_range}'
@@ -218,18 +222,15 @@ class ChangeStanceCritical(CriticalEffect):
 
     target_stance: Stance
 
+    def setup(self) -> None:
+        self.target_stance = self.user.max_stance
+
     def can_use(self) -> bool:
         return self.user.stance < self.user.max_stance
 
     def apply(self) -> None:
         self.user.change_stance(self.target_stance)
-        print(f'{self.user} {self._action_text[self.user.stance]}.')
-
-    _action_text = {
-        Stance.Standing : 'stands up',
-        Stance.Crouching : 'crouches',
-        Stance.Prone    : 'goes prone',
-    }
+        self.user.events.emit(StanceChanged, creature=self.user, stance=self.user.stance)
 
     def __str__(self) -> str:
         return f'{self.name}: {self.target_stance}'
@@ -252,7 +253,7 @@ class KnockdownCritical(CriticalEffect):
         modifier = opponent.get_resist_knockdown_modifier(+1)
         acro_result = ContestResult(opponent, SKILL_ACROBATICS, modifier)
         knockdown_result = OpposedResult(self.combat.attack_result, acro_result)
-        print(knockdown_result.format_details())
+        opponent.events.emit(ContestRolled, result=knockdown_result)
         if knockdown_result.success:
             opponent.knock_down()
 
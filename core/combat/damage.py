@@ -1,9 +1,14 @@
 from __future__ import annotations
 
 from enum import Enum
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Iterable, MutableMapping, Optional
+
+import numpy as np
+
 if TYPE_CHECKING:
     from core.dice import DicePool
+    from core.creature import Creature
+    from core.combat.attack import MeleeAttack
 
 class DamageType(Enum):
     Slashing = 'slashing'
@@ -20,4 +25,95 @@ def format_damage(damage: DicePool, armpen: DicePool, damtype: DamageType) -> st
     # noinspection PyTypeChecker
     if armpen.max() > 0:
         return f'[{damage}/{armpen}*] ({damtype.format_type_code()})'
-    return f'[{damage}]{damtype.format_type_code()}'
\ No newline at end of file
+    return f'[{damage}]{damtype.format_type_code()}'
+
+
+class _BodyPartArrays:
+    """The exposure, armor and wound multipliers of each of a target's body parts as arrays, in get_bodyparts() order.
+    The arrays are rebuilt whenever the target's armor_version changes."""
+    def __init__(self, target: Creature):
+        self.target = target
+        self._version: Optional[int] = None
+
+    def _check_version(self) -> None:
+        if self._version == self.target.armor_version:
+            return
+        bodyparts = list(self.target.get_bodyparts())
+        self._exposure = np.array([bp.exposure for bp in bodyparts], dtype=float)
+        self._armor = np.array([bp.get_armor() for bp in bodyparts], dtype=float)
+
+        # divided then multiplied rather than multiplied by get_wound_multiplier(), as 1/1.5 is not exact
+        self._wound_div = np.array([1.0 if bp.is_vital() else 1.5 for bp in bodyparts], dtype=float)
+        self._wound_mul = np.array([bp.get_wound_multiplier() if bp.is_vital() else 1.0 for bp in bodyparts], dtype=float)
+        self._version = self.target.armor_version
+        self._armor_changed()
+
+    def _armor_changed(self) -> None:
+        pass
+
+
+class ExpectedDamageTable(_BodyPartArrays):
+    """The exact expected health loss from attacks against each body part of a target, used by the AI to value attacks.
+
+    Each attack gets a row over the target's body parts, cached by attack template and strength modifier. The whole
+    table is dropped whenever the target's armor_version changes."""
+    def __init__(self, target: Creature):
+        super().__init__(target)
+        self._rows: MutableMapping[Any, np.ndarray] = {}
+
+    def _armor_changed(self) -> None:
+        self._rows.clear()
+
+    def _calc_row(self, damage: DicePool, armpen: DicePool) -> np.ndarray:
+        damage_pmf, armpen_pmf = damage.pmf(), armpen.pmf()
+        damage_values = np.fromiter(damage_pmf.keys(), dtype=float, count=len(damage_pmf))
+        armpen_values = np.fromiter(armpen_pmf.keys(), dtype=float, count=len(armpen_pmf))
+        weights = np.outer(
+            np.fromiter(damage_pmf.values(), dtype=float, count=len(damage_pmf)),
+            np.fromiter(armpen_pmf.values(), dtype=float, count=len(armpen_pmf)),
+        )
+
+        # [damage, armpen, bodypart], matches BodyPart.apply_damage()
+        d = damage_values[:, None, None]
+        effective = np.maximum(d - self._armor, np.minimum(armpen_values[None, :, None], d))
+        effective = np.maximum(effective, 0)
+        return np.einsum('dab,da->b', effective, weights) * (self._wound_mul / self._wound_div)
+
+    def get_bodypart_damage(self, attack: MeleeAttack) -> np.ndarray:
+        """The expected damage of the attack against each of the target's body parts, in get_bodyparts() order"""
+        self._check_version()
+        key = attack.template, attack.str_modifier
+        row = self._rows.get(key)
+        if row is None:
+            row = self._rows[key] = self._calc_row(attack.damage, attack.armpen)
+        return row
+
+    def get_expected_damage_many(self, attacks: Iterable[MeleeAttack]) -> np.ndarray:
+        """The expected damage of each attack, weighted by the exposure of each body part"""
+        rows = [ self.get_bodypart_damage(attack) for attack in attacks ]
+        if len(rows) == 0:
+            return np.zeros(0)
+        return np.stack(rows) @ self._exposure
+
+
+class ArmorTable(_BodyPartArrays):
+    """The armor of each of a target's body parts as arrays, for resolving the damage of many hits at once.
+
+    Body parts are indexed in get_bodyparts() order. The wounds are worked out with the same operations in the same
+    order as BodyPart.apply_damage(), so each one is exactly equal to what apply_damage() would return for that hit."""
+    def get_armor(self) -> np.ndarray:
+        self._check_version()
+        return self._armor
+
+    def get_wounds(self, damage: np.ndarray, armpen: np.ndarray, hitloc: np.ndarray,
+                   damage_mult: Optional[np.ndarray] = None) -> np.ndarray:
+        """The wound from each hit, given its rolled damage and armpen, the index of the body part hit and the damage
+        multiplier that the rolls are scaled by. Hits with no damage left after the multiplier do no wound."""
+        self._check_version()
+        if damage_mult is not None:
+            damage = damage * damage_mult
+            armpen = armpen * damage_mult
+
+        wounds = np.maximum(damage - self._armor[hitloc], np.minimum(armpen, damage))
+        wounds = wounds / self._wound_div[hitloc] * self._wound_mul[hitloc]
+        return np.where(damage > 0, wounds, 0.0)
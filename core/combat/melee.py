@@ -1,5 +1,4 @@
 from __future__ import annotations
-import random
 from typing import TYPE_CHECKING, Tuple, Optional, Iterable
 
 from core.dice import dice
@@ -8,6 +7,7 @@ from core.contest import Contest
 from core.creature.actions import CreatureAction, InterruptCooldownAction, can_interrupt_action, SHORT_ACTION_WINDUP
 from core.contest import ContestResult, OpposedResult, DifficultyGrade, ContestModifier, SKILL_EVADE
 from core.combat.resolver import MeleeCombatResolver
+from core.events import InitiativeRolled, ContestRolled, RangeChangeAttempted, RangeChanged
 
 if TYPE_CHECKING:
     from core.creature import Creature
@@ -17,8 +17,8 @@ def resolve_opposed_initiative(a: Creature, b: Creature) -> Optional[Creature]:
     a_initiative = a.get_initiative_modifier()
     b_initiative = b.get_initiative_modifier()
 
-    a_roll = dice(1,10).get_roll_result()
-    b_roll = dice(1,10).get_roll_result()
+    a_roll = dice(1,10).get_roll_result(a.rng)
+    b_roll = dice(1,10).get_roll_result(b.rng)
     a_total = a_roll + a_initiative
     b_total = b_roll + b_initiative
 
@@ -33,11 +33,8 @@ def resolve_opposed_initiative(a: Creature, b: Creature) -> Optional[Creature]:
     elif round(a_initiative) != round(b_initiative):
         winner = a if a_initiative > b_initiative else b
 
-    success_text = f'{winner} takes initiative!' if winner is not None else 'Tie!'
-    print(
-        f'[Initiative] {a} vs {b} RESULT: {a_roll}{a_initiative:+.0f}={a_total:.0f} vs '
-        f'{b_roll}{b_initiative:+.0f}={b_total:.0f} {success_text}'
-    )
+    a.events.emit(InitiativeRolled, a=a, b=b, a_roll=a_roll, a_initiative=a_initiative,
+                  b_roll=b_roll, b_initiative=b_initiative, winner=winner)
     return winner
 
 # Mounted combat: engaging in combat with a creature always includes engaging in combat with their mount and all other riders and vice versa for being engaged
@@ -126,7 +123,8 @@ class MeleeCombat:
         opponent = self.get_opponent(combatant)
         if opponent is None:
             return False
-        return any(attack.can_attack(self.get_separation()) for attack in combatant.get_melee_attacks())
+        separation = self.get_separation()
+        return any(attack.can_attack(separation) for attack in combatant.get_melee_attacks())
 
     def break_engagement(self) -> None:
         for i, j in [(0,1), (1,0)]:
@@ -176,8 +174,9 @@ class ChangeMeleeRangeAction(CreatureAction):
     def resolve(self) -> Optional[Action]:
         melee = self.protagonist.get_melee_combat(self.opponent)
 
-        verb = 'close' if self.target_range <= melee.get_separation() else 'open'
-        print(f'{self.protagonist} attempts to {verb} distance with {self.opponent} ({melee.get_separation()} -> {self.target_range}).')
+        events = self.protagonist.events
+        events.emit(RangeChangeAttempted, creature=self.protagonist, opponent=self.opponent,
+                    from_range=melee.get_separation(), to_range=self.target_range)
 
         success = True
         start_range = melee.get_separation()
@@ -195,7 +194,7 @@ class ChangeMeleeRangeAction(CreatureAction):
                 ContestResult(self.opponent, SKILL_EVADE, self.get_contest_modifier(self.opponent))
             )
 
-            print(contest.format_details())
+            events.emit(ContestRolled, result=contest)
             success = contest.success
 
         elif reaction == 'attack':
@@ -223,7 +222,8 @@ class ChangeMeleeRangeAction(CreatureAction):
 
         if success:
             melee.change_separation(final_range)
-            print(f'{self.protagonist} {verb}s distance with {self.opponent} ({start_range} -> {melee.get_separation()}).')
+            events.emit(RangeChanged, creature=self.protagonist, opponent=self.opponent,
+                        from_range=start_range, to_range=melee.get_separation())
 
         return None
 
@@ -310,8 +310,9 @@ class MeleeCombatAction(CreatureAction):
         pro_attack = MeleeCombatResolver(self.protagonist, self.target)
         ant_attack = MeleeCombatResolver(self.target, self.protagonist)
         attacks = [pro_attack, ant_attack]
+        rng = self.protagonist.rng
 
-        random.shuffle(attacks)
+        rng.shuffle(attacks)
         has_result = {attack : attack.generate_attack_results(force_nodefence=True) for attack in attacks}
 
         pro_crit_level = pro_attack.attacker_crit + ant_attack.defender_crit
@@ -323,15 +324,15 @@ class MeleeCombatAction(CreatureAction):
         ant_attack.attacker_crit = min(max(0, ant_crit_level - pro_crit_level), Contest.MAX_CRIT)
         ant_attack.defender_crit = 0
 
-        random.shuffle(attacks)
+        rng.shuffle(attacks)
         for attack in attacks:
             if has_result[attack]: attack.resolve_critical_effects()
 
-        random.shuffle(attacks)
+        rng.shuffle(attacks)
         for attack in attacks:
             if has_result[attack]: attack.resolve_damage()
 
-        random.shuffle(attacks)
+        rng.shuffle(attacks)
         for attack in attacks:
             if has_result[attack]: attack.resolve_secondary_attacks()
 
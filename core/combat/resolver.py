@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 import math
-import random
 from typing import TYPE_CHECKING, MutableSequence, Optional, Iterable, Type, Tuple, Any, Collection
 
 from core.constants import Stance
@@ -9,6 +8,8 @@ from core.contest import OpposedResult, UnopposedResult, ContestResult, Difficul
 from core.combat.criticals import DEFAULT_CRITICALS, CriticalUsage
 from core.combat.damage import DamageType
 from core.creature.traits import EvadeTrait
+from core.events import AttackDeclared, ContestRolled, BlockAttempted, CriticalApplied, AttackHit
+from core.profiling import profile_phase
 
 if TYPE_CHECKING:
     from core.dice import DicePool
@@ -28,7 +29,7 @@ def get_parry_damage_mult(attack_force: AttackForce, defend_force: AttackForce)
 
 def get_random_hitloc(creature: Creature) -> Optional[BodyPart]:
     bodyparts = [ (bp, bp.exposure) for bp in creature.get_bodyparts() ]
-    result = random.choices(*zip(*bodyparts))
+    result = creature.rng.choices(*zip(*bodyparts))
     if len(result) > 0:
         return result[0]
     return None
@@ -66,6 +67,7 @@ class MeleeCombatResolver:
 
         self.attacker = attacker
         self.defender = defender
+        self.profiler = attacker.profiler
         self.use_attack = use_attack
         self.use_defence = use_defence
 
@@ -96,11 +98,11 @@ class MeleeCombatResolver:
         if creature.stance == Stance.Crouching:
             used = int(total / 2)
         elif creature.stance == Stance.Standing:
-            used = min(total / 2 + 1, total - 1)
+            used = min(total // 2 + 1, total - 1)
         used = min(used, current)
 
         stance_parts = list(bp for bp in creature.get_bodyparts() if bp.is_stance_part())
-        return random.sample(stance_parts, used)
+        return creature.rng.sample(stance_parts, used)
 
     @property
     def attack_result(self) -> ContestResult:
@@ -128,27 +130,29 @@ class MeleeCombatResolver:
 
         # Choose Attack
         if self.use_attack is None or not self.use_attack.can_attack(self.separation):
-            attacks = (attack for attack in self.attacker.get_melee_attacks() if attack.source not in self.used_sources)
-            self.use_attack = self.attacker.mind.get_melee_attack(self.defender, self.separation, attacks)
+            with profile_phase(self.profiler, 'resolver.choose_attack'):
+                attacks = (attack for attack in self.attacker.get_melee_attacks() if attack.source not in self.used_sources)
+                self.use_attack = self.attacker.mind.get_melee_attack(self.defender, self.separation, attacks)
         if self.use_attack is None or not self.use_attack.can_attack(self.separation):
             return False # no attack happens
 
         if opportunity_attack:
-            self._resolve_melee_evade()
-            return True
-        if force_nodefence:
-            self._resolve_melee_nodefence()
-            return True
-
-        # Choose Defence
-        if self.use_defence is None or not self.use_defence.can_defend(self.separation):
-            defence = (defence for defence in self.defender.get_melee_attacks() if defence.source not in self.used_sources)
-            self.use_defence = self.defender.mind.get_melee_defence(self.attacker, self.use_attack, self.separation, defence)
-        if self.use_defence is None or not self.use_defence.can_defend(self.separation):
-            self._resolve_melee_nodefence()
-            return True
+            resolve_contest = self._resolve_melee_evade
+        elif force_nodefence:
+            resolve_contest = self._resolve_melee_nodefence
+        else:
+            # Choose Defence
+            if self.use_defence is None or not self.use_defence.can_defend(self.separation):
+                with profile_phase(self.profiler, 'resolver.choose_defence'):
+                    defence = (defence for defence in self.defender.get_melee_attacks() if defence.source not in self.used_sources)
+                    self.use_defence = self.defender.mind.get_melee_defence(self.attacker, self.use_attack, self.separation, defence)
+            if self.use_defence is None or not self.use_defence.can_defend(self.separation):
+                resolve_contest = self._resolve_melee_nodefence
+            else:
+                resolve_contest = self._resolve_melee_defence
 
-        self._resolve_melee_defence()
+        with profile_phase(self.profiler, 'resolver.contest'):
+            resolve_contest()
         return True
 
     def _resolve_melee_defence(self) -> None:
@@ -159,8 +163,10 @@ class MeleeCombatResolver:
         defend_result = ContestResult(self.defender, self.use_defence.combat_test, defend_modifier)
         primary_result = OpposedResult(attack_result, defend_result)
 
-        print(f'{self.attacker} attacks {self.defender} at {self.separation} distance: {self.use_attack.name} vs {self.use_defence.name}!')
-        print(primary_result.format_details())
+        events = self.attacker.events
+        events.emit(AttackDeclared, attacker=self.attacker, defender=self.defender, separation=self.separation,
+                    attack=self.use_attack, defence=self.use_defence)
+        events.emit(ContestRolled, result=primary_result)
 
         damage_mult = 1.0
         if not primary_result.success:
@@ -197,8 +203,10 @@ class MeleeCombatResolver:
         evade_result = ContestResult(self.defender, SKILL_EVADE, evade_modifier)
         primary_result = OpposedResult(attack_result, evade_result)
 
-        print(f'{self.attacker} attacks {self.defender} at {self.separation} distance: {self.use_attack.name} vs {SKILL_EVADE}!')
-        print(primary_result.format_details())
+        events = self.attacker.events
+        events.emit(AttackDeclared, attacker=self.attacker, defender=self.defender, separation=self.separation,
+                    attack=self.use_attack, defence=SKILL_EVADE)
+        events.emit(ContestRolled, result=primary_result)
 
         damage_mult = 1.0 if primary_result.success else 0.0
 
@@ -232,8 +240,10 @@ class MeleeCombatResolver:
 
         attack_result = ContestResult(self.attacker, self.use_attack.combat_test, attack_modifier)
         primary_result = UnopposedResult(attack_result, attack_target)
-        print(f'{self.attacker} attacks {self.defender} at {self.separation} distance: {self.use_attack.name} vs no defence!')
-        print(primary_result.format_details())
+        events = self.attacker.events
+        events.emit(AttackDeclared, attacker=self.attacker, defender=self.defender, separation=self.separation,
+                    attack=self.use_attack, defence=None)
+        events.emit(ContestRolled, result=primary_result)
 
         damage_mult = 1.0 if primary_result.success else 0.0
 
@@ -259,50 +269,51 @@ class MeleeCombatResolver:
         self.used_sources.append(self.use_attack.source)
 
     def _resolve_shield_block(self, attack_result: ContestResult, damage_mult: float) -> Tuple[bool, float]:
-        blocks = (block for block in self.defender.get_shield_blocks() if block.source not in self.used_sources)
-        self.use_shield = self.defender.mind.get_melee_block(self.separation, blocks)
-        if self.use_shield is not None and self.use_shield.can_block(self.separation):
-            block_damage_mult = get_parry_damage_mult(self.use_attack.force, self.use_shield.force)
-            if block_damage_mult < damage_mult:
-                modifier = get_block_difficulty(self.defender).to_modifier() + self.use_shield.contest_modifier
-                shield_result = ContestResult(self.defender, self.use_shield.combat_test, modifier)
-                block_result = OpposedResult(shield_result, attack_result)
+        with profile_phase(self.profiler, 'resolver.block'):
+            blocks = (block for block in self.defender.get_shield_blocks() if block.source not in self.used_sources)
+            self.use_shield = self.defender.mind.get_melee_block(self.separation, blocks)
+            if self.use_shield is not None and self.use_shield.can_block(self.separation):
+                block_damage_mult = get_parry_damage_mult(self.use_attack.force, self.use_shield.force)
+                if block_damage_mult < damage_mult:
+                    modifier = get_block_difficulty(self.defender).to_modifier() + self.use_shield.contest_modifier
+                    shield_result = ContestResult(self.defender, self.use_shield.combat_test, modifier)
+                    block_result = OpposedResult(shield_result, attack_result)
 
-                print(f'{self.defender} attempts to block with {self.use_shield.source}!')
-                print(block_result.format_details())
+                    self.defender.events.emit(BlockAttempted, defender=self.defender, shield=self.use_shield.source, result=block_result)
 
-                self.used_sources.append(self.use_shield.source)
-                if block_result.success:
-                    return True, block_damage_mult
+                    self.used_sources.append(self.use_shield.source)
+                    if block_result.success:
+                        return True, block_damage_mult
 
-        return False, damage_mult
+            return False, damage_mult
 
     def _resolve_evade_knockdown(self):
         if self.defender.stance > Stance.Prone:
             acro_test = ContestResult(self.defender, SKILL_ACROBATICS, self.defender.get_resist_knockdown_modifier())
             acro_result = OpposedResult(acro_test, self.attack_result)
-            print(acro_result.format_details())
+            self.defender.events.emit(ContestRolled, result=acro_result)
             if not acro_result.success:
                 self.defender.knock_down()
 
     def resolve_critical_effects(self) -> None:
-        if self.attacker_crit > 0:
-            crit_usage = CriticalUsage.Offensive|CriticalUsage.Melee
-            criticals = list(DEFAULT_CRITICALS)
-            criticals.extend(self.use_attack.get_criticals())
-            criticals = set(crit for crit in criticals if crit_usage in crit.usage)
-            for i in range(self.attacker_crit):
-                if not self._apply_critical_effect(self.attacker, crit_usage, criticals):
-                    break
-
-        if self.defender_crit > 0:
-            crit_usage = CriticalUsage.Defensive|CriticalUsage.Melee
-            criticals = list(DEFAULT_CRITICALS)
-            criticals.extend(self.use_defence.get_criticals())
-            criticals = set(crit for crit in criticals if crit_usage in crit.usage)
-            for i in range(self.defender_crit):
-                if not self._apply_critical_effect(self.defender, crit_usage, criticals):
-                    break
+        with profile_phase(self.profiler, 'resolver.criticals'):
+            if self.attacker_crit > 0:
+                crit_usage = CriticalUsage.Offensive|CriticalUsage.Melee
+                criticals = list(DEFAULT_CRITICALS)
+                criticals.extend(self.use_attack.get_criticals())
+                criticals = dict.fromkeys(crit for crit in criticals if crit_usage in crit.usage)
+                for i in range(self.attacker_crit):
+                    if not self._apply_critical_effect(self.attacker, crit_usage, criticals):
+                        break
+
+            if self.defender_crit > 0:
+                crit_usage = CriticalUsage.Defensive|CriticalUsage.Melee
+                criticals = list(DEFAULT_CRITICALS)
+                criticals.extend(self.use_defence.get_criticals())
+                criticals = dict.fromkeys(crit for crit in criticals if crit_usage in crit.usage)
+                for i in range(self.defender_crit):
+                    if not self._apply_critical_effect(self.defender, crit_usage, criticals):
+                        break
 
     def _apply_critical_effect(self,
                                user: Creature,
@@ -313,34 +324,30 @@ class MeleeCombatResolver:
 
         if len(choices) > 0:
             #print([c.name for c in choices])
-            crit = random.choices(choices, [c.weight for c in choices])[0]
+            crit = user.rng.choices(choices, [c.get_weight(usage) for c in choices])[0]
 
-            print(f'({user}) !Critical Effect - {crit}!')
+            user.events.emit(CriticalApplied, user=user, critical=crit)
             crit.apply()
             return True
         return False
 
     def resolve_damage(self) -> None:
-        if self.hitloc is None:
-            return
-        if self.damage_mult <= 0:
-            return
+        with profile_phase(self.profiler, 'resolver.damage'):
+            if self.hitloc is None:
+                return
+            if self.damage_mult <= 0:
+                return
 
-        damage = self.damage.get_roll_result() * self.damage_mult
-        armpen = self.armpen.get_roll_result() * self.damage_mult
-
-        if armpen > 0:
-            dam_text = f'{damage:.0f}/{armpen:.0f}*'
-        else:
-            dam_text = f'{damage:.0f}'
+            damage = self.damage.get_roll_result(self.attacker.rng) * self.damage_mult
+            armpen = self.armpen.get_roll_result(self.attacker.rng) * self.damage_mult
 
-        mult_text = f' (x{self.damage_mult:.1f})' if self.damage_mult != 1.0 else ''
-        print(f'{self.attacker} strikes {self.defender} in the {self.hitloc} for {dam_text} damage{mult_text}: {self.use_attack.name}!')
+            self.attacker.events.emit(AttackHit, attacker=self.attacker, defender=self.defender, hitloc=self.hitloc,
+                                      attack=self.use_attack, damage=damage, armpen=armpen, damage_mult=self.damage_mult)
 
-        wounds = self.hitloc.apply_damage(damage, armpen, self.attack_result)
+            wounds = self.hitloc.apply_damage(damage, armpen, self.attack_result)
 
-        # knockdown due to damage
-        self._resolve_knockdown((damage + wounds)/2)  # blocked damage is only counted as half for knockdown
+            # knockdown due to damage
+            self._resolve_knockdown((damage + wounds)/2)  # blocked damage is only counted as half for knockdown
 
     def _resolve_knockdown(self, damage: float) -> None:
         knockdown_threshold = self.defender.size
@@ -359,17 +366,18 @@ class MeleeCombatResolver:
 
             acro_result = ContestResult(self.defender, SKILL_ACROBATICS, modifier)
             test_result = UnopposedResult(acro_result)
-            print(test_result.format_details())
+            self.defender.events.emit(ContestRolled, result=test_result)
             if not test_result.success:
                 self.defender.knock_down()
 
     def resolve_secondary_attacks(self) -> None:
-        resolved = []
-        for secondary in self.seconary_attacks:
-            if secondary.generate_attack_results():
-                secondary.resolve_critical_effects()
-                secondary.resolve_damage()
-                resolved.append(secondary)
-
-        for secondary in resolved:
-            secondary.resolve_secondary_attacks()
+        with profile_phase(self.profiler, 'resolver.secondary'):
+            resolved = []
+            for secondary in self.seconary_attacks:
+                if secondary.generate_attack_results():
+                    secondary.resolve_critical_effects()
+                    secondary.resolve_damage()
+                    resolved.append(secondary)
+
+            for secondary in resolved:
+                secondary.resolve_secondary_attacks()
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import math
-from typing import TYPE_CHECKING, Iterable, Type, Mapping, Optional, Union, Any, Sequence, Tuple
+from bisect import bisect_left
+from typing import TYPE_CHECKING, Iterable, Type, Mapping, MutableMapping, NamedTuple, Optional, Union, Any, Sequence
 
 from core.combat.attacktraits import NaturalWeaponTrait, AttackTrait
 from core.dice import dice
@@ -11,11 +12,18 @@ from core.combat.damage import DamageType
 from core.contest import CombatSkillClass
 
 if TYPE_CHECKING:
+    from core.constants import CreatureSize
     from core.creature.template import CreatureTemplate
     from core.combat.criticals import CriticalEffect
 
-def _create_table(table_data: Mapping[float, Any]) -> Sequence[Tuple[float, Any]]:
-    return [(k,v) for k,v in sorted(table_data.items())]
+## rows of a table keyed by creature size, sorted by key so that the nearest row can be found by bisection
+class _SizeTable(NamedTuple):
+    keys: Sequence[float]
+    values: Sequence[Any]
+
+def _create_table(table_data: Mapping[float, Any]) -> _SizeTable:
+    keys = sorted(table_data.keys())
+    return _SizeTable(keys, [ table_data[k] for k in keys ])
 
 _DAMAGE_TABLE = _create_table({
       0 : dice(0),
@@ -63,10 +71,14 @@ _ARMOR_PEN_TABLE = _create_table({
     128 : dice(1,10) + dice(2,6),
 })
 
-def _table_lookup(table: Sequence[Tuple[float, Any]], key: float, shift: int = 0) -> Any:
-    _, idx = min( (abs(key - pair[0]), idx) for idx, pair in enumerate(table) )
-    _, result = table[ max(0, min(idx + shift, len(table) - 1)) ]
-    return result
+def _table_lookup(table: _SizeTable, key: float, shift: int = 0) -> Any:
+    """Find the row nearest to the key, preferring the lower row if the key is halfway between two,
+    then shift by the given number of rows without going past either end of the table"""
+    keys = table.keys
+    idx = bisect_left(keys, key)
+    if idx == len(keys) or (idx > 0 and key - keys[idx - 1] <= keys[idx] - key):
+        idx -= 1
+    return table.values[max(0, min(idx + shift, len(keys) - 1))]
 
 ## min,max reach at Medium size
 BASE_MAX_REACH = 1.0   # REACH_SHORT
@@ -120,24 +132,33 @@ class NaturalWeapon:
         if template.armpen is not None or (armpen is not None and armpen >= 0): # reducing armpen on a weapon that does not have armpen should not grant it
             self.armpen = (template.armpen or 0) + (armpen or 0)
 
+        # the attack only depends on the size of the creature, so it is created once per size
+        self._attacks: MutableMapping[CreatureSize, MeleeAttackTemplate] = {}
+
     def as_template(self) -> NaturalWeaponTemplate:
         return NaturalWeaponTemplate(
             self.name, self.damtype, self.force, self.reach, self.min_reach, self.damage, self.armpen, self.criticals
         )
 
     def create_attack(self, creature: CreatureTemplate) -> MeleeAttackTemplate:
-        rel_size = creature.size/SizeCategory.Medium.to_size()
+        attack = self._attacks.get(creature.size)
+        if attack is None:
+            attack = self._attacks[creature.size] = self._create_attack(creature.size)
+        return attack
+
+    def _create_attack(self, size: CreatureSize) -> MeleeAttackTemplate:
+        rel_size = size/SizeCategory.Medium.to_size()
 
         max_reach = BASE_MAX_REACH * rel_size + self.reach
         min_reach = BASE_MIN_REACH * rel_size + (self.reach + self.min_reach)
 
         force = FORCE_MEDIUM.get_step(round(math.log2(rel_size) + self.force))
 
-        damage = _table_lookup(_DAMAGE_TABLE, float(creature.size), self.damage + self.force)
+        damage = _table_lookup(_DAMAGE_TABLE, float(size), self.damage + self.force)
 
         armor_pen = None
         if self.damtype == DamageType.Bludgeon or self.armpen is not None:
-            armor_pen = _table_lookup(_ARMOR_PEN_TABLE, float(creature.size), (self.armpen or 0) + self.force)
+            armor_pen = _table_lookup(_ARMOR_PEN_TABLE, float(size), (self.armpen or 0) + self.force)
 
         return MeleeAttackTemplate(
             name = self.name,
@@ -5,19 +5,22 @@ Creatures may also have traits that grant a certain level of expertise (valid le
 """
 from __future__ import annotations
 
-import itertools
+import math
 from enum import Enum
 from collections import Counter
 from functools import lru_cache, total_ordering
-from typing import TYPE_CHECKING, Iterable, Sequence, Mapping, NamedTuple
+from typing import TYPE_CHECKING, Iterable, Sequence, Mapping, MutableMapping, NamedTuple, Optional, Any
+
+import numpy as np
 
 from core.constants import PrimaryAttribute
 from core.dice import dice
+from core.rng import get_default_stream
 from core.creature.traits import FinesseTrait
 if TYPE_CHECKING:
     from core.creature import Creature
 
-_PRECALC_TABLES = False
+_PRECALC_TABLES = True
 _LEVEL_NUMERALS = ['I', 'II', 'III', 'IV', 'V']
 
 # by default skill level is 0, which grants no bonuses
@@ -51,6 +54,11 @@ class SkillLevel(Enum):
     def __repr__(self) -> str:
         return f'{self.__class__.__name__}({self.value})'
 
+_CONTESTS: MutableMapping[str, Contest] = {}
+
+def get_contest(name: str) -> Contest:
+    return _CONTESTS[name]
+
 class Contest:
     BASE_DICE = 3
     BASE_SIDES = 8
@@ -62,6 +70,12 @@ class Contest:
         self.name = name
         self.key_attr: Sequence[PrimaryAttribute] = tuple(PrimaryAttribute[s] for s in key_attr)
         self.innate = innate  # innate skills cannot recieve a negative modifier for low skill level
+        _CONTESTS[name] = self
+
+    # contests are compared by identity (e.g. in SkillTrait keys and CombatSkillClass),
+    # so pickle them by name to get the same instance back, e.g. when sending templates to worker processes
+    def __reduce__(self) -> Any:
+        return get_contest, (self.name,)
 
     def __repr__(self) -> str:
         return f'<{self.__class__.__name__}: {self.name}>'
@@ -84,6 +98,15 @@ class Contest:
             return 0
         return modifier
 
+    def roll_many(self, protagonist: Creature, n: int, modifier: ContestModifier = None,
+                  rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """Returns an array of n independent contest totals, equivalent to ContestResult.contest_total"""
+        skill_level = protagonist.get_skill_level(self)
+        contest_mod = self.get_attribute_modifier(protagonist) + self.get_skill_modifier(skill_level)
+        if modifier is not None:
+            contest_mod += modifier.contest
+        return roll_base_many(skill_level.bonus_dice, n, rng) + contest_mod
+
     def get_success_chance(self, protagonist: Creature, target: int) -> float:
         skill_level = protagonist.get_skill_level(self)
         target -= self.get_attribute_modifier(protagonist) + self.get_skill_modifier(skill_level)
@@ -103,8 +126,42 @@ class Contest:
         ant_mod = ant_contest.get_attribute_modifier(antagonist) + ant_contest.get_skill_modifier(ant_level)
 
         target = ant_mod - pro_mod - modifier
-        roll_table = get_opposed_roll_table(pro_level.bonus_dice, ant_level.bonus_dice)
-        return sum(p for result, p in roll_table.items() if result > target)
+        return get_opposed_success_chance(pro_level.bonus_dice, ant_level.bonus_dice, target)
+
+    @staticmethod
+    def get_opposed_outcomes(protagonist: Creature, pro_contest: Contest,
+                             antagonist: Creature, ant_contest: Contest = None,
+                             modifier: ContestModifier = None) -> Mapping[ContestOutcome, float]:
+        """The exact probability of each (success, crit level) outcome of an OpposedResult between the protagonist and
+        antagonist, where the modifier is applied to the protagonist (e.g. from a DifficultyGrade)."""
+        ant_contest = ant_contest or pro_contest
+        modifier = modifier or ContestModifier()
+        pro_level = protagonist.get_skill_level(pro_contest)
+        ant_level = antagonist.get_skill_level(ant_contest)
+
+        contest_delta = (
+            pro_contest.get_attribute_modifier(protagonist) + pro_contest.get_skill_modifier(pro_level) + modifier.contest
+            - ant_contest.get_attribute_modifier(antagonist) - ant_contest.get_skill_modifier(ant_level)
+        )
+        crit_delta = pro_contest.get_crit_modifier(pro_level) + modifier.critical - ant_contest.get_crit_modifier(ant_level)
+        return get_opposed_outcome_table(pro_level.bonus_dice, ant_level.bonus_dice, contest_delta, crit_delta)
+
+    def get_unopposed_outcomes(self, protagonist: Creature, target: int,
+                               modifier: ContestModifier = None) -> Mapping[ContestOutcome, float]:
+        """The exact probability of each (success, crit level) outcome of an UnopposedResult against the target.
+        As in MeleeCombatResolver, a failure has no crit level."""
+        modifier = modifier or ContestModifier()
+        skill_level = protagonist.get_skill_level(self)
+        contest_mod = self.get_attribute_modifier(protagonist) + self.get_skill_modifier(skill_level) + modifier.contest
+        crit_mod = self.get_crit_modifier(skill_level) + modifier.critical
+
+        result = Counter()
+        for roll, p in get_roll_table(skill_level.bonus_dice).items():
+            if roll + contest_mod > target:
+                result[ContestOutcome(True, get_crit_level(roll + crit_mod - target))] += p
+            else:
+                result[ContestOutcome(False, 0)] += p
+        return dict(sorted(result.items()))
 
 class DifficultyGrade(Enum):
     VeryEasy   = +5
@@ -161,7 +218,7 @@ class ContestResult:
 
     def reroll(self) -> None:
         contest_dice = dice(Contest.BASE_DICE + self.skill_level.bonus_dice, Contest.BASE_SIDES)
-        self.base_result = sorted(contest_dice.get_roll(), reverse=True)[:Contest.BASE_DICE]
+        self.base_result = sorted(contest_dice.get_roll(self.protagonist.rng), reverse=True)[:Contest.BASE_DICE]
         self.base_total = sum(self.base_result)
 
     # the modifier from skill level - does not include the situational modifier
@@ -183,8 +240,16 @@ class ContestResult:
         return self.base_total + self.crit_modifier + self.modifier.critical
 
     def get_crit_level(self, versus: int) -> int:
-        crit = int((self.crit_total - versus - 1) / Contest.CRIT_THRESH)
-        return min(max(0, crit), Contest.MAX_CRIT)
+        return get_crit_level(self.crit_total - versus)
+
+def get_crit_level(margin: int) -> int:
+    """The crit level given the margin between the winner's crit total and the loser's"""
+    crit = int((margin - 1) / Contest.CRIT_THRESH)
+    return min(max(0, crit), Contest.MAX_CRIT)
+
+class ContestOutcome(NamedTuple):
+    success: bool
+    crit_level: int
 
 class UnopposedResult:
     DEFAULT_TARGET = 13  # 50% chance of success
@@ -254,20 +319,49 @@ class OpposedResult:
             f'{success_text} (crit level: {self.crit_level})'
         )
 
+def roll_base_many(bonus_dice: int, n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """Returns an array of n independent base totals, keeping the highest BASE_DICE of the rolled dice"""
+    rng = rng or get_default_stream().numpy()
+    numdice = Contest.BASE_DICE + bonus_dice
+    rolls = rng.integers(1, Contest.BASE_SIDES + 1, size=(n, numdice))
+    if bonus_dice > 0:
+        rolls = np.partition(rolls, bonus_dice, axis=1)[:, bonus_dice:]
+    return rolls.sum(axis=1)
+
 @lru_cache
 def get_roll_table(bonus_dice: int) -> Mapping[int, float]:
-    if bonus_dice > 5:
-        raise ValueError  # it's going to take too long
+    return get_keep_highest_table(Contest.BASE_DICE + bonus_dice, Contest.BASE_DICE, Contest.BASE_SIDES)
 
+@lru_cache
+def get_keep_highest_table(numdice: int, keep: int, sides: int) -> Mapping[int, float]:
+    """Exact distribution of the sum of the highest (keep) dice out of (numdice) rolled dice with (sides) sides.
+
+    Instead of enumerating every roll, dice are assigned to faces starting from the highest face. Since the
+    highest faces are assigned first, the dice assigned so far are exactly the ones kept, so it is enough to track
+    (dice assigned, sum of kept dice) along with the number of rolls that lead to that state. Once all of the kept
+    dice have been assigned the sum is final, and the remaining dice can show any lower face.
+    """
+    keep = min(keep, numdice)
     result = Counter()
-    for roll in itertools.product(list(range(1, Contest.BASE_SIDES + 1)), repeat = Contest.BASE_DICE + bonus_dice):
-        roll_value = sum( sorted(roll, reverse=True)[:Contest.BASE_DICE] )
-        result[roll_value] += 1
-
-    total = sum(result.values())
+    states = Counter({(0, 0): 1})
+    for face in range(sides, 0, -1):
+        next_states = Counter()
+        for (assigned, total), count in states.items():
+            remaining = numdice - assigned
+            for on_face in range(remaining + 1):
+                ways = count * math.comb(remaining, on_face)
+                kept = min(assigned + on_face, keep)
+                roll_value = total + (kept - assigned)*face
+                if kept >= keep:
+                    result[roll_value] += ways * (face - 1)**(remaining - on_face)
+                else:
+                    next_states[kept, roll_value] += ways
+        states = next_states
+
+    num_rolls = sides ** numdice
     return {
-        roll_value : count / total
-        for roll_value, count in result.items()
+        roll_value : count / num_rolls
+        for roll_value, count in sorted(result.items())
     }
 
 # precalculate for all normal skill levels
@@ -287,6 +381,28 @@ def get_opposed_roll_table(bonus_dice: int, opponent_dice: int) -> Mapping[int,
     #print(sum(result.values()))
     return dict(result)
 
+@lru_cache(maxsize=None)
+def get_opposed_success_chance(bonus_dice: int, opponent_dice: int, target: int) -> float:
+    """Probability that the difference between the protagonist's and antagonist's base rolls exceeds the target"""
+    roll_table = get_opposed_roll_table(bonus_dice, opponent_dice)
+    return sum(p for result, p in roll_table.items() if result > target)
+
+@lru_cache(maxsize=None)
+def get_opposed_outcome_table(bonus_dice: int, opponent_dice: int,
+                              contest_delta: int = 0, crit_delta: int = 0) -> Mapping[ContestOutcome, float]:
+    """Joint distribution of (success, crit level) for an opposed contest.
+
+    The deltas are the protagonist's total modifiers minus the antagonist's, for the contest total and the crit total.
+    The winner's crit level depends on the margin between the two crit totals, as in OpposedResult.crit_level.
+    """
+    result = Counter()
+    for roll_diff, p in get_opposed_roll_table(bonus_dice, opponent_dice).items():
+        if roll_diff + contest_delta > 0:
+            result[ContestOutcome(True, get_crit_level(roll_diff + crit_delta))] += p
+        else:
+            result[ContestOutcome(False, get_crit_level(-roll_diff - crit_delta))] += p
+    return dict(sorted(result.items()))
+
 ## Standard Contest Types
 
 SKILL_ENDURANCE  = Contest('Endurance',  ['CON', 'CON'], innate=True)
@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING, Optional
 
 from core.action import Action
 from core.constants import Stance
+from core.events import StanceChanged, ItemEquipped, ItemUnequipped
 
 if TYPE_CHECKING:
     from core.creature import Creature
@@ -106,15 +107,9 @@ class ChangeStanceAction(CreatureAction):
     def resolve(self) -> Optional[Action]:
         if self.owner.stance != self.target_stance:
             self.owner.change_stance(self.target_stance)
-            print(f'{self.owner} {self._action_text[self.owner.stance]}.')
+            self.owner.events.emit(StanceChanged, creature=self.owner, stance=self.owner.stance)
         return None
 
-    _action_text = {
-        Stance.Standing : 'gets up',
-        Stance.Crouching : 'crouches',
-        Stance.Prone    : 'goes prone',
-    }
-
 ## Movement related actions...
 ## Mount/unmount
 ## figure out how stance (standing/crouching/prone) and movement speed (walk/run/sprint) are supposed to work
@@ -144,11 +139,11 @@ class SwitchHeldItemAction(CreatureAction):
 
         for item in self.unequip_items:
             if inventory.unequip_item(item):
-                print(f'{self.protagonist} unequips {item}.')
+                self.protagonist.events.emit(ItemUnequipped, creature=self.protagonist, item=item)
         if self.equip_item is not None:
             min_hands, max_hands = self.equip_item.get_required_hands(self.protagonist)
             if inventory.try_equip_item(self.equip_item, use_hands=max_hands):
-                print(f'{self.protagonist} equips {self.equip_item}.')
+                self.protagonist.events.emit(ItemEquipped, creature=self.protagonist, item=self.equip_item)
 
         return None
 
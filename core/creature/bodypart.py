@@ -4,23 +4,22 @@ from typing import TYPE_CHECKING, Iterable, Optional
 
 from core.creature.bodyplan import BodyPartFlag, BodyElementType
 from core.contest import ContestResult, DifficultyGrade, OpposedResult, UnopposedResult, SKILL_ENDURANCE
+from core.events import DamageApplied, HealthChanged, ContestRolled, Injury, ItemDropped
 
 if TYPE_CHECKING:
     from core.creature import Creature
-    from core.creature.bodyplan import BodyElement
+    from core.creature.template import BodyPartSpec
     from core.combat.attack import MeleeAttack
 
 class BodyPart:
-    def __init__(self, parent: Creature, template: BodyElement):
+    __slots__ = ('parent', 'template', 'size', '_injured', '_unarmed_attacks')
+
+    def __init__(self, parent: Creature, spec: BodyPartSpec):
         self.parent = parent
-        self.template = template
-        self.size = parent.bodyplan.get_relative_size(self.id_tag)
+        self.template = spec.element
+        self.size = spec.size
         self._injured = False
-
-        self._unarmed_attacks = [
-            natural_weapon.create_attack(parent.template)
-            for natural_weapon in template.attacks
-        ]
+        self._unarmed_attacks = spec.attacks
 
     def __repr__(self) -> str:
         return f'<{self.__class__.__name__}({self.parent}:{self.id_tag})>'
@@ -51,6 +50,9 @@ class BodyPart:
     def can_use(self) -> bool:
         return not self._injured
 
+    def reset(self) -> None:
+        self._injured = False
+
     def is_vital(self) -> bool:
         return BodyPartFlag.VITAL in self.flags
 
@@ -67,9 +69,7 @@ class BodyPart:
     ## Armor and Damage
 
     def get_armor(self) -> float:
-        armor_values = (item.armor_value.get(self.id_tag, 0) for item in self.parent.inventory.get_armor_items())
-        equipped_armor = max(armor_values, default = 0)
-        return max(equipped_armor, self.natural_armor, 0)
+        return self.parent.inventory.get_armor(self.id_tag)
 
     def get_effective_damage(self, damage: float, armpen: float = 0) -> float:
         """Calculates the amount of health that would be lost if damage is applied to this BodyPart"""
@@ -82,6 +82,13 @@ class BodyPart:
             damage *= 1.5
         return max(damage, 0)
 
+    def get_wound_multiplier(self) -> float:
+        if not self.is_vital():
+            return 1/1.5
+        if self.template.type == BodyElementType.HEAD:
+            return 1.5
+        return 1.0
+
     def apply_damage(self, damage: float, armpen: float = 0, attack_result: Optional[ContestResult] = None) -> float:
         if damage <= 0:
             return 0
@@ -95,14 +102,12 @@ class BodyPart:
         elif self.template.type == BodyElementType.HEAD:
             wound *= 1.5
 
+        events = self.parent.events
+        events.emit(DamageApplied, creature=self.parent, bodypart=self, wound=wound, armor=armor)
         if wound > 0:
-            armor_text = f' (armour {armor})' if armor > 0 else ''
-            print(f'{self.parent} is wounded for {wound:.0f} damage{armor_text}.')
             self._injury_check(wound, attack_result)
             self.parent.apply_wounds(wound, self, attack_result)
-        else:
-            print(f'The armor absorbs the blow (armour {armor}).')
-        print(f'{self.parent} health: {round(self.parent.health)}/{self.parent.max_health}')
+        events.emit(HealthChanged, creature=self.parent, health=self.parent.health, max_health=self.parent.max_health)
 
         return wound
 
@@ -114,13 +119,15 @@ class BodyPart:
             injury_test = ContestResult(self.parent, SKILL_ENDURANCE, grade.to_modifier())
             injury_result = OpposedResult(injury_test, attack_result) if attack_result is not None else UnopposedResult(injury_test)
 
-            print(injury_result.format_details())
+            self.parent.events.emit(ContestRolled, result=injury_result)
             if not injury_result.success:
-                print(f'{self.parent} suffers an injury to the {self}.')
+                self.parent.events.emit(Injury, creature=self.parent, bodypart=self)
                 self.injure_part()
 
     def injure_part(self) -> None:
         self._injured = True
+        self.parent.invalidate_attack_cache()
+        self.parent.armor_version += 1
         if self.is_stance_part():
             self.parent.check_stance()
         if self.is_vital():
@@ -136,4 +143,4 @@ class BodyPart:
                 inventory.unequip_item(item)
                 if not inventory.try_equip_item(item, use_hands=use_hands):
                     self.parent.inventory.remove(item)
-                    print(f'{self.parent} drops the {item}.')
+                    self.parent.events.emit(ItemDropped, creature=self.parent, item=item)
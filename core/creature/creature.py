@@ -9,6 +9,8 @@ from core.creature.bodypart import BodyPart
 from core.creature.inventory import Inventory
 from core.creature.mind.combat import CreatureMind
 from core.creature.actions import StunnedAction
+from core.combat.damage import ExpectedDamageTable
+from core.events import ContestRolled, StanceLost, Knockdown, Death, Incapacitated, SeriouslyWounded
 from core.contest import (
     Contest, ContestResult, ContestModifier, DifficultyGrade, SkillLevel,
     OpposedResult, UnopposedResult, SKILL_RIDING, SKILL_ENDURANCE,
@@ -16,6 +18,7 @@ from core.contest import (
 
 if TYPE_CHECKING:
     from core.constants import CreatureSize
+    from random import Random
     from core.combat.attack import MeleeAttack
     from core.combat.shield import ShieldBlock
     from core.combat.melee import MeleeCombat
@@ -24,30 +27,49 @@ if TYPE_CHECKING:
     from core.creature.traits import CreatureTrait
 
 class Creature(Entity):
+    __slots__ = (
+        'loop', 'template', 'spec', 'name', 'mind', '_stance', '_health', '_conscious', '_alive', '_bodyparts',
+        'armor_version', 'expected_damage', '_traits', '_mount', '_riders', '_melee_combat',
+        '_melee_attacks', '_unarmed_attacks', '_shield_blocks', '_initiative_modifier', 'inventory',
+    )
+
     health: float
     inventory: Inventory
 
-    def __init__(self, template: CreatureTemplate, mind: CreatureMind = None):
+    def __init__(self, template: CreatureTemplate, mind: CreatureMind = None, rng: Random = None):
+        self.loop = None
         self.template = template
+        self.spec = template.compile()
         self.name = template.name
         self.mind = mind or CreatureMind(self)
 
         self._stance = Stance.Standing
-        self._health = template.max_health
+        self._health = self.spec.max_health
         self._conscious = True
         self._alive = True
 
-        self._bodyparts = { bp.id_tag : BodyPart(self, bp) for bp in template.bodyplan }
-        self._traits = { trait.key : trait for trait in template.get_traits() }
+        self._bodyparts = { spec.element.id_tag : BodyPart(self, spec) for spec in self.spec.bodyparts }
+
+        # incremented whenever armor is added or removed or a bodypart is injured
+        self.armor_version = 0
+        self.expected_damage = ExpectedDamageTable(self)
+        self._traits = { trait.key : trait for trait in self.spec.traits }
 
         self._mount: Optional[Creature] = None
         self._riders: Set[Creature] = set()
 
         self._melee_combat: MutableMapping[Creature, MeleeCombat] = {}
 
+        # the attacks and blocks available are cached until something that could change them happens
+        self._melee_attacks: Optional[Tuple[MeleeAttack, ...]] = None
+        self._unarmed_attacks: Optional[Tuple[MeleeAttack, ...]] = None
+        self._shield_blocks: Optional[Tuple[ShieldBlock, ...]] = None
+
+        self._initiative_modifier: Optional[float] = None
+
         self.inventory = Inventory(self, (bp for bp in self.get_bodyparts() if bp.is_grasp_part()))
 
-        template.loadout.apply_loadout(self)
+        template.loadout.apply_loadout(self, rng or self.rng)
 
     def __repr__(self) -> str:
         return f'<{self.__class__.__name__}: {self.name!r}>'
@@ -55,9 +77,35 @@ class Creature(Entity):
     def __str__(self) -> str:
         return self.name
 
+    def reset(self, rng: Random = None) -> None:
+        """Put the creature back in the state it was spawned in and roll its loadout again, so that it can be reused.
+        The creature must not be in a melee engagement or an action loop that is still in use."""
+        self.loop = None
+        self._stance = Stance.Standing
+        self._health = self.spec.max_health
+        self._conscious = True
+        self._alive = True
+
+        for bp in self.get_bodyparts():
+            bp.reset()
+        self._traits = { trait.key : trait for trait in self.spec.traits }
+
+        self._mount = None
+        self._riders.clear()
+        self._melee_combat.clear()
+
+        self.invalidate_attack_cache()
+        self._initiative_modifier = None
+        self.inventory.reset()
+
+        # not set back to zero, so that the expected damage table can't mistake rows from the last fight for current ones
+        self.armor_version += 1
+
+        self.template.loadout.apply_loadout(self, rng or self.rng)
+
     @property
     def size(self) -> CreatureSize:
-        return self.template.size
+        return self.spec.size
 
     @property
     def bodyplan(self) -> Morphology:
@@ -70,7 +118,7 @@ class Creature(Entity):
         return iter(self._bodyparts.values())
 
     def get_attribute(self, attr: Union[str, PrimaryAttribute]) -> int:
-        return self.template.get_attribute(attr)
+        return self.spec.get_attribute(attr)
 
     def get_encumbrance(self) -> float:
         return self.inventory.get_encumbrance_total()
@@ -84,7 +132,13 @@ class Creature(Entity):
         return action_points/(1/0.6)
 
     def get_initiative_modifier(self) -> float:
-        return self._base_initiative()/2.0 - (self.get_encumbrance())/5.0
+        # this is used to order the action queue, so it is cached until the encumbrance changes
+        if self._initiative_modifier is None:
+            self._initiative_modifier = self._base_initiative()/2.0 - (self.get_encumbrance())/5.0
+        return self._initiative_modifier
+
+    def encumbrance_changed(self) -> None:
+        self._initiative_modifier = None
 
     @property
     def tiebreaker_priority(self) -> float:
@@ -109,7 +163,14 @@ class Creature(Entity):
 
     ## Melee Combat
 
-    def get_unarmed_attacks(self) -> Iterable[MeleeAttack]:
+    def invalidate_attack_cache(self) -> None:
+        """Must be called whenever something happens that could change the attacks available to this creature:
+        equipment slots changing, injury, stance or consciousness."""
+        self._melee_attacks = None
+        self._unarmed_attacks = None
+        self._shield_blocks = None
+
+    def _create_unarmed_attacks(self) -> Iterable[MeleeAttack]:
         if not self.is_conscious():
             return
 
@@ -122,7 +183,7 @@ class Creature(Entity):
                 continue  # no kicking while mounted
             yield from bp.get_unarmed_attacks()
 
-    def get_melee_attacks(self) -> Iterable[MeleeAttack]:
+    def _create_melee_attacks(self) -> Iterable[MeleeAttack]:
         if not self.is_conscious():
             return
 
@@ -133,7 +194,7 @@ class Creature(Entity):
                 if using_hands > 0:
                     yield from item.get_melee_attacks(self, using_hands, item)
 
-    def get_shield_blocks(self) -> Iterable[ShieldBlock]:
+    def _create_shield_blocks(self) -> Iterable[ShieldBlock]:
         if not self.is_conscious():
             return
 
@@ -141,6 +202,21 @@ class Creature(Entity):
             if item.is_weapon() and item.is_shield():
                 yield item.shield.create_instance(self, item)
 
+    def get_unarmed_attacks(self) -> Iterable[MeleeAttack]:
+        if self._unarmed_attacks is None:
+            self._unarmed_attacks = tuple(self._create_unarmed_attacks())
+        return iter(self._unarmed_attacks)
+
+    def get_melee_attacks(self) -> Iterable[MeleeAttack]:
+        if self._melee_attacks is None:
+            self._melee_attacks = tuple(self._create_melee_attacks())
+        return iter(self._melee_attacks)
+
+    def get_shield_blocks(self) -> Iterable[ShieldBlock]:
+        if self._shield_blocks is None:
+            self._shield_blocks = tuple(self._create_shield_blocks())
+        return iter(self._shield_blocks)
+
     def get_melee_engage_distance(self) -> MeleeRange:
         attack_reach = (attack.max_reach for attack in self.get_melee_attacks())
         return max(attack_reach, default=MeleeRange(0))
@@ -148,6 +224,9 @@ class Creature(Entity):
     def get_melee_opponents(self) -> Iterable[Creature]:
         return iter(self._melee_combat.keys())
 
+    def get_melee_opponent_count(self) -> int:
+        return len(self._melee_combat)
+
     def get_melee_combat(self, other: Creature) -> Optional[MeleeCombat]:
         return self._melee_combat.get(other, None)
 
@@ -167,6 +246,8 @@ class Creature(Entity):
     def change_stance(self, new_stance: Stance) -> None:
         prev_stance = self._stance
         self._stance = min(max(self.min_stance, new_stance), self.max_stance)
+        if self._stance != prev_stance:
+            self.invalidate_attack_cache()
         # if self._stance != prev_stance:
         #     print(f'{self} changes stance ({prev_stance} -> {self._stance}).')
 
@@ -199,13 +280,9 @@ class Creature(Entity):
                     cur_stance += 1
         return cur_stance, total_stance
 
-    _lost_stance_text = {
-        Stance.Standing  : 'can no longer stand',
-        Stance.Crouching : 'falls over'
-    }
     def check_stance(self) -> None:
         if self.stance > self.max_stance:
-            print(f'{self} {self._lost_stance_text[self.stance]}!')
+            self.events.emit(StanceLost, creature=self, from_stance=self.stance)
             self.change_stance(self.max_stance)
 
     def get_resist_knockdown_modifier(self, difficulty_step: int = 0) -> ContestModifier:
@@ -221,7 +298,7 @@ class Creature(Entity):
         if self._mount is not None:
             self.dismount()
         self.change_stance(Stance.Prone)
-        print(f'{self} is knocked down!')
+        self.events.emit(Knockdown, creature=self)
 
     ## Mounts
 
@@ -260,7 +337,7 @@ class Creature(Entity):
 
     @property
     def max_health(self) -> float:
-        return self.template.max_health
+        return self.spec.max_health
 
     def is_conscious(self) -> bool:
         return self._conscious
@@ -270,6 +347,7 @@ class Creature(Entity):
             return
 
         self._conscious = value
+        self.invalidate_attack_cache()
         if not self._conscious:
             self.dismount()
             self.change_stance(Stance.Prone)
@@ -294,24 +372,24 @@ class Creature(Entity):
             injury_test = ContestResult(self, SKILL_ENDURANCE, grade.to_modifier())
             injury_result = OpposedResult(injury_test, attack_result) if attack_result is not None else UnopposedResult(injury_test)
 
-            print(injury_result.format_details())
+            self.events.emit(ContestRolled, result=injury_result)
             if not injury_result.success:
                 self.kill()
-                print(f'{self} is killed!')
+                self.events.emit(Death, creature=self)
             elif self.is_conscious():
                 self.set_conscious(False)
-                print(f'{self} is incapacitated!')
+                self.events.emit(Incapacitated, creature=self)
 
         elif self.health <= 0 and self.is_conscious():
 
             injury_test = ContestResult(self, SKILL_ENDURANCE)
             injury_result = OpposedResult(injury_test, attack_result) if attack_result is not None else UnopposedResult(injury_test)
 
-            print(f'{self} is seriously wounded!')
-            print(injury_result.format_details())
+            self.events.emit(SeriouslyWounded, creature=self)
+            self.events.emit(ContestRolled, result=injury_result)
             if not injury_result.success:
                 self.set_conscious(False)
-                print(f'{self} is incapacitated!')
+                self.events.emit(Incapacitated, creature=self)
 
     def stun(self, can_defend: bool = True) -> None:
         action = self.get_current_action()
@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, Iterable, Set, Tuple, Optional
+from typing import TYPE_CHECKING, Iterable, MutableMapping, Tuple, Optional
 
 if TYPE_CHECKING:
     from core.creature import Creature
@@ -9,15 +9,78 @@ if TYPE_CHECKING:
 class Inventory:
     def __init__(self, parent: Creature, equip_slots: Iterable[BodyPart]):
         self.parent = parent
-        self._contents: Set[Equipment] = set()
+        self._contents: MutableMapping[Equipment, None] = {}  # used as an ordered set
         self._slots = { bp : None for bp in equip_slots }
 
+        # effective armor per bodypart id_tag, including natural armor. Kept up to date as armor is added or removed
+        self._armor = self._get_natural_armor()
+
+        # encumbrance from armor does not stack on the same bodypart, so only the max per bodypart id_tag is counted
+        self._armor_encumbrance: MutableMapping[str, float] = {}
+        self._other_encumbrance = 0.0
+        self._encumbrance_total = 0.0
+
+    def _get_natural_armor(self) -> MutableMapping[str, float]:
+        return { bp.id_tag : max(bp.natural_armor, 0) for bp in self.parent.get_bodyparts() }
+
+    def reset(self) -> None:
+        """Remove all of the contents, leaving the inventory as it was when the creature was created"""
+        self._contents.clear()
+        for bp in self._slots.keys():
+            self._slots[bp] = None
+        self._armor = self._get_natural_armor()
+        self._armor_encumbrance.clear()
+        self._other_encumbrance = 0.0
+        self._encumbrance_total = 0.0
+        self.parent.encumbrance_changed()
+
     def add(self, equipment: Equipment) -> None:
-        self._contents.add(equipment)
+        if equipment not in self._contents:
+            self._contents[equipment] = None
+            if equipment.is_armor():
+                for bp_tag, value in equipment.armor_value.items():
+                    if bp_tag in self._armor:
+                        self._armor[bp_tag] = max(self._armor[bp_tag], value)
+                self.parent.armor_version += 1
+            self._add_encumbrance(equipment)
+            self._update_encumbrance_total()
 
     def remove(self, equipment: Equipment) -> None:
-        self._contents.remove(equipment)
+        del self._contents[equipment]
         self.unequip_item(equipment)
+        if equipment.is_armor():
+            for bp_tag in equipment.armor_value.keys():
+                if bp_tag in self._armor:
+                    self._armor[bp_tag] = self._calc_armor(bp_tag)
+            self.parent.armor_version += 1
+
+        # rebuilt in the same order as the items were added, so that the total is exactly the same as if the
+        # removed item had never been added
+        self._armor_encumbrance.clear()
+        self._other_encumbrance = 0.0
+        for item in self._contents:
+            self._add_encumbrance(item)
+        self._update_encumbrance_total()
+
+    def _add_encumbrance(self, equipment: Equipment) -> None:
+        if equipment.is_armor():
+            for bp_tag, enc in equipment.encumbrance.items():
+                self._armor_encumbrance[bp_tag] = max(enc, self._armor_encumbrance.setdefault(bp_tag, 0))
+        else:
+            self._other_encumbrance += equipment.encumbrance
+
+    def _update_encumbrance_total(self) -> None:
+        self._encumbrance_total = self._other_encumbrance + sum(self._armor_encumbrance.values())
+        self.parent.encumbrance_changed()
+
+    def _calc_armor(self, bp_tag: str) -> float:
+        armor_values = (item.armor_value.get(bp_tag, 0) for item in self.get_armor_items())
+        equipped_armor = max(armor_values, default = 0)
+        return max(equipped_armor, self.parent.get_bodypart(bp_tag).natural_armor, 0)
+
+    def get_armor(self, bp_tag: str) -> float:
+        """The effective armor of a bodypart, the best of its natural armor and any armor worn over it"""
+        return self._armor[bp_tag]
 
     def __iter__(self) -> Iterable[Equipment]:
         return iter(self._contents)
@@ -50,6 +113,7 @@ class Inventory:
         self.add(equipment)  # ensure that it's actually in our inventory
         for i in range(use_hands):
             self._slots[empty_hands.pop()] = equipment
+        self.parent.invalidate_attack_cache()
         return True
 
     def unequip_item(self, equipment: Equipment) -> bool:
@@ -58,11 +122,14 @@ class Inventory:
             if item == equipment:
                 self._slots[bp] = None
                 found = True
+        if found:
+            self.parent.invalidate_attack_cache()
         return found
 
     def unequip_all(self) -> None:
         for bp in self._slots.keys():
             self._slots[bp] = None
+        self.parent.invalidate_attack_cache()
 
     def get_item_in_slot(self, slot: BodyPart) -> Optional[Equipment]:
         return self._slots[slot]
@@ -71,7 +138,7 @@ class Inventory:
         return iter(self._slots.items())
 
     def get_held_items(self) -> Iterable[Equipment]:
-        return iter(set(item for item in self._slots.values() if item is not None))
+        return iter(dict.fromkeys(item for item in self._slots.values() if item is not None))
 
     def get_item_held_by(self, equipment: Equipment) -> Iterable[BodyPart]:
         for bp, item in self._slots.items():
@@ -94,14 +161,4 @@ class Inventory:
                 yield item
 
     def get_encumbrance_total(self) -> float:
-        result = 0.0
-
-        from_armor = {}
-        for equipment in self._contents:
-            if equipment.is_armor():
-                for bp_tag, enc in equipment.encumbrance.items():
-                    from_armor[bp_tag] = max(enc, from_armor.setdefault(bp_tag, 0))
-            else:
-                result += equipment.encumbrance
-
-        return result + sum(from_armor.values())
\ No newline at end of file
+        return self._encumbrance_total
\ No newline at end of file
@@ -9,13 +9,14 @@ Loadouts currently apply equipment and traits to a creature.
 """
 from __future__ import annotations
 
-import random
 from typing import TYPE_CHECKING, Iterable, Iterator, Tuple, Optional, List, Union, Any
 from core.equipment import Equipment
 from core.equipment.template import EquipmentTemplate
 from core.creature.traits import CreatureTrait
+from core.rng import get_default_stream
 
 if TYPE_CHECKING:
+    from random import Random
     from core.creature import Creature
 
 LoadoutItem = Union[EquipmentTemplate, CreatureTrait]
@@ -32,10 +33,11 @@ class LoadoutChoice:
                 option = [ option ]
             self.options.append( (weight, option) )
 
-    def choose_option(self) -> Optional[LoadoutGroup]:
+    def choose_option(self, rng: Random = None) -> Optional[LoadoutGroup]:
         if len(self.options) > 0:
+            rng = rng or get_default_stream()
             weights, items = zip(*self.options)
-            return random.choices(items, weights)[0]
+            return rng.choices(items, weights)[0]
         return None
 
     def __iter__(self) -> Iterator[LoadoutItem]:
@@ -46,8 +48,10 @@ class Loadout:
     def __init__(self, *groups: LoadoutGroup):
         self.loadout = list(groups)
 
-    def apply_loadout(self, creature: Creature) -> None:
+    def apply_loadout(self, creature: Creature, rng: Random = None) -> None:
         for group in self.loadout:
+            if isinstance(group, LoadoutChoice):
+                group = group.choose_option(rng) or ()
             for item in group:
                 if isinstance(item, EquipmentTemplate):
                     creature.inventory.add(Equipment(item))
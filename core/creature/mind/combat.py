@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-import random
 from typing import TYPE_CHECKING, Optional
 
 from core.creature.bodypart import BodyPart
-from core.creature.mind.tactics import CombatTactics, get_melee_attack_value
+from core.creature.mind.tactics import CombatTactics, get_melee_attack_priority
 from core.creature.actions import ChangeStanceAction, SwitchHeldItemAction
 from core.equipment import Equipment
 from core.combat.melee import ChangeMeleeRangeAction, MeleeCombatAction
@@ -58,7 +57,7 @@ class CreatureMind(CombatTactics):
         if best_range is not None and best_range != melee.get_separation():
             change_desire = self.get_range_change_desire(opponent, melee.get_separation(), best_range)
             # print(f'{self.creature} range change desire: {change_desire:.2f}')
-            if change_desire > 0 and random.random() < change_desire:
+            if change_desire > 0 and self.creature.rng.random() < change_desire:
                 return ChangeMeleeRangeAction(opponent, best_range)
 
 
@@ -66,12 +65,8 @@ class CreatureMind(CombatTactics):
         melee = self.creature.get_melee_combat(opponent)
 
         # determine available attacks
-        attack_values = (
-            get_melee_attack_value(attack, self.creature, opponent)
-            for attack in self.creature.get_melee_attacks()
-            if attack.can_attack(melee.get_separation())
-        )
-        best_score = max(attack_values, default=0)
+        attacks = (attack for attack in self.creature.get_melee_attacks() if attack.can_attack(melee.get_separation()))
+        best_score = max(get_melee_attack_priority(self.creature, opponent, attacks).values(), default=0)
         equipped = [*self.inventory.get_held_items()]
         available = (item for item in self.creature.inventory if item.is_weapon() and item not in equipped)
         available = {
@@ -86,11 +81,8 @@ class CreatureMind(CombatTactics):
         ]
         for bp in occupied:
             if self.inventory.get_item_in_slot(bp) is not None:
-                value = max((
-                    get_melee_attack_value(attack, self.creature, opponent)
-                    for attack in bp.get_unarmed_attacks()
-                    if attack.can_attack(melee.get_separation())
-                ), default=0)
+                attacks = (attack for attack in bp.get_unarmed_attacks() if attack.can_attack(melee.get_separation()))
+                value = max(get_melee_attack_priority(self.creature, opponent, attacks).values(), default=0)
                 if value > 0:
                     available[bp] = value
 
@@ -106,7 +98,7 @@ class CreatureMind(CombatTactics):
                 change_desire = 1.0 if candidate_score > 0 else 0.0
 
             # print(f'{protagonist} weapon change desire: {change_desire:.2f}')
-            if change_desire > 0 and random.random() < change_desire:
+            if change_desire > 0 and self.creature.rng.random() < change_desire:
                 change_weapon = True
 
                 if isinstance(candidate, Equipment):
@@ -129,14 +121,14 @@ class CreatureMind(CombatTactics):
                             # if candidate is worse overall, we may just want to change range instead
                             change_desire = 1.0 + self.get_weapon_change_desire(item, candidate, opponent)
                             # print(f'{item}->{candidate}: {change_desire}')
-                            if random.random() > change_desire:
+                            if self.creature.rng.random() > change_desire:
                                 change_weapon = False
                                 break
                         elif item.is_shield():
                             break
                         else:
                             change_desire = self.get_weapon_change_desire(item, candidate, opponent, melee.get_separation())
-                            if random.random() > change_desire:
+                            if self.creature.rng.random() > change_desire:
                                 break
 
                         unequip.append(item)
@@ -148,7 +140,7 @@ class CreatureMind(CombatTactics):
                         self.get_weapon_value(item, opponent), candidate_score,
                     )
                     # print(f'{item}->{candidate}: {change_desire}')
-                    if random.random() > change_desire:
+                    if self.creature.rng.random() > change_desire:
                         change_weapon = False
                     unequip = [item]
                     candidate = None
@@ -1,7 +1,6 @@
 from __future__ import annotations
 from typing import TYPE_CHECKING, Iterable, Mapping, Optional
 
-import random
 from core.constants import MeleeRange
 from core.combat.resolver import get_parry_damage_mult
 from core.contest import SkillLevel, Contest, SKILL_EVADE
@@ -11,6 +10,7 @@ if TYPE_CHECKING:
     from core.creature import Creature
     from core.combat.attack import MeleeAttack
     from core.combat.shield import ShieldBlock
+    from random import Random
     from core.equipment import Equipment
 
 # relative mean calculated using anydice.com
@@ -23,28 +23,27 @@ SKILL_FACTOR = {
     SkillLevel(5) : 1.58**2, # master
 }
 
-def get_expected_damage(attack: MeleeAttack, target: Creature) -> float:
-    result = 0
-    for bp in target.get_bodyparts():
-        result += bp.exposure * bp.get_effective_damage(attack.damage.mean(), attack.armpen.mean())
-    return result
-
-def get_melee_attack_value(attack: MeleeAttack, attacker: Creature, target: Creature) -> float:
-    expected_damage = get_expected_damage(attack, target)
-    skill_factor = SKILL_FACTOR[attacker.get_skill_level(attack.combat_test)]
-    return expected_damage * skill_factor
+def choose_melee_range(range_priority: Mapping[MeleeRange, float], separation: MeleeRange) -> Optional[MeleeRange]:
+    # tiebreakers: if range is equal to current range, then greatest range
+    return max(range_priority.keys(), key=lambda k: (round(range_priority[k],2), int(k==separation), k), default=None)
 
 # include only weapons that can attack at or within the given ranges
 def get_melee_attack_priority(attacker: Creature, target: Creature, attacks: Iterable[MeleeAttack]) -> Mapping[MeleeAttack, float]:
-    return {attack : get_melee_attack_value(attack, attacker, target) for attack in attacks}
-
-def choose_attack(attack_priority: Mapping[MeleeAttack, float]) -> Optional[MeleeAttack]:
+    """The value of each attack against the target: its expected damage, scaled by the attacker's skill with it"""
+    attacks = list(attacks)
+    expected_damage = target.expected_damage.get_expected_damage_many(attacks)
+    return {
+        attack : float(damage) * SKILL_FACTOR[attacker.get_skill_level(attack.combat_test)]
+        for attack, damage in zip(attacks, expected_damage)
+    }
+
+def choose_attack(attack_priority: Mapping[MeleeAttack, float], rng: Random) -> Optional[MeleeAttack]:
     best_value = max(attack_priority.values(), default=None)
     if best_value is None:
         return None
     top = { attack : value**3 for attack, value in attack_priority.items() if value > 0.75*best_value }
     if len(top) > 0:
-        result = random.choices(*zip(*top.items()))
+        result = rng.choices(*zip(*top.items()))
         return result[0]
     return None
 
@@ -55,13 +54,13 @@ class CombatTactics:
     def get_melee_attack(self, target: Creature, reach: MeleeRange, attacks: Iterable[MeleeAttack]) -> Optional[MeleeAttack]:
         attacks = (attack for attack in attacks if attack.can_attack(reach))
         attack_priority = get_melee_attack_priority(self.parent, target, attacks)
-        return choose_attack(attack_priority)
+        return choose_attack(attack_priority, self.parent.rng)
 
     def get_opportunity_attack(self, target: Creature, attack_ranges: Iterable[MeleeRange]) -> Optional[MeleeAttack]:
         attack_ranges = list(attack_ranges)
         attacks = (attack for attack in self.parent.get_melee_attacks() if any(attack.can_attack(r) for r in attack_ranges))
         attack_priority = get_melee_attack_priority(self.parent, target, attacks)
-        return choose_attack(attack_priority)
+        return choose_attack(attack_priority, self.parent.rng)
 
     def get_melee_defence(self, attacker: Creature, attack: MeleeAttack, reach: MeleeRange, defences: Iterable[MeleeAttack]) -> Optional[MeleeAttack]:
         defend_priority = {}
@@ -69,7 +68,7 @@ class CombatTactics:
             if defence.can_defend(reach):
                 skill_level = self.parent.get_skill_level(defence.combat_test).value
                 block_effectiveness = 1.0 - get_parry_damage_mult(attack.force, defence.force)
-                defend_priority[defence] = (skill_level, block_effectiveness, defence.force, random.random())
+                defend_priority[defence] = (skill_level, block_effectiveness, defence.force, self.parent.rng.random())
         return max(defend_priority.keys(), key=lambda k: defend_priority[k], default=None)
 
     def get_melee_block(self, range: MeleeRange, blocks: Iterable[ShieldBlock]) -> Optional[ShieldBlock]:
@@ -79,9 +78,11 @@ class CombatTactics:
         }
         return max(block_priority.keys(), key=lambda k: block_priority[k], default=None)
 
-    def get_range_change_desire(self, opponent: Creature, from_range: MeleeRange, to_range: MeleeRange) -> float:
-        """-1.0 to 1.0 scale rating how favorable the given range change is"""
-        range_scores = self.get_melee_range_priority(opponent)
+    def get_range_change_desire(self, opponent: Creature, from_range: MeleeRange, to_range: MeleeRange,
+                                *, range_priority: Mapping[MeleeRange, float] = None) -> float:
+        """-1.0 to 1.0 scale rating how favorable the given range change is.
+        The range_priority against the opponent may be given if it is already known."""
+        range_scores = range_priority if range_priority is not None else self.get_melee_range_priority(opponent)
         from_score = range_scores.get(from_range, 0)
         to_score = range_scores.get(to_range, 0)
         if from_score == 0:
@@ -96,8 +97,8 @@ class CombatTactics:
             attack_ranges = list(MeleeRange.between(from_range, to_range))
             attacks = (attack for attack in opponent.get_melee_attacks() if any(attack.can_attack(r) for r in attack_ranges))
             attack = max(attacks, key=lambda a: opponent.get_skill_level(a.combat_test), default=None)
-            safety = 1.0 - Contest.get_opposed_chance(opponent, attack.combat_test, self.parent, SKILL_EVADE)
             if attack is not None:
+                safety = 1.0 - Contest.get_opposed_chance(opponent, attack.combat_test, self.parent, SKILL_EVADE)
                 return min(score, safety**2)
         return score
 
@@ -146,9 +147,7 @@ class CombatTactics:
     def get_desired_melee_range(self, opponent: Creature, *, caution: float = 1.0) -> Optional[MeleeRange]:
         melee = self.parent.get_melee_combat(opponent)
         range_priority = self.get_melee_range_priority(opponent, caution=caution)
-
-        # tiebreakers: if range is equal to current range, then greatest range
-        return max(range_priority.keys(), key=lambda k: (round(range_priority[k],2), int(k==melee.get_separation()), k), default=None)
+        return choose_melee_range(range_priority, melee.get_separation())
 
     def get_melee_threat_value(self, opponent: Creature) -> float:
         threat_priority = get_melee_attack_priority(opponent, self.parent, opponent.get_melee_attacks())
@@ -159,11 +158,8 @@ class CombatTactics:
         return threat_value * attack_value / (opponent.health + opponent.max_health)
 
     def get_weapon_value(self, item: Equipment, opponent: Creature, reach: Optional[MeleeRange] = None) -> float:
-        return max((
-            get_melee_attack_value(attack, self.parent, opponent)
-            for attack in item.get_melee_attacks(self.parent)
-            if reach is None or attack.can_attack(reach)
-        ), default=0)
+        attacks = (attack for attack in item.get_melee_attacks(self.parent) if reach is None or attack.can_attack(reach))
+        return max(get_melee_attack_priority(self.parent, opponent, attacks).values(), default=0)
 
     def get_weapon_change_desire(self, from_item: Equipment, to_item: Equipment, opponent: Creature, reach: Optional[MeleeRange] = None) -> float:
         from_value = self.get_weapon_value(from_item, opponent, reach)
@@ -0,0 +1,40 @@
+"""
+Reuse of creatures across fights, for batch simulations that would otherwise spawn and discard thousands of them.
+
+A creature released to the pool is reset to the state it was spawned in when it is next acquired, with its loadout
+rolled again from the stream given, so a fight with pooled creatures plays out exactly as it would with new ones.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, List, MutableMapping
+
+from core.creature.creature import Creature
+
+if TYPE_CHECKING:
+    from random import Random
+    from core.creature.template import CreatureTemplate
+
+class CreaturePool:
+    def __init__(self):
+        self._free: MutableMapping[CreatureTemplate, List[Creature]] = {}
+
+    def get_free_count(self) -> int:
+        return sum(len(free) for free in self._free.values())
+
+    def acquire(self, template: CreatureTemplate, rng: Random = None) -> Creature:
+        """Get a creature spawned from the template, reusing a released one if there is one"""
+        free = self._free.get(template)
+        while free:
+            creature = free.pop()
+            if creature.spec is template.compile():  # otherwise the template was changed after it was released
+                creature.reset(rng)
+                return creature
+        return Creature(template, rng=rng)
+
+    def release(self, *creatures: Creature) -> None:
+        """Return creatures to the pool once the fight they were in is over. They must not be used again until acquired."""
+        for creature in creatures:
+            self._free.setdefault(creature.template, []).append(creature)
+
+    def clear(self) -> None:
+        self._free.clear()
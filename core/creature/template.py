@@ -1,15 +1,38 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING, MutableMapping, Type, Union, Any, Optional, Iterable, Tuple
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Mapping, MutableMapping, NamedTuple, Type, Union, Any, Optional, Iterable, Tuple
 
 from core.constants import PrimaryAttribute, SizeCategory
 from core.creature.loadout import Loadout
 from core.creature.bodyplan import Morphology
 
 if TYPE_CHECKING:
-    from core.combat.unarmed import NaturalWeapon
+    from core.combat.attack import MeleeAttackTemplate
     from core.constants import CreatureSize
+    from core.creature.bodyplan import BodyElement
     from core.creature.traits import CreatureTrait
 
+class BodyPartSpec(NamedTuple):
+    element: BodyElement
+    size: float  # relative to the whole body
+    attacks: Tuple[MeleeAttackTemplate, ...]
+
+## Everything about a CreatureTemplate that a Creature needs, worked out once and shared by every creature spawned
+## from the template, so that spawning only has to create the state that changes over a fight
+class CompiledTemplate(NamedTuple):
+    template: CreatureTemplate
+    name: str
+    size: CreatureSize
+    attributes: Mapping[PrimaryAttribute, int]
+    max_health: int
+    traits: Tuple[CreatureTrait, ...]
+    bodyparts: Tuple[BodyPartSpec, ...]
+
+    def get_attribute(self, attr: Union[str, PrimaryAttribute]) -> int:
+        if not isinstance(attr, PrimaryAttribute):
+            attr = PrimaryAttribute[attr]
+        return self.attributes[attr]
+
 class CreatureTemplate:
     def __init__(self,
                  name: str = None,
@@ -30,6 +53,28 @@ class CreatureTemplate:
             self.loadout = loadout or Loadout()
         if name is not None:
             self.name = name
+        self._compiled: Optional[CompiledTemplate] = None
+
+    def compile(self) -> CompiledTemplate:
+        """The compiled template is cached until the template is changed through the creation API below.
+        Changes made to the bodyplan directly after the template has been compiled are not picked up."""
+        if self._compiled is None:
+            bodyparts = tuple(
+                BodyPartSpec(elem, self.bodyplan.get_relative_size(elem.id_tag), tuple(
+                    natural_weapon.create_attack(self) for natural_weapon in elem.attacks
+                ))
+                for elem in self.bodyplan
+            )
+            self._compiled = CompiledTemplate(
+                template = self,
+                name = self.name,
+                size = self.size,
+                attributes = MappingProxyType(dict(self.attributes)),
+                max_health = self.max_health,
+                traits = tuple(self.get_traits()),
+                bodyparts = bodyparts,
+            )
+        return self._compiled
 
     @property
     def size(self) -> CreatureSize:
@@ -38,29 +83,34 @@ class CreatureTemplate:
     ## Creature Template Creation API
 
     def set_attributes(self, **attr_values: int) -> CreatureTemplate:
+        self._compiled = None
         for name, value in attr_values.items():
             attr = PrimaryAttribute[name]
             self.attributes[attr] = value
         return self
 
     def set_attribute(self, attr: Union[str, PrimaryAttribute], value: int) -> CreatureTemplate:
+        self._compiled = None
         if not isinstance(attr, PrimaryAttribute):
             attr = PrimaryAttribute[attr]
         self.attributes[attr] = value
         return self
 
     def modify_attributes(self, **attr_mods: int) -> CreatureTemplate:
+        self._compiled = None
         for name, mod in attr_mods.items():
             attr = PrimaryAttribute[name]
             self.attributes[attr] += mod
         return self
 
     def add_trait(self, *traits: CreatureTrait) -> CreatureTemplate:
+        self._compiled = None
         for trait in traits:
             self.traits[trait.key] = trait
         return self
 
     def remove_trait(self, key: Any) -> CreatureTemplate:
+        self._compiled = None
         del self.traits[key]
         return self
 
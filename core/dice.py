@@ -1,13 +1,19 @@
 from __future__ import annotations
 
 import math
-import random
+from bisect import bisect_left
 from collections import Counter
+from functools import lru_cache
 from numbers import Number
-from typing import TYPE_CHECKING, Any, Tuple, Union, Mapping, Iterable, Sequence, Counter as CounterType
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Tuple, Union, Mapping, MutableMapping, Iterable, Sequence, Callable, Optional
+
+import numpy as np
+
+from core.rng import get_default_stream
 
 if TYPE_CHECKING:
-    pass
+    from random import Random
 
 def dice(numdice: Number, sides: int = 1) -> DicePool:
     """ Convenient constructor for DicePools.
@@ -32,22 +38,68 @@ def dicepool(*elems: Union[Number, Tuple[int, int]]) -> DicePool:
             dice_counter[sides] += numdice
     return DicePool(dice_counter)
 
+## DicePools are immutable and interned: constructing a pool that is equal to an existing one returns the existing
+## pool, so pools can be compared and hashed by identity. The dice are kept in order of sides, which is also the order
+## they are rolled in. The number of distinct pools is small (the damage and armpen of each attack, with each
+## strength modifier), so interned pools are never released.
+_InternKey = Tuple[Tuple[int, Number, type], ...]
+_interned: MutableMapping[_InternKey, DicePool] = {}
+
 class DicePool:
-    _dicepool: CounterType[int, Number]
-
-    def __init__(self, pool = None):
-        ## check for the presence of a __dicepool__ magic attribute to
-        ## determine if the dicepool argument is a dicepool compatible object.
-        if not pool:
-            self._dicepool = Counter()
-        elif hasattr(pool, "_dicepool"):
-            self._dicepool = Counter(pool._dicepool)
-        else:
-            self._dicepool = Counter(pool)
+    __slots__ = ('_dicepool', '_canonical', '_min', '_max', '_mean', '_variance', '_results')
+
+    _dicepool: Mapping[int, Number]
+
+    def __new__(cls, pool = None):
+        if isinstance(pool, DicePool):
+            return pool
+
+        items = sorted(
+            (sides, numdice) for sides, numdice in (pool or {}).items() if numdice != 0
+        )
+        # the type of each count is part of the key, so that e.g. dice(2) and dice(2.0) stay distinct
+        key = tuple((sides, numdice, type(numdice)) for sides, numdice in items)
+        instance = _interned.get(key)
+        if instance is None:
+            instance = _interned[key] = super().__new__(cls)
+            instance._init(items)
+        return instance
+
+    def _init(self, items: Sequence[Tuple[int, Number]]) -> None:
+        self._dicepool = dict(items)
+        self._canonical = tuple(items)
+
+        # the stats are cached, as they are queried over and over by the AI
+        self._min = sum(
+            numdice if numdice > 0 else numdice*sides
+            for sides, numdice in items
+        )
+        self._max = sum(
+            numdice*sides if numdice > 0 else numdice
+            for sides, numdice in items
+        )
+        self._mean = sum(
+            numdice*(1+sides)/2
+            for sides, numdice in items
+        )
+        ## The variance of a sum of independent random variables is the sum of the variances.
+        self._variance = sum(
+            self.__element_variance(sides, numdice)
+            for sides, numdice in items
+        )
+
+        # results of arithmetic with this pool as the left operand
+        self._results: MutableMapping[Any, DicePool] = {}
+
+    ## interned pools must be unpickled through the constructor, or a copy would be made
+    def __reduce__(self) -> Any:
+        return DicePool, (self._dicepool,)
+
+    def __copy__(self) -> DicePool:
+        return self
 
-        for sides, numdice in list(self._dicepool.items()):
-            if numdice == 0:
-                del self._dicepool[sides]
+    def __deepcopy__(self, memo: Any) -> DicePool:
+        return self
 
     def __iter__(self) -> Iterable[Tuple[int, Number]]:
         for dicetype, numdice in sorted(self._dicepool.items(), reverse=True):
@@ -69,56 +121,55 @@ class DicePool:
 
     def get_modifier(self) -> Any:
         """ The constant part """
-        return self._dicepool[1]
+        return self._dicepool.get(1, 0)
 
-    def get_roll(self) -> Iterable[int]:
+    def get_roll(self, rng: Random = None) -> Iterable[int]:
         """ The variable part """
+        rng = rng or get_default_stream()
         return (
-            int(math.copysign(random.randint(1, sides), numdice))
+            int(math.copysign(rng.randint(1, sides), numdice))
             for sides, numdice in self._dicepool.items() if sides != 1
             for _ in range(abs(numdice))
         )
 
-    def get_roll_detailed(self) -> Mapping[int, Sequence[int]]:
+    def get_roll_detailed(self, rng: Random = None) -> Mapping[int, Sequence[int]]:
         """ Returns roll results organized into a dictionary """
+        rng = rng or get_default_stream()
         return {
-            sides : [ int(math.copysign(random.randint(1, sides), numdice)) for _ in range(abs(numdice)) ]
+            sides : [ int(math.copysign(rng.randint(1, sides), numdice)) for _ in range(abs(numdice)) ]
             for sides, numdice in self._dicepool.items() if sides != 1
         }
 
-    def get_roll_result(self) -> Any:
+    def get_roll_result(self, rng: Random = None) -> Any:
         """ Returns roll results as a single value """
-        return sum(self.get_roll()) + self.get_modifier()
+        return sum(self.get_roll(rng)) + self.get_modifier()
+
+    def roll_many(self, n: int, rng: Optional[np.random.Generator] = None) -> np.ndarray:
+        """ Returns an array of n independent roll results """
+        rng = rng or get_default_stream().numpy()
+        result = np.zeros(n, dtype=np.int64)
+        for sides, numdice in self._dicepool.items():
+            if sides != 1:
+                rolls = rng.integers(1, sides + 1, size=(n, abs(numdice))).sum(axis=1)
+                result += rolls if numdice > 0 else -rolls
+        return result + self.get_modifier()
 
     ## Stats
 
     def min(self) -> Any:
-        return sum(
-            numdice if numdice > 0 else numdice*sides
-            for sides, numdice in self._dicepool.items()
-        )
+        return self._min
 
     def max(self) -> Any:
-        return sum(
-            numdice*sides if numdice > 0 else numdice
-            for sides, numdice in self._dicepool.items()
-        )
+        return self._max
 
     def mean(self) -> Any:
-        return sum(
-                numdice*(1+sides)/2
-                for sides, numdice in self._dicepool.items()
-            )
+        return self._mean
 
     def std_dev(self) -> Any:
-        return self.variance() ** 0.5
+        return self._variance ** 0.5
 
-    ## The variance of a sum of independent random variables is the sum of the variances.
     def variance(self) -> Any:
-        return sum(
-                self.__element_variance(sides, numdice)
-                for sides, numdice in self._dicepool.items()
-            )
+        return self._variance
 
     ## Calculates the variance of rolling a number of identical dice
     @staticmethod
@@ -129,9 +180,45 @@ class DicePool:
         var_oneroll = expected_sqr_val - expected_val**2
         return num_rolls * var_oneroll
 
+    ## *** Probability Distribution ***
+    ## These are exact, computed by convolving the distributions of the individual dice.
+    ## Results are cached per canonical dicepool, so identical pools share the same tables,
+    ## which are returned as read-only mappings.
+
+    def _canonical_key(self) -> Tuple[Tuple[int, Number], ...]:
+        return self._canonical
+
+    def pmf(self) -> Mapping[Any, float]:
+        """ Maps each possible result of get_roll_result() to its probability """
+        return _get_pmf(self._canonical_key())
+
+    def cdf(self) -> Mapping[Any, float]:
+        """ Maps each possible result x to P(result <= x) """
+        return _get_cdf(self._canonical_key())
+
+    def prob_ge(self, x: Number) -> float:
+        """ Returns P(result >= x) """
+        values, tail = _get_tail_table(self._canonical_key())
+        idx = bisect_left(values, x)
+        if idx >= len(values):
+            return 0.0
+        return tail[idx]
+
+    def expected_value_of(self, fn: Callable[[Any], float]) -> float:
+        """ Returns E[fn(result)] """
+        return sum(p * fn(value) for value, p in self.pmf().items())
+
     ## *** Dice Arithmetic Methods ***
-    ## For addition and subtraction other must have a __dicepool__ attribute.
+    ## For addition and subtraction other must be a number or a DicePool.
     ## e.g. dicepool((3,6), 5) + dicepool((1,6), (2,8), 2) --> dicepool((4,6), (2,8), 7)
+    ## Results are cached, so repeating an expression returns the same pool without doing the arithmetic again.
+
+    def _get_result(self, op: str, other: Any, calc: Callable[[], Mapping[int, Number]]) -> DicePool:
+        key = (op, other) if isinstance(other, DicePool) else (op, other, type(other))
+        result = self._results.get(key)
+        if result is None:
+            result = self._results[key] = DicePool(calc())
+        return result
 
     ## these are used as the built in counter math operators strip negative counts
     @staticmethod
@@ -154,9 +241,9 @@ class DicePool:
 
     def __add__(self, other) -> DicePool:
         if isinstance(other, Number):
-            return DicePool(self.__add_counter(self._dicepool, {1: other}))
-        if hasattr(other, "_dicepool"):
-            return DicePool(self.__add_counter(self._dicepool, other._dicepool))
+            return self._get_result('+', other, lambda: self.__add_counter(self._dicepool, {1: other}))
+        if isinstance(other, DicePool):
+            return self._get_result('+', other, lambda: self.__add_counter(self._dicepool, other._dicepool))
         return NotImplemented
 
     def __radd__(self, other) -> DicePool:
@@ -164,16 +251,16 @@ class DicePool:
 
     def __sub__(self, other) -> DicePool:
         if isinstance(other, Number):
-            return DicePool(self.__sub_counter(self._dicepool, {1: other}))
-        if hasattr(other, "_dicepool"):
-            return DicePool(self.__sub_counter(self._dicepool, other._dicepool))
+            return self._get_result('-', other, lambda: self.__sub_counter(self._dicepool, {1: other}))
+        if isinstance(other, DicePool):
+            return self._get_result('-', other, lambda: self.__sub_counter(self._dicepool, other._dicepool))
         return NotImplemented
 
     def __rsub__(self, other) -> DicePool:
         if isinstance(other, Number):
-            return DicePool(self.__sub_counter({1: other}, self._dicepool))
-        if hasattr(other, "_dicepool"):
-            return DicePool(self.__sub_counter(other._dicepool, self._dicepool))
+            return self._get_result('r-', other, lambda: self.__sub_counter({1: other}, self._dicepool))
+        if isinstance(other, DicePool):
+            return other - self
         return NotImplemented
 
     ## multiplication and floordiv operate on ints instead of other dicepools
@@ -184,10 +271,10 @@ class DicePool:
 
     def __mul__(self, other) -> DicePool:
         if isinstance(other, Number):
-            new_pool = Counter(self._dicepool)
-            for sides, numdice in new_pool.items():
-                new_pool[sides] = round(numdice * other) if sides != 1 else numdice * other
-            return DicePool(new_pool)
+            return self._get_result('*', other, lambda: {
+                sides : round(numdice * other) if sides != 1 else numdice * other
+                for sides, numdice in self._dicepool.items()
+            })
         return NotImplemented
 
     def __rmul__(self, other) -> DicePool:
@@ -195,27 +282,78 @@ class DicePool:
 
     def __truediv__(self, other) -> DicePool:
         if isinstance(other, Number):
-            new_pool = Counter(self._dicepool)
-            for sides, numdice in new_pool.items():
-                new_pool[sides] = round(numdice / other) if sides != 1 else numdice / other
-            return DicePool(new_pool)
+            return self._get_result('/', other, lambda: {
+                sides : round(numdice / other) if sides != 1 else numdice / other
+                for sides, numdice in self._dicepool.items()
+            })
         return NotImplemented
 
     def __floordiv__(self, other) -> DicePool:
         if isinstance(other, Number):
-            new_pool = Counter(self._dicepool)
-            for sides, numdice in new_pool.items():
-                new_pool[sides] = int(numdice // other)
-            return DicePool(new_pool)
+            return self._get_result('//', other, lambda: {
+                sides : int(numdice // other) for sides, numdice in self._dicepool.items()
+            })
         return NotImplemented
 
     def __neg__(self) -> DicePool:
-        new_pool = Counter(self._dicepool)
-        for dicetype in new_pool:
-            new_pool[dicetype] *= -1
-        return DicePool(new_pool)
+        return self._get_result('neg', None, lambda: {
+            sides : -numdice for sides, numdice in self._dicepool.items()
+        })
 
     ## Removes all negative or zero dice counts
     def __abs__(self) -> DicePool:
-        new_pool = +Counter(self._dicepool)
-        return DicePool(new_pool)
+        return self._get_result('abs', None, lambda: +Counter(self._dicepool))
+
+
+def _convolve(a: Mapping[int, int], b: Mapping[int, int]) -> Mapping[int, int]:
+    result = Counter()
+    for a_value, a_count in a.items():
+        for b_value, b_count in b.items():
+            result[a_value + b_value] += a_count * b_count
+    return result
+
+## works with integer outcome counts so that all tables are exact up to the final division
+@lru_cache(maxsize=None)
+def _get_outcome_counts(pool_key: Tuple[Tuple[int, Number], ...]) -> Tuple[Sequence[Tuple[Any, int]], int]:
+    counts = {0: 1}
+    total = 1
+    modifier = 0
+    for sides, numdice in pool_key:
+        if sides == 1:
+            modifier = numdice
+            continue
+        sign = 1 if numdice > 0 else -1
+        single = {sign * face : 1 for face in range(1, sides + 1)}
+        for _ in range(abs(numdice)):
+            counts = _convolve(counts, single)
+        total *= sides ** abs(numdice)
+
+    outcomes = tuple((value + modifier, count) for value, count in sorted(counts.items()))
+    return outcomes, total
+
+@lru_cache(maxsize=None)
+def _get_pmf(pool_key: Tuple[Tuple[int, Number], ...]) -> Mapping[Any, float]:
+    outcomes, total = _get_outcome_counts(pool_key)
+    return MappingProxyType({ value : count / total for value, count in outcomes })
+
+@lru_cache(maxsize=None)
+def _get_cdf(pool_key: Tuple[Tuple[int, Number], ...]) -> Mapping[Any, float]:
+    outcomes, total = _get_outcome_counts(pool_key)
+    result = {}
+    cumulative = 0
+    for value, count in outcomes:
+        cumulative += count
+        result[value] = cumulative / total
+    return MappingProxyType(result)
+
+@lru_cache(maxsize=None)
+def _get_tail_table(pool_key: Tuple[Tuple[int, Number], ...]) -> Tuple[Sequence[Any], Sequence[float]]:
+    outcomes, total = _get_outcome_counts(pool_key)
+    values = tuple(value for value, _ in outcomes)
+    tail = []
+    cumulative = 0
+    for _, count in reversed(outcomes):
+        cumulative += count
+        tail.append(cumulative / total)
+    tail.reverse()
+    return values, tuple(tail)
@@ -8,6 +8,8 @@ if TYPE_CHECKING:
     from core.creature import Creature
 
 class Equipment:
+    __slots__ = ('template', 'name')
+
     def __init__(self, template: EquipmentTemplate, name: str = None):
         self.template = template
         self.name = name or template.name
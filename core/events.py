@@ -0,0 +1,285 @@
+"""
+Events describe what happens during a simulation, for the benefit of anything observing it (combat logs, analytics).
+
+The engine emits events to an EventBus, usually the one owned by the ActionLoop that an Entity belongs to. An Event
+object is only created if something has subscribed to that type of event, so emitting an event that nobody is
+listening to costs no more than a function call, and no text is ever formatted unless a TextLogSink is attached.
+"""
+from __future__ import annotations
+
+import sys
+from typing import TYPE_CHECKING, Any, Callable, Type, MutableMapping, Sequence, List, Tuple, Optional, Union, TextIO
+
+from core.constants import Stance
+
+if TYPE_CHECKING:
+    from core.action import Action
+    from core.constants import MeleeRange
+    from core.contest import OpposedResult, UnopposedResult
+    from core.creature import Creature
+    from core.creature.bodypart import BodyPart
+    from core.combat.attack import MeleeAttack
+    from core.combat.criticals import CriticalEffect
+    from core.equipment import Equipment
+
+EventHandler = Callable[['Event'], None]
+
+class Event:
+    """Events are simple data containers. Subclasses declare their fields as annotations."""
+    def __init__(self, **data):
+        self.__dict__.update(data)
+
+    def format(self) -> str:
+        """Describe the event as a line (or lines) of text for the combat log"""
+        return repr(self)
+
+    def __repr__(self) -> str:
+        data = ', '.join(f'{k}={v!r}' for k,v in self.__dict__.items())
+        return f'{self.__class__.__name__}({data})'
+
+class EventBus:
+    def __init__(self):
+        self._subscribers: List[Tuple[EventHandler, Sequence[Type[Event]]]] = []
+        self._dispatch: MutableMapping[Type[Event], Sequence[EventHandler]] = {}
+
+    def subscribe(self, handler: EventHandler, *event_types: Type[Event]) -> None:
+        """Subscribe to the given event types and their subtypes, or to all events if none are given"""
+        self._subscribers.append((handler, event_types or (Event,)))
+        self._dispatch.clear()
+
+    def unsubscribe(self, handler: EventHandler) -> None:
+        self._subscribers = [ (h, types) for h, types in self._subscribers if h != handler ]
+        self._dispatch.clear()
+
+    def has_subscribers(self, event_type: Type[Event] = Event) -> bool:
+        return len(self._get_handlers(event_type)) > 0
+
+    def _get_handlers(self, event_type: Type[Event]) -> Sequence[EventHandler]:
+        handlers = self._dispatch.get(event_type)
+        if handlers is None:
+            handlers = self._dispatch[event_type] = [
+                handler for handler, types in self._subscribers if issubclass(event_type, types)
+            ]
+        return handlers
+
+    def emit(self, event_type: Type[Event], **data: Any) -> None:
+        handlers = self._get_handlers(event_type)
+        if len(handlers) > 0:
+            event = event_type(**data)
+            for handler in handlers:
+                handler(event)
+
+
+## Used by anything that is not bound to an ActionLoop
+_default_bus = EventBus()
+
+def get_default_bus() -> EventBus:
+    return _default_bus
+
+
+class TextLogSink:
+    """Writes the text of each event to a stream, producing the classic combat log"""
+    def __init__(self, stream: Optional[TextIO] = None):
+        self.stream = stream
+
+    def __call__(self, event: Event) -> None:
+        print(event.format(), file=self.stream or sys.stdout)
+
+
+## Turn structure
+
+class TurnStarted(Event):
+    tick: int
+    actions: Sequence[Action]
+
+    def format(self) -> str:
+        return '\n'.join([f'\nTick: {self.tick} Action Queue:', *(str(action) for action in self.actions), ''])
+
+class InitiativeRolled(Event):
+    a: Creature
+    b: Creature
+    a_roll: int
+    a_initiative: float
+    b_roll: int
+    b_initiative: float
+    winner: Optional[Creature]
+
+    def format(self) -> str:
+        a_total = self.a_roll + self.a_initiative
+        b_total = self.b_roll + self.b_initiative
+        success_text = f'{self.winner} takes initiative!' if self.winner is not None else 'Tie!'
+        return (
+            f'[Initiative] {self.a} vs {self.b} RESULT: {self.a_roll}{self.a_initiative:+.0f}={a_total:.0f} vs '
+            f'{self.b_roll}{self.b_initiative:+.0f}={b_total:.0f} {success_text}'
+        )
+
+## Contests
+
+class ContestRolled(Event):
+    result: Union[OpposedResult, UnopposedResult]
+
+    def format(self) -> str:
+        return self.result.format_details()
+
+## Melee combat
+
+class AttackDeclared(Event):
+    attacker: Creature
+    defender: Creature
+    separation: MeleeRange
+    attack: MeleeAttack
+    defence: Any  # a MeleeAttack, the Evade contest, or None if there is no defence
+
+    def format(self) -> str:
+        defence = self.defence.name if self.defence is not None else 'no defence'
+        return f'{self.attacker} attacks {self.defender} at {self.separation} distance: {self.attack.name} vs {defence}!'
+
+class BlockAttempted(Event):
+    defender: Creature
+    shield: Equipment
+    result: OpposedResult
+
+    def format(self) -> str:
+        return f'{self.defender} attempts to block with {self.shield}!\n{self.result.format_details()}'
+
+class CriticalApplied(Event):
+    user: Creature
+    critical: CriticalEffect
+
+    def format(self) -> str:
+        return f'({self.user}) !Critical Effect - {self.critical}!'
+
+class AttackHit(Event):
+    attacker: Creature
+    defender: Creature
+    hitloc: BodyPart
+    attack: MeleeAttack
+    damage: float
+    armpen: float
+    damage_mult: float
+
+    def format(self) -> str:
+        dam_text = f'{self.damage:.0f}/{self.armpen:.0f}*' if self.armpen > 0 else f'{self.damage:.0f}'
+        mult_text = f' (x{self.damage_mult:.1f})' if self.damage_mult != 1.0 else ''
+        return f'{self.attacker} strikes {self.defender} in the {self.hitloc} for {dam_text} damage{mult_text}: {self.attack.name}!'
+
+class RangeChangeAttempted(Event):
+    creature: Creature
+    opponent: Creature
+    from_range: MeleeRange
+    to_range: MeleeRange
+
+    def format(self) -> str:
+        verb = 'close' if self.to_range <= self.from_range else 'open'
+        return f'{self.creature} attempts to {verb} distance with {self.opponent} ({self.from_range} -> {self.to_range}).'
+
+class RangeChanged(Event):
+    creature: Creature
+    opponent: Creature
+    from_range: MeleeRange
+    to_range: MeleeRange
+
+    def format(self) -> str:
+        verb = 'closes' if self.to_range <= self.from_range else 'opens'
+        return f'{self.creature} {verb} distance with {self.opponent} ({self.from_range} -> {self.to_range}).'
+
+## Damage and injury
+
+class DamageApplied(Event):
+    creature: Creature
+    bodypart: BodyPart
+    wound: float
+    armor: float
+
+    def format(self) -> str:
+        if self.wound > 0:
+            armor_text = f' (armour {self.armor})' if self.armor > 0 else ''
+            return f'{self.creature} is wounded for {self.wound:.0f} damage{armor_text}.'
+        return f'The armor absorbs the blow (armour {self.armor}).'
+
+class HealthChanged(Event):
+    creature: Creature
+    health: float
+    max_health: float
+
+    def format(self) -> str:
+        return f'{self.creature} health: {round(self.health)}/{self.max_health}'
+
+class Injury(Event):
+    creature: Creature
+    bodypart: BodyPart
+
+    def format(self) -> str:
+        return f'{self.creature} suffers an injury to the {self.bodypart}.'
+
+class SeriouslyWounded(Event):
+    creature: Creature
+
+    def format(self) -> str:
+        return f'{self.creature} is seriously wounded!'
+
+class Incapacitated(Event):
+    creature: Creature
+
+    def format(self) -> str:
+        return f'{self.creature} is incapacitated!'
+
+class Death(Event):
+    creature: Creature
+
+    def format(self) -> str:
+        return f'{self.creature} is killed!'
+
+## Stance
+
+class Knockdown(Event):
+    creature: Creature
+
+    def format(self) -> str:
+        return f'{self.creature} is knocked down!'
+
+class StanceLost(Event):
+    creature: Creature
+    from_stance: Stance
+
+    _lost_stance_text = {
+        Stance.Standing  : 'can no longer stand',
+        Stance.Crouching : 'falls over',
+    }
+    def format(self) -> str:
+        return f'{self.creature} {self._lost_stance_text[self.from_stance]}!'
+
+class StanceChanged(Event):
+    creature: Creature
+    stance: Stance
+
+    _action_text = {
+        Stance.Standing  : 'gets up',
+        Stance.Crouching : 'crouches',
+        Stance.Prone     : 'goes prone',
+    }
+    def format(self) -> str:
+        return f'{self.creature} {self._action_text[self.stance]}.'
+
+## Equipment
+
+class ItemEquipped(Event):
+    creature: Creature
+    item: Equipment
+
+    def format(self) -> str:
+        return f'{self.creature} equips {self.item}.'
+
+class ItemUnequipped(Event):
+    creature: Creature
+    item: Equipment
+
+    def format(self) -> str:
+        return f'{self.creature} unequips {self.item}.'
+
+class ItemDropped(Event):
+    creature: Creature
+    item: Equipment
+
+    def format(self) -> str:
+        return f'{self.creature} drops the {self.item}.'
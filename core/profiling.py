@@ -0,0 +1,104 @@
+"""
+Opt-in instrumentation of the hot paths: the action loop, the combat resolver and the AI.
+
+A PhaseProfiler records the number of times each phase ran and the time spent in it, in nanoseconds. Phases nest,
+so each phase has both an inclusive (total) time and an exclusive (own) time that leaves out the phases nested inside
+it. Instrumented code finds the profiler through ActionLoop.profiler, which is None unless profiling was requested,
+so the cost when disabled is a single attribute check per phase.
+"""
+from __future__ import annotations
+
+import sys
+from contextlib import nullcontext
+from time import perf_counter_ns
+from typing import Any, ContextManager, List, MutableMapping, Optional, TextIO
+
+
+class PhaseStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0  # including nested phases
+        self.own_ns = 0  # excluding nested phases
+
+class _PhaseFrame:
+    def __init__(self, name: str, start_ns: int):
+        self.name = name
+        self.start_ns = start_ns
+        self.nested_ns = 0
+
+class _PhaseTimer:
+    def __init__(self, profiler: PhaseProfiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.profiler.push(self.name)
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.profiler.pop()
+
+class PhaseProfiler:
+    def __init__(self):
+        self.phases: MutableMapping[str, PhaseStats] = {}
+        self._stack: List[_PhaseFrame] = []
+
+    def push(self, name: str) -> None:
+        """Start timing a phase. Every push() must be matched by a pop()."""
+        self._stack.append(_PhaseFrame(name, perf_counter_ns()))
+
+    def pop(self) -> None:
+        frame = self._stack.pop()
+        elapsed = perf_counter_ns() - frame.start_ns
+        stats = self.phases.get(frame.name)
+        if stats is None:
+            stats = self.phases[frame.name] = PhaseStats()
+        stats.count += 1
+        stats.total_ns += elapsed
+        stats.own_ns += elapsed - frame.nested_ns
+        if len(self._stack) > 0:
+            self._stack[-1].nested_ns += elapsed
+
+    def get_depth(self) -> int:
+        return len(self._stack)
+
+    def unwind(self, depth: int) -> None:
+        """Pop phases until only the given number are still open, e.g. to close the phases an exception skipped over"""
+        while len(self._stack) > depth:
+            self.pop()
+
+    def phase(self, name: str) -> ContextManager[None]:
+        return _PhaseTimer(self, name)
+
+    def reset(self) -> None:
+        self.phases.clear()
+        self._stack.clear()
+
+    def merge(self, other: PhaseProfiler) -> None:
+        for name, other_stats in other.phases.items():
+            stats = self.phases.setdefault(name, PhaseStats())
+            stats.count += other_stats.count
+            stats.total_ns += other_stats.total_ns
+            stats.own_ns += other_stats.own_ns
+
+    def format_report(self) -> str:
+        total_own = sum(stats.own_ns for stats in self.phases.values())
+        lines = [ f'{"phase":<40} {"count":>9} {"total ms":>10} {"own ms":>10} {"own %":>6} {"mean us":>9}' ]
+        for name, stats in sorted(self.phases.items(), key=lambda item: item[1].own_ns, reverse=True):
+            share = stats.own_ns / total_own if total_own > 0 else 0.0
+            lines.append(
+                f'{name:<40} {stats.count:>9d} {stats.total_ns/1e6:>10.2f} {stats.own_ns/1e6:>10.2f} '
+                f'{share:>6.1%} {stats.total_ns/stats.count/1e3:>9.2f}'
+            )
+        return '\n'.join(lines)
+
+    def dump(self, file: TextIO = sys.stdout) -> None:
+        print(self.format_report(), file=file)
+
+
+_NULL_PHASE = nullcontext()
+
+def profile_phase(profiler: Optional[PhaseProfiler], name: str) -> ContextManager[None]:
+    """Time a phase if profiling is enabled"""
+    if profiler is None:
+        return _NULL_PHASE
+    return profiler.phase(name)
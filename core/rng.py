@@ -0,0 +1,74 @@
+"""
+Random number streams used by the engine.
+
+All randomness in the engine is drawn from a RandomStream rather than the global random module, so that a simulation
+can be replayed exactly from its seed. Each ActionLoop owns a stream, and Entities draw from the stream of the loop
+they belong to.
+
+Streams can be split into independent substreams identified by a sequence of integer keys (e.g. one per fight in a
+batch run). Substreams are derived from the root seed and the keys alone, without consuming any values from the parent
+stream, so fights can be distributed across worker processes in any order and still be reproduced individually.
+"""
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING, Optional, Tuple, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    pass
+
+class RandomStream(random.Random):
+    def __init__(self, seed: Optional[int] = None, spawn_key: Tuple[int, ...] = ()):
+        self._seed_seq = np.random.SeedSequence(seed, spawn_key=tuple(spawn_key))
+        self._spawn_count = 0
+        state = self._seed_seq.generate_state(4)
+        super().__init__(int.from_bytes(state.tobytes(), 'little'))
+
+    @property
+    def entropy(self) -> int:
+        """The root seed. If no seed was given, this is the one that was generated."""
+        return self._seed_seq.entropy
+
+    @property
+    def spawn_key(self) -> Tuple[int, ...]:
+        return tuple(self._seed_seq.spawn_key)
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.entropy}, spawn_key={self.spawn_key})'
+
+    def substream(self, *keys: int) -> RandomStream:
+        """Returns an independent stream identified by the given keys.
+        The same seed and keys always produce the same stream."""
+        return RandomStream(self.entropy, self.spawn_key + keys)
+
+    def spawn(self) -> RandomStream:
+        """Returns the next in a sequence of independent child streams.
+        The n-th spawned stream is the same as substream(n), so the two should not be mixed."""
+        stream = self.substream(self._spawn_count)
+        self._spawn_count += 1
+        return stream
+
+    def numpy(self) -> np.random.Generator:
+        """Returns a NumPy Generator seeded from this stream, for use with batch rolling."""
+        return np.random.default_rng(self.getrandbits(128))
+
+    ## random.Random pickles using only the generator state, which would lose the seed and spawn key
+    def __reduce__(self) -> Any:
+        return self.__class__, (self.entropy, self.spawn_key), (self.getstate(), self._spawn_count)
+
+    def __setstate__(self, state: Any) -> None:
+        random_state, self._spawn_count = state
+        self.setstate(random_state)
+
+
+## Used by anything that is not bound to an ActionLoop, e.g. rolling dice outside of a simulation
+_default_stream = RandomStream()
+
+def get_default_stream() -> RandomStream:
+    return _default_stream
+
+def set_default_stream(stream: RandomStream) -> None:
+    global _default_stream
+    _default_stream = stream
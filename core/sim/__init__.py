@@ -0,0 +1,4 @@
+from core.sim.fight import FightResult, run_fight, create_combatant
+from core.sim.tournament import MatchupResult, Standing, run_matchup, run_tournament, replay_fight, get_standings
+from core.sim.combatlog import CombatLogWriter, CombatLogReader, LoggedFight
+from core.sim.battle import BattleResult, run_battle
@@ -0,0 +1,28 @@
+"""
+Round-robin tournament between all of the unit templates in defines.units
+
+usage: python -m core.sim [fights per matchup] [seed]
+"""
+import sys
+import time
+
+from core.sim import run_tournament, get_standings
+from core.sim.units import get_unit_templates
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    templates = get_unit_templates()
+    start = time.perf_counter()
+    results = run_tournament(templates, n, seed)
+    elapsed = time.perf_counter() - start
+
+    print(f'{len(results)} matchups, {sum(r.fights for r in results)} fights in {elapsed:.1f}s (seed: {results[0].seed})')
+    print()
+    for standing in get_standings(results):
+        low, high = standing.win_interval()
+        print(
+            f'{standing.name:<28} {standing.win_rate:6.1%} [{low:6.1%}, {high:6.1%}] '
+            f'{standing.cost_per_win():8.0f}sp/win'
+        )
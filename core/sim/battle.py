@@ -0,0 +1,46 @@
+"""
+Headless battles between companies of creatures, for use in batch simulations.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple, Optional, Sequence, Tuple
+
+from core.action import ActionLoop
+from core.world.battle import Battle, DEFAULT_MAX_ENGAGEMENTS
+from core.events import TextLogSink
+from core.sim.fight import create_combatant
+
+if TYPE_CHECKING:
+    from core.rng import RandomStream
+    from core.creature.template import CreatureTemplate
+    from core.profiling import PhaseProfiler
+
+MAX_BATTLE_TICKS = 50000  # battles that take longer than this are called a draw
+
+class BattleResult(NamedTuple):
+    winner: Optional[int]  # the index of the last side standing, or None if the battle was a draw
+    ticks: int
+    survivors: Tuple[int, ...]  # the number of creatures still fighting on each side
+
+def run_battle(sides: Sequence[Sequence[CreatureTemplate]], rng: RandomStream,
+               *, max_ticks: int = MAX_BATTLE_TICKS, max_engagements: int = DEFAULT_MAX_ENGAGEMENTS,
+               verbose: bool = False, profiler: Optional[PhaseProfiler] = None) -> BattleResult:
+    """Run a battle between sides given as a list of templates each, one per creature.
+    Given the same stream, the battle always plays out the same way."""
+    loop = ActionLoop(rng, profiler=profiler)
+    if verbose:
+        loop.events.subscribe(TextLogSink())
+
+    battle = Battle(loop, max_engagements=max_engagements)
+    for templates in sides:
+        battle.add_side(create_combatant(template, rng) for template in templates)
+
+    while not battle.is_finished() and loop.get_tick() < max_ticks:
+        battle.next_turn()
+        if loop.queued_action_count() == 0:
+            break  # nobody can do anything
+
+    standing = battle.get_standing_sides()
+    winner = standing[0] if len(standing) == 1 else None
+    survivors = tuple(battle.get_fighting_count(side) for side in range(battle.get_side_count()))
+    return BattleResult(winner, loop.get_tick(), survivors)
@@ -0,0 +1,411 @@
+"""
+Compact binary combat logs, for archiving large numbers of fights for later analysis.
+
+A log consists of two append-only files. The log file itself starts with a short header, followed by a sequence of
+length-prefixed records: one per event, one marking the start of each fight, and one for every string the first time it
+is seen. Creatures, attacks, body parts and so on are written as references to these interned strings, so that each
+event only takes a few bytes.
+
+Alongside it is an index file, a flat array of (offset, kind) entries pointing at the fight and string records. The
+CombatLogReader memory-maps the log and reads the index, which only has an entry per fight and per string, so that
+fights can be iterated or accessed at random without reading the whole log into memory.
+
+Numbers (health, damage, armpen, initiative and so on) are stored as doubles, so they are read back exactly as they
+were when the event was emitted.
+
+Since references are interned by name, two creatures with the same name are indistinguishable once logged.
+"""
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Callable, Iterator, MutableMapping, NamedTuple, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+from core.constants import MeleeRange, Stance
+from core.contest import ContestResult, ContestModifier, OpposedResult, UnopposedResult
+from core.events import (
+    Event, TurnStarted, InitiativeRolled, ContestRolled, AttackDeclared, BlockAttempted, CriticalApplied, AttackHit,
+    RangeChangeAttempted, RangeChanged, DamageApplied, HealthChanged, Injury, SeriouslyWounded, Incapacitated, Death,
+    Knockdown, StanceLost, StanceChanged, ItemEquipped, ItemUnequipped, ItemDropped,
+)
+
+if TYPE_CHECKING:
+    from core.events import EventBus
+
+_MAGIC = b'ARENALOG'
+_VERSION = 3  # version 1 stored numbers as single precision floats, version 2 stored contest totals as bytes
+_HEADER = struct.Struct(f'<{len(_MAGIC)}sH')
+_RECORD = struct.Struct('<IB')  # payload length, tag
+
+_INDEX_DTYPE = np.dtype([('offset', '<u8'), ('kind', 'u1')])
+_KIND_FIGHT = 0
+_KIND_STRING = 1
+
+_TAG_FIGHT = 0
+_TAG_STRING = 1
+_FIRST_EVENT_TAG = 2
+
+def get_index_path(path: str) -> str:
+    return path + '.idx'
+
+
+class LogRef:
+    """Stands in for a creature, attack, body part, etc. in events that have been read back from a log"""
+    def __init__(self, name: str):
+        self.name = name
+
+    def __repr__(self) -> str:
+        return f'{self.__class__.__name__}({self.name!r})'
+
+    def __str__(self) -> str:
+        return self.name
+
+class LoggedContestResult(ContestResult):
+    """A ContestResult read back from a log. The modifiers that would be derived from the protagonist are stored."""
+    contest_modifier: int = 0
+    crit_modifier: int = 0
+
+    def __init__(self, protagonist: LogRef, contest: LogRef, base_total: int,
+                 contest_modifier: int, crit_modifier: int, modifier: ContestModifier):
+        self.protagonist = protagonist
+        self.contest = contest
+        self.base_total = base_total
+        self.contest_modifier = contest_modifier
+        self.crit_modifier = crit_modifier
+        self.modifier = modifier
+
+class LoggedAction:
+    """Stands in for a queued Action in events that have been read back from a log"""
+    def __init__(self, name: str, owner: LogRef, start_tick: int, remaining: int):
+        self.name = name
+        self.owner = owner
+        self.start_tick = start_tick
+        self.remaining = remaining
+
+    def __repr__(self) -> str:
+        return f'<{self.name} owned by: {self.owner}, started: {self.start_tick}, remaining: {self.remaining}>'
+
+
+## Codecs convert event fields to and from bytes
+
+class _Codec(ABC):
+    @abstractmethod
+    def encode(self, writer: CombatLogWriter, value: Any, out: bytearray) -> None:
+        ...
+
+    @abstractmethod
+    def decode(self, reader: CombatLogReader, data: Any, pos: int) -> Tuple[Any, int]:
+        ...
+
+class _StructCodec(_Codec):
+    def __init__(self, fmt: str, to_raw: Callable[[Any], Any] = None, from_raw: Callable[[Any], Any] = None):
+        self.struct = struct.Struct('<' + fmt)
+        self.to_raw = to_raw
+        self.from_raw = from_raw
+
+    def encode(self, writer: CombatLogWriter, value: Any, out: bytearray) -> None:
+        out += self.struct.pack(self.to_raw(value) if self.to_raw is not None else value)
+
+    def decode(self, reader: CombatLogReader, data: Any, pos: int) -> Tuple[Any, int]:
+        value, = self.struct.unpack_from(data, pos)
+        if self.from_raw is not None:
+            value = self.from_raw(value)
+        return value, pos + self.struct.size
+
+def _from_float(value: float) -> Any:
+    return int(value) if value.is_integer() else value
+
+class _RefCodec(_Codec):
+    """Interns a string derived from the value. Optional values are written as 0."""
+    _struct = struct.Struct('<I')
+
+    def __init__(self, key: Callable[[Any], str] = str):
+        self.key = key
+
+    def encode(self, writer: CombatLogWriter, value: Any, out: bytearray) -> None:
+        ref = writer.intern(self.key(value)) + 1 if value is not None else 0
+        out += self._struct.pack(ref)
+
+    def decode(self, reader: CombatLogReader, data: Any, pos: int) -> Tuple[Any, int]:
+        ref, = self._struct.unpack_from(data, pos)
+        return reader.get_ref(ref - 1) if ref > 0 else None, pos + self._struct.size
+
+class _ContestCodec(_Codec):
+    # signed shorts, as stacked modifiers can take a total past the range of a byte
+    _target = struct.Struct('<h')  # the target of an unopposed contest, or -1 for an opposed contest
+    _result = struct.Struct('<hhhhh')
+    _ref = _RefCodec()
+    _contest_ref = _RefCodec(lambda contest: contest.name)
+
+    def _encode_result(self, writer: CombatLogWriter, result: ContestResult, out: bytearray) -> None:
+        self._ref.encode(writer, result.protagonist, out)
+        self._contest_ref.encode(writer, result.contest, out)
+        out += self._result.pack(
+            result.base_total, result.contest_modifier, result.crit_modifier,
+            result.modifier.contest, result.modifier.critical,
+        )
+
+    def _decode_result(self, reader: CombatLogReader, data: Any, pos: int) -> Tuple[ContestResult, int]:
+        protagonist, pos = self._ref.decode(reader, data, pos)
+        contest, pos = self._contest_ref.decode(reader, data, pos)
+        base_total, contest_modifier, crit_modifier, mod_contest, mod_critical = self._result.unpack_from(data, pos)
+        result = LoggedContestResult(
+            protagonist, contest, base_total, contest_modifier, crit_modifier, ContestModifier(mod_contest, mod_critical)
+        )
+        return result, pos + self._result.size
+
+    def encode(self, writer: CombatLogWriter, value: Any, out: bytearray) -> None:
+        if isinstance(value, OpposedResult):
+            out += self._target.pack(-1)
+            self._encode_result(writer, value.pro_result, out)
+            self._encode_result(writer, value.ant_result, out)
+        else:
+            out += self._target.pack(value.target)
+            self._encode_result(writer, value.result, out)
+
+    def decode(self, reader: CombatLogReader, data: Any, pos: int) -> Tuple[Any, int]:
+        target, = self._target.unpack_from(data, pos)
+        pos += self._target.size
+        pro_result, pos = self._decode_result(reader, data, pos)
+        if target < 0:
+            ant_result, pos = self._decode_result(reader, data, pos)
+            return OpposedResult(pro_result, ant_result), pos
+        return UnopposedResult(pro_result, target), pos
+
+class _ActionsCodec(_Codec):
+    _count = struct.Struct('<I')
+    _action = struct.Struct('<IIii')
+
+    def encode(self, writer: CombatLogWriter, value: Any, out: bytearray) -> None:
+        out += self._count.pack(len(value))
+        for action in value:
+            out += self._action.pack(
+                writer.intern(action.__class__.__name__), writer.intern(str(action.owner)),
+                round(action.start_tick), round(action.get_remaining_windup()),
+            )
+
+    def decode(self, reader: CombatLogReader, data: Any, pos: int) -> Tuple[Any, int]:
+        count, = self._count.unpack_from(data, pos)
+        pos += self._count.size
+        actions = []
+        for name, owner, start_tick, remaining in self._action.iter_unpack(data[pos:pos + count*self._action.size]):
+            actions.append(LoggedAction(reader.get_ref(name).name, reader.get_ref(owner), start_tick, remaining))
+        return actions, pos + count*self._action.size
+
+_INT = _StructCodec('i')
+_NUMBER = _StructCodec('d', from_raw=_from_float)
+_REF = _RefCodec()
+_NAME = _RefCodec(lambda obj: obj.name)
+_RANGE = _StructCodec('B', from_raw=MeleeRange)
+_STANCE = _StructCodec('B', to_raw=lambda stance: stance.value, from_raw=Stance)
+_CONTEST = _ContestCodec()
+_ACTIONS = _ActionsCodec()
+
+## The tag of each event type is its position in this list, so new events must only ever be added to the end
+_EVENT_SCHEMAS: Sequence[Tuple[Type[Event], Sequence[Tuple[str, _Codec]]]] = [
+    (TurnStarted,           [('tick', _INT), ('actions', _ACTIONS)]),
+    (InitiativeRolled,      [('a', _REF), ('b', _REF), ('a_roll', _INT), ('a_initiative', _NUMBER),
+                             ('b_roll', _INT), ('b_initiative', _NUMBER), ('winner', _REF)]),
+    (ContestRolled,         [('result', _CONTEST)]),
+    (AttackDeclared,        [('attacker', _REF), ('defender', _REF), ('separation', _RANGE),
+                             ('attack', _NAME), ('defence', _NAME)]),
+    (BlockAttempted,        [('defender', _REF), ('shield', _REF), ('result', _CONTEST)]),
+    (CriticalApplied,       [('user', _REF), ('critical', _REF)]),
+    (AttackHit,             [('attacker', _REF), ('defender', _REF), ('hitloc', _REF), ('attack', _NAME),
+                             ('damage', _NUMBER), ('armpen', _NUMBER), ('damage_mult', _NUMBER)]),
+    (RangeChangeAttempted,  [('creature', _REF), ('opponent', _REF), ('from_range', _RANGE), ('to_range', _RANGE)]),
+    (RangeChanged,          [('creature', _REF), ('opponent', _REF), ('from_range', _RANGE), ('to_range', _RANGE)]),
+    (DamageApplied,         [('creature', _REF), ('bodypart', _REF), ('wound', _NUMBER), ('armor', _NUMBER)]),
+    (HealthChanged,         [('creature', _REF), ('health', _NUMBER), ('max_health', _NUMBER)]),
+    (Injury,                [('creature', _REF), ('bodypart', _REF)]),
+    (SeriouslyWounded,      [('creature', _REF)]),
+    (Incapacitated,         [('creature', _REF)]),
+    (Death,                 [('creature', _REF)]),
+    (Knockdown,             [('creature', _REF)]),
+    (StanceLost,            [('creature', _REF), ('from_stance', _STANCE)]),
+    (StanceChanged,         [('creature', _REF), ('stance', _STANCE)]),
+    (ItemEquipped,          [('creature', _REF), ('item', _REF)]),
+    (ItemUnequipped,        [('creature', _REF), ('item', _REF)]),
+    (ItemDropped,           [('creature', _REF), ('item', _REF)]),
+]
+
+_EVENT_TAGS = { event_type : tag for tag, (event_type, _) in enumerate(_EVENT_SCHEMAS, _FIRST_EVENT_TAG) }
+
+LOGGED_EVENTS: Sequence[Type[Event]] = [ event_type for event_type, _ in _EVENT_SCHEMAS ]
+
+## A fight record holds the seed and substream key of the fight, so that it can be replayed
+_FIGHT_SEED = struct.Struct('<16sB')  # seed, key length
+_FIGHT_KEY = struct.Struct('<I')
+
+
+class CombatLogWriter:
+    """Appends events to a combat log. Subscribe it to an EventBus with attach(), and call begin_fight() before each fight.
+    If the log already exists, new fights are appended to it."""
+    def __init__(self, path: str):
+        self.path = path
+        self._strings: MutableMapping[str, int] = {}
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with CombatLogReader(path) as reader:
+                self._strings.update((ref.name, i) for i, ref in enumerate(reader.get_refs()))
+            self._file = open(path, 'ab')
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(_HEADER.pack(_MAGIC, _VERSION))
+        self._index = open(get_index_path(path), 'ab')
+
+    def attach(self, bus: EventBus) -> None:
+        bus.subscribe(self, *LOGGED_EVENTS)
+
+    def detach(self, bus: EventBus) -> None:
+        bus.unsubscribe(self)
+
+    def _write_record(self, tag: int, payload: bytes, index_kind: Optional[int] = None) -> None:
+        if index_kind is not None:
+            self._index.write(np.array([(self._file.tell(), index_kind)], dtype=_INDEX_DTYPE).tobytes())
+        self._file.write(_RECORD.pack(len(payload), tag))
+        self._file.write(payload)
+
+    def intern(self, name: str) -> int:
+        ref = self._strings.get(name)
+        if ref is None:
+            ref = self._strings[name] = len(self._strings)
+            self._write_record(_TAG_STRING, name.encode('utf-8'), _KIND_STRING)
+        return ref
+
+    def begin_fight(self, seed: int, key: Sequence[int] = ()) -> None:
+        payload = bytearray(_FIGHT_SEED.pack(seed.to_bytes(16, 'little'), len(key)))
+        for k in key:
+            payload += _FIGHT_KEY.pack(k)
+        self._write_record(_TAG_FIGHT, payload, _KIND_FIGHT)
+
+    def __call__(self, event: Event) -> None:
+        tag = _EVENT_TAGS[type(event)]
+        _, schema = _EVENT_SCHEMAS[tag - _FIRST_EVENT_TAG]
+        payload = bytearray()
+        for field, codec in schema:
+            codec.encode(self, getattr(event, field), payload)
+        self._write_record(tag, payload)
+
+    def flush(self) -> None:
+        self._file.flush()
+        self._index.flush()
+
+    def close(self) -> None:
+        self._file.close()
+        self._index.close()
+
+    def __enter__(self) -> CombatLogWriter:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class LoggedFight(NamedTuple):
+    seed: int
+    key: Tuple[int, ...]
+    events: Sequence[Event]
+
+class CombatLogReader:
+    """Reads a combat log written by CombatLogWriter. Fights can be accessed by index or iterated over."""
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self._data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version = _HEADER.unpack_from(self._data, 0)
+        if magic != _MAGIC:
+            raise ValueError(f'{path} is not a combat log')
+        if version != _VERSION:
+            raise ValueError(f'unsupported combat log version: {version}')
+
+        # read rather than mapped, so that nothing is left holding the index file open
+        index = np.fromfile(get_index_path(path), dtype=_INDEX_DTYPE)
+
+        # the index may have been written ahead of an incomplete log file
+        index = index[index['offset'] < len(self._data)]
+        self._fight_offsets = index['offset'][index['kind'] == _KIND_FIGHT]
+        self._refs = [ self._read_string(offset) for offset in index['offset'][index['kind'] == _KIND_STRING] ]
+
+    def _read_string(self, offset: int) -> LogRef:
+        length, _ = _RECORD.unpack_from(self._data, offset)
+        start = offset + _RECORD.size
+        return LogRef(self._data[start:start + length].decode('utf-8'))
+
+    def get_ref(self, ref: int) -> LogRef:
+        return self._refs[ref]
+
+    def get_refs(self) -> Sequence[LogRef]:
+        return self._refs
+
+    def __len__(self) -> int:
+        return len(self._fight_offsets)
+
+    def _get_fight_range(self, idx: int) -> Tuple[int, int]:
+        start = int(self._fight_offsets[idx])
+        stop = int(self._fight_offsets[idx + 1]) if idx + 1 < len(self._fight_offsets) else len(self._data)
+        return start, stop
+
+    def iter_records(self, start: int, stop: int) -> Iterator[Tuple[int, int, int]]:
+        """Iterate the (tag, payload start, payload end) of each complete record in a range of the log"""
+        data = self._data
+        pos = start
+        while pos + _RECORD.size <= stop:
+            length, tag = _RECORD.unpack_from(data, pos)
+            pos += _RECORD.size
+            if pos + length > stop:
+                break  # incomplete record at the end of the log
+            yield tag, pos, pos + length
+            pos += length
+
+    def _decode_fight(self, start: int, end: int) -> Tuple[int, Tuple[int, ...]]:
+        seed, key_len = _FIGHT_SEED.unpack_from(self._data, start)
+        key_start = start + _FIGHT_SEED.size
+        key = tuple(k for k, in _FIGHT_KEY.iter_unpack(self._data[key_start:key_start + key_len*_FIGHT_KEY.size]))
+        return int.from_bytes(seed, 'little'), key
+
+    def _decode_event(self, tag: int, start: int) -> Event:
+        event_type, schema = _EVENT_SCHEMAS[tag - _FIRST_EVENT_TAG]
+        data = {}
+        pos = start
+        for field, codec in schema:
+            data[field], pos = codec.decode(self, self._data, pos)
+        return event_type(**data)
+
+    def iter_events(self, idx: int, *event_types: Type[Event]) -> Iterator[Event]:
+        """Iterate the events of a single fight, optionally only those of the given types"""
+        tags = None
+        if len(event_types) > 0:
+            tags = { tag for event_type, tag in _EVENT_TAGS.items() if issubclass(event_type, event_types) }
+
+        start, stop = self._get_fight_range(idx)
+        for tag, payload_start, _ in self.iter_records(start, stop):
+            if tag >= _FIRST_EVENT_TAG and (tags is None or tag in tags):
+                yield self._decode_event(tag, payload_start)
+
+    def __getitem__(self, idx: int) -> LoggedFight:
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError(idx)
+        start, stop = self._get_fight_range(idx)
+        _, payload_start, payload_end = next(self.iter_records(start, stop))
+        seed, key = self._decode_fight(payload_start, payload_end)
+        return LoggedFight(seed, key, list(self.iter_events(idx)))
+
+    def __iter__(self) -> Iterator[LoggedFight]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+    def close(self) -> None:
+        self._data.close()
+
+    def __enter__(self) -> CombatLogReader:
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,71 @@
+"""
+Headless fights between two creatures, for use in batch simulations.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, NamedTuple, Optional
+
+from core.action import ActionLoop
+from core.creature import Creature
+from core.combat.melee import join_melee_combat
+from core.world.arena import Arena, try_equip_best_weapons
+from core.events import TextLogSink
+
+if TYPE_CHECKING:
+    from core.rng import RandomStream
+    from core.creature.template import CreatureTemplate
+    from core.creature.pool import CreaturePool
+    from core.sim.combatlog import CombatLogWriter
+    from core.profiling import PhaseProfiler
+
+MAX_FIGHT_TICKS = 20000  # fights that take longer than this are called a draw
+
+class FightResult(NamedTuple):
+    winner: Optional[int]  # 0 or 1, or None if the fight was a draw
+    ticks: int
+    cost_a: int  # equipment cost in sp, which depends on the loadout rolled for the fight
+    cost_b: int
+
+def get_equipment_cost(creature: Creature) -> int:
+    return sum(item.cost for item in creature.inventory)
+
+def create_combatant(template: CreatureTemplate, rng: RandomStream, pool: Optional[CreaturePool] = None) -> Creature:
+    """Create a creature and roll its loadout from the stream, the same way that run_fight() does"""
+    creature = pool.acquire(template, rng) if pool is not None else Creature(template, rng=rng)
+    try_equip_best_weapons(creature)
+    return creature
+
+def run_fight(template_a: CreatureTemplate, template_b: CreatureTemplate, rng: RandomStream,
+              *, max_ticks: int = MAX_FIGHT_TICKS, verbose: bool = False,
+              log: Optional[CombatLogWriter] = None, profiler: Optional[PhaseProfiler] = None,
+              pool: Optional[CreaturePool] = None) -> FightResult:
+    """Run a single fight to completion. Given the same stream, the fight always plays out the same way.
+    If a log is given, the events of the fight are appended to it. If a profiler is given, the time spent
+    in each phase of the fight is added to it. If a pool is given, the combatants are taken from it and
+    released back to it after the fight."""
+    loop = ActionLoop(rng, profiler=profiler)
+    if verbose:
+        loop.events.subscribe(TextLogSink())
+    if log is not None:
+        log.begin_fight(rng.entropy, rng.spawn_key)
+        log.attach(loop.events)
+
+    combatants = []
+    for template in (template_a, template_b):
+        creature = create_combatant(template, rng, pool)
+        creature.set_action_loop(loop)
+        combatants.append(creature)
+
+    melee = join_melee_combat(*combatants)
+    arena = Arena(loop, melee)
+    while all(c.is_conscious() for c in combatants) and loop.get_tick() < max_ticks:
+        arena.next_turn()
+        if loop.queued_action_count() == 0:
+            break  # nobody can do anything
+
+    standing = [i for i, c in enumerate(combatants) if c.is_conscious()]
+    winner = standing[0] if len(standing) == 1 else None
+    result = FightResult(winner, loop.get_tick(), *(get_equipment_cost(c) for c in combatants))
+    if pool is not None:
+        pool.release(*combatants)
+    return result
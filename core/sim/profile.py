@@ -0,0 +1,34 @@
+"""
+Profile the combat core over a batch of fights, reporting the time spent in each phase of the action loop,
+the combat resolver and the AI.
+
+Fights are run in this process, one after the other, so that every phase is recorded by the same profiler.
+
+usage: python -m core.sim.profile [fights per matchup] [seed]
+"""
+import itertools
+import sys
+import time
+
+from core.profiling import PhaseProfiler
+from core.rng import RandomStream
+from core.sim.fight import run_fight
+from core.sim.units import get_unit_templates
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    templates = get_unit_templates()[::4]
+    profiler = PhaseProfiler()
+    fights = 0
+    start = time.perf_counter()
+    for (i, template_a), (j, template_b) in itertools.combinations(enumerate(templates), 2):
+        for k in range(n):
+            run_fight(template_a, template_b, RandomStream(seed, (i, j, k)), profiler=profiler)
+            fights += 1
+    elapsed = time.perf_counter() - start
+
+    print(f'{fights} fights in {elapsed:.1f}s (seed: {seed})')
+    print()
+    profiler.dump()
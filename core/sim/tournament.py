@@ -0,0 +1,166 @@
+"""
+Monte-Carlo matchups and round-robin tournaments between creature templates.
+
+Fights are sharded across a process pool. Every fight draws from its own substream of the seed, keyed by the matchup
+and the index of the fight within it, so results do not depend on how the fights were distributed across workers and
+any single fight can be replayed with replay_fight().
+"""
+from __future__ import annotations
+
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor, Executor, Future
+from typing import TYPE_CHECKING, NamedTuple, Optional, Sequence, Tuple, List, Iterable, MutableMapping
+
+from core.rng import RandomStream
+from core.creature.pool import CreaturePool
+from core.sim.fight import FightResult, run_fight
+
+if TYPE_CHECKING:
+    from core.creature.template import CreatureTemplate
+
+DEFAULT_SHARD_SIZE = 20  # number of fights per task submitted to the process pool
+
+def wilson_interval(successes: int, trials: int, z: float = 1.96) -> Tuple[float, float]:
+    """Confidence interval for a success rate. The default z gives a 95% interval."""
+    if trials == 0:
+        return 0.0, 1.0
+    p = successes / trials
+    denom = 1 + z*z/trials
+    centre = (p + z*z/(2*trials)) / denom
+    margin = z * math.sqrt(p*(1 - p)/trials + z*z/(4*trials*trials)) / denom
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+class MatchupResult(NamedTuple):
+    names: Tuple[str, str]
+    seed: int
+    fights: int
+    wins: Tuple[int, int]
+    total_ticks: int
+    total_cost: Tuple[int, int]
+
+    @property
+    def draws(self) -> int:
+        return self.fights - sum(self.wins)
+
+    @property
+    def mean_ticks(self) -> float:
+        return self.total_ticks / self.fights if self.fights > 0 else 0.0
+
+    def win_rate(self, side: int) -> float:
+        return self.wins[side] / self.fights if self.fights > 0 else 0.0
+
+    def win_interval(self, side: int, z: float = 1.96) -> Tuple[float, float]:
+        return wilson_interval(self.wins[side], self.fights, z)
+
+    def mean_cost(self, side: int) -> float:
+        return self.total_cost[side] / self.fights if self.fights > 0 else 0.0
+
+    def cost_per_win(self, side: int) -> float:
+        """Equipment cost in sp spent per fight won"""
+        if self.wins[side] == 0:
+            return math.inf
+        return self.total_cost[side] / self.wins[side]
+
+    def __str__(self) -> str:
+        parts = []
+        for side in (0, 1):
+            low, high = self.win_interval(side)
+            parts.append(
+                f'{self.names[side]} {self.win_rate(side):.1%} [{low:.1%}, {high:.1%}] ({self.cost_per_win(side):.0f}sp/win)'
+            )
+        return f'{parts[0]} vs {parts[1]}, {self.draws} draws, {self.mean_ticks:.0f} ticks'
+
+def _merge_results(names: Tuple[str, str], seed: int, results: Iterable[FightResult]) -> MatchupResult:
+    fights, total_ticks = 0, 0
+    wins, total_cost = [0, 0], [0, 0]
+    for result in results:
+        fights += 1
+        total_ticks += result.ticks
+        total_cost[0] += result.cost_a
+        total_cost[1] += result.cost_b
+        if result.winner is not None:
+            wins[result.winner] += 1
+    return MatchupResult(names, seed, fights, (wins[0], wins[1]), total_ticks, (total_cost[0], total_cost[1]))
+
+def _run_shard(template_a: CreatureTemplate, template_b: CreatureTemplate,
+               seed: int, key: Tuple[int, ...], start: int, stop: int) -> List[FightResult]:
+    pool = CreaturePool()
+    return [
+        run_fight(template_a, template_b, RandomStream(seed, key + (i,)), pool=pool)
+        for i in range(start, stop)
+    ]
+
+def _submit_matchup(executor: Executor, template_a: CreatureTemplate, template_b: CreatureTemplate,
+                    n: int, seed: int, key: Tuple[int, ...], shard_size: int) -> List[Future]:
+    return [
+        executor.submit(_run_shard, template_a, template_b, seed, key, start, min(start + shard_size, n))
+        for start in range(0, n, shard_size)
+    ]
+
+def _collect(template_a: CreatureTemplate, template_b: CreatureTemplate, seed: int, futures: Iterable[Future]) -> MatchupResult:
+    results = itertools.chain.from_iterable(future.result() for future in futures)
+    return _merge_results((template_a.name, template_b.name), seed, results)
+
+def _resolve_seed(seed: Optional[int]) -> int:
+    return seed if seed is not None else RandomStream().entropy
+
+def run_matchup(template_a: CreatureTemplate, template_b: CreatureTemplate, n: int, seed: Optional[int] = None,
+                *, workers: Optional[int] = None, shard_size: int = DEFAULT_SHARD_SIZE) -> MatchupResult:
+    """Run n fights between two creature templates. If no seed is given, a new one is generated and recorded."""
+    seed = _resolve_seed(seed)
+    with ProcessPoolExecutor(workers) as executor:
+        futures = _submit_matchup(executor, template_a, template_b, n, seed, (), shard_size)
+        return _collect(template_a, template_b, seed, futures)
+
+def run_tournament(templates: Sequence[CreatureTemplate], n: int = 100, seed: Optional[int] = None,
+                   *, workers: Optional[int] = None, shard_size: int = DEFAULT_SHARD_SIZE) -> Sequence[MatchupResult]:
+    """Round-robin tournament: run n fights between every pair of templates."""
+    seed = _resolve_seed(seed)
+    pairings = list(itertools.combinations(range(len(templates)), 2))
+    with ProcessPoolExecutor(workers) as executor:
+        # submit everything up front so that the pool stays busy across matchups
+        submitted = [
+            (i, j, _submit_matchup(executor, templates[i], templates[j], n, seed, (i, j), shard_size))
+            for i, j in pairings
+        ]
+        return [ _collect(templates[i], templates[j], seed, futures) for i, j, futures in submitted ]
+
+def replay_fight(templates: Sequence[CreatureTemplate], seed: int, key: Tuple[int, ...]) -> FightResult:
+    """Replay a single fight with the combat log printed.
+    For run_matchup() the key is (fight index,), for run_tournament() it is (index a, index b, fight index)."""
+    if len(key) > 1:
+        template_a, template_b = templates[key[0]], templates[key[1]]
+    else:
+        template_a, template_b = templates
+    return run_fight(template_a, template_b, RandomStream(seed, key), verbose=True)
+
+class Standing(NamedTuple):
+    name: str
+    fights: int
+    wins: int
+    total_cost: int
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.fights if self.fights > 0 else 0.0
+
+    def win_interval(self, z: float = 1.96) -> Tuple[float, float]:
+        return wilson_interval(self.wins, self.fights, z)
+
+    def cost_per_win(self) -> float:
+        if self.wins == 0:
+            return math.inf
+        return self.total_cost / self.wins
+
+def get_standings(results: Iterable[MatchupResult]) -> Sequence[Standing]:
+    """Aggregate tournament results per template, sorted by win rate"""
+    totals: MutableMapping[str, List[int]] = {}
+    for result in results:
+        for side in (0, 1):
+            fights, wins, cost = totals.setdefault(result.names[side], [0, 0, 0])
+            totals[result.names[side]] = [
+                fights + result.fights, wins + result.wins[side], cost + result.total_cost[side]
+            ]
+    standings = (Standing(name, *values) for name, values in totals.items())
+    return sorted(standings, key=lambda s: s.win_rate, reverse=True)
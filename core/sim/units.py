@@ -0,0 +1,29 @@
+"""
+The unit templates defined in defines.units, for tournaments and analysis over all of them.
+"""
+from typing import List
+
+from core.creature.template import CreatureTemplate
+
+import defines.units.barbarians
+import defines.units.feudal
+import defines.units.wildalliance
+import defines.units.horses
+import defines.units.other
+
+UNIT_MODULES = [
+    defines.units.barbarians,
+    defines.units.feudal,
+    defines.units.wildalliance,
+    defines.units.horses,
+    defines.units.other,
+]
+
+def get_unit_templates() -> List[CreatureTemplate]:
+    # unit modules import templates from each other, so collect unique instances
+    templates = {}
+    for module in UNIT_MODULES:
+        for name, value in vars(module).items():
+            if name.startswith('CREATURE_') and isinstance(value, CreatureTemplate):
+                templates.setdefault(id(value), value)
+    return list(templates.values())
@@ -3,10 +3,14 @@ Arena mode: individual creature combat
 """
 from __future__ import annotations
 
+from core.action import ActionLoop
+from core.creature import Creature
 from core.creature.actions import *
 from core.combat.melee import *
 
 from core.creature.mind.tactics import SKILL_FACTOR
+from core.events import TurnStarted, TextLogSink
+from core.profiling import profile_phase
 
 if TYPE_CHECKING:
     from core.creature.inventory import Inventory
@@ -42,6 +46,9 @@ def try_equip_best_weapons(creature: Creature) -> None:
     weapons = sorted(weapon_value.keys(), key=lambda k: weapon_value[k])
     best_shield = max(shield_value.keys(), key=lambda k: shield_value[k], default=None)
 
+    if len(weapons) == 0:
+        return  # nothing to equip
+
     item = weapons.pop()
     inventory.try_equip_item(item)
     if item == best_shield:
@@ -77,17 +84,16 @@ class Arena:
 
         for idle in self.action_loop.get_idle_entities():
             if isinstance(idle, Creature):
-                action = idle.mind.next_combat_action()
+                with profile_phase(self.action_loop.profiler, 'mind.next_combat_action'):
+                    action = idle.mind.next_combat_action()
                 if action is not None:
                     idle.set_current_action(action)
 
-        print(f'Tick: {self.action_loop.elapsed} Action Queue:')
-        for item in self.action_loop.action_queue:
-            print(item.action)
-        print()
+        events = self.action_loop.events
+        if events.has_subscribers(TurnStarted):
+            events.emit(TurnStarted, tick=self.action_loop.elapsed, actions=list(self.action_loop.get_queued_actions()))
 
         self.action_loop.resolve_next()
-        print()
 
 if __name__ == '__main__':
     from defines.species import SPECIES_GNOLL, SPECIES_GOBLIN
@@ -100,6 +106,7 @@ if __name__ == '__main__':
     from defines.units.feudal import *
 
     loop = ActionLoop()
+    loop.events.subscribe(TextLogSink())
 
     def add_creature(template):
         #t = CreatureTemplate(template=template)
@@ -0,0 +1,238 @@
+"""
+Battle mode: many creatures on two or more sides, fighting in melee engagements that are assigned as the battle goes on.
+
+Each creature that is not engaged is paired with the least engaged enemy, until every enemy is engaged with
+max_engagements opponents. Creatures that are knocked out are retired from all of their engagements at the start of
+the next turn, and anyone left without an opponent is assigned a new one.
+"""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Iterable, List, MutableMapping, Optional
+
+from core.action import ActionLoop
+from core.creature import Creature
+from core.combat.melee import join_melee_combat
+from core.events import TurnStarted, Incapacitated, Death
+from core.profiling import profile_phase
+
+if TYPE_CHECKING:
+    from core.action import Entity
+    from core.creature.actions import CreatureAction
+    from core.combat.melee import MeleeCombat
+    from core.events import Event
+
+DEFAULT_MAX_ENGAGEMENTS = 3  # the most opponents that the battle will engage any one creature with
+
+class Battle:
+    def __init__(self, loop: ActionLoop, *, max_engagements: int = DEFAULT_MAX_ENGAGEMENTS):
+        self.action_loop = loop
+        self.max_engagements = max_engagements
+
+        self._side_of: MutableMapping[Creature, int] = {}  # only the creatures that are still fighting
+        self._casualties: List[List[Creature]] = []
+
+        ## the creatures still fighting on each side, indexed by the number of opponents they are engaged with,
+        ## so that finding an opponent for an unengaged creature does not need to look at the whole battle
+        self._engagements: MutableMapping[Creature, int] = {}
+        self._by_engagements: List[List[MutableMapping[Creature, None]]] = []
+        self._needs_assignment = False
+
+        self._retiring: MutableMapping[Creature, None] = {}
+        loop.events.subscribe(self._on_knocked_out, Incapacitated, Death)
+        loop.recheck_scope = self._get_recheck_scope
+
+    @staticmethod
+    def _get_recheck_scope(entity: Entity) -> Iterable[Entity]:
+        # an action can only affect the creature that took it, the mount and riders that share its separation from the
+        # enemy, and the opponents any of them are engaged with
+        if not isinstance(entity, Creature):
+            yield entity
+            return
+
+        base = entity.get_mount() or entity
+        riders = list(base.get_riders())
+        if len(riders) == 0:
+            yield entity
+            yield from entity.get_melee_opponents()
+            return
+
+        scope = dict.fromkeys([base, *riders])
+        for creature in [base, *riders]:
+            scope.update(dict.fromkeys(creature.get_melee_opponents()))
+        yield from scope
+
+    def _on_knocked_out(self, event: Event) -> None:
+        # retired at the start of the next turn, so that engagements don't change while an attack is resolving
+        if event.creature in self._side_of:
+            self._retiring[event.creature] = None
+
+    ## Sides
+
+    def add_side(self, creatures: Iterable[Creature] = ()) -> int:
+        side = len(self._by_engagements)
+        self._by_engagements.append([ {} for _ in range(self.max_engagements + 1) ])
+        self._casualties.append([])
+        for creature in creatures:
+            self.add_creature(creature, side)
+        return side
+
+    def add_creature(self, creature: Creature, side: int) -> None:
+        creature.set_action_loop(self.action_loop)
+        self._side_of[creature] = side
+        self._update_index(creature)
+
+    def get_side_count(self) -> int:
+        return len(self._by_engagements)
+
+    def get_side(self, creature: Creature) -> Optional[int]:
+        return self._side_of.get(creature)
+
+    def get_fighting(self, side: int) -> Iterable[Creature]:
+        return (creature for buckets in self._by_engagements[side] for creature in buckets)
+
+    def get_fighting_count(self, side: int) -> int:
+        return sum(len(bucket) for bucket in self._by_engagements[side])
+
+    def get_casualties(self, side: int) -> Iterable[Creature]:
+        return iter(self._casualties[side])
+
+    def get_standing_sides(self) -> List[int]:
+        return [ side for side in range(self.get_side_count()) if self.get_fighting_count(side) > 0 ]
+
+    def is_finished(self) -> bool:
+        return len(self.get_standing_sides()) <= 1
+
+    ## Engagements
+
+    def _update_index(self, creature: Creature) -> None:
+        side = self._side_of.get(creature)
+        if side is None:
+            return  # not part of the battle, e.g. a mount
+
+        count = min(creature.get_melee_opponent_count(), self.max_engagements)
+        prev_count = self._engagements.get(creature)
+        if count == prev_count:
+            return
+
+        buckets = self._by_engagements[side]
+        if prev_count is not None:
+            del buckets[prev_count][creature]
+        buckets[count][creature] = None
+        self._engagements[creature] = count
+        if count == 0:
+            self._needs_assignment = True
+
+    def engage(self, a: Creature, b: Creature) -> MeleeCombat:
+        melee = join_melee_combat(a, b)
+        ## mounted creatures engage their mount and riders as well
+        for creature in (a, b):
+            self._update_index(creature)
+            for opponent in creature.get_melee_opponents():
+                self._update_index(opponent)
+            action = creature.get_current_action()
+            if action is not None and not action.can_resolve():
+                creature.set_current_action(None)  # e.g. moving
+        return melee
+
+    def _find_opponent(self, creature: Creature, side: int) -> Optional[Creature]:
+        """Find the least engaged enemy that can take on another opponent"""
+        for count in range(self.max_engagements):
+            for other_side, buckets in enumerate(self._by_engagements):
+                if other_side != side and len(buckets[count]) > 0:
+                    return next(iter(buckets[count]))
+        return None
+
+    def assign_engagements(self) -> None:
+        self._needs_assignment = False
+        for side, buckets in enumerate(self._by_engagements):
+            for creature in list(buckets[0]):
+                if self._engagements.get(creature) != 0:
+                    continue  # engaged by an earlier assignment, or retired
+                opponent = self._find_opponent(creature, side)
+                if opponent is not None:
+                    self.engage(creature, opponent)
+
+    def retire(self, creature: Creature) -> None:
+        """Remove a creature from the battle and from all of its engagements"""
+        side = self._side_of.pop(creature, None)
+        if side is None:
+            return
+
+        del self._by_engagements[side][self._engagements.pop(creature)][creature]
+        self._casualties[side].append(creature)
+
+        opponents = list(creature.get_melee_opponents())
+        for opponent in opponents:
+            creature.get_melee_combat(opponent).break_engagement()
+        for opponent in opponents:
+            self._update_index(opponent)
+            if opponent not in self._side_of:
+                continue
+            action = opponent.get_current_action()
+            if action is not None and not action.can_resolve():
+                opponent.set_current_action(None)  # e.g. an attack on the retired creature
+
+        self.action_loop.remove_entity(creature)
+
+    ## Turns
+
+    def get_next_action(self, creature: Creature) -> Optional[CreatureAction]:
+        with profile_phase(self.action_loop.profiler, 'mind.next_combat_action'):
+            return creature.mind.next_combat_action()
+
+    def next_turn(self) -> None:
+        if len(self._retiring) > 0:
+            for creature in self._retiring:
+                self.retire(creature)
+            self._retiring.clear()
+
+        if self._needs_assignment:
+            self.assign_engagements()
+
+        for idle in self.action_loop.get_idle_entities():
+            if isinstance(idle, Creature):
+                action = self.get_next_action(idle)
+                if action is not None:
+                    idle.set_current_action(action)
+
+        events = self.action_loop.events
+        if events.has_subscribers(TurnStarted):
+            events.emit(TurnStarted, tick=self.action_loop.elapsed, actions=list(self.action_loop.get_queued_actions()))
+
+        self.action_loop.resolve_next()
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from core.rng import RandomStream
+    from core.world.arena import try_equip_best_weapons
+
+    from defines.units.barbarians import CREATURE_GOBLIN_SPEARMAN, CREATURE_ORC_BARBARIAN
+    from defines.units.feudal import CREATURE_LEVY_SPEARMAN, CREATURE_SERGEANT_SPEARMAN
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    rng = RandomStream(seed)
+    loop = ActionLoop(rng)
+    battle = Battle(loop)
+
+    def create_company(*templates):
+        for i in range(count):
+            creature = Creature(templates[i % len(templates)], rng=rng)
+            try_equip_best_weapons(creature)
+            yield creature
+
+    battle.add_side(create_company(CREATURE_GOBLIN_SPEARMAN, CREATURE_GOBLIN_SPEARMAN, CREATURE_ORC_BARBARIAN))
+    battle.add_side(create_company(CREATURE_LEVY_SPEARMAN, CREATURE_LEVY_SPEARMAN, CREATURE_SERGEANT_SPEARMAN))
+
+    start = time.perf_counter()
+    while not battle.is_finished():
+        battle.next_turn()
+        if loop.queued_action_count() == 0:
+            break
+    elapsed = time.perf_counter() - start
+
+    print(f'{loop.get_tick()} ticks in {elapsed:.1f}s (seed: {rng.entropy})')
+    for side in range(battle.get_side_count()):
+        print(f'side {side}: {battle.get_fighting_count(side)} standing, {len(list(battle.get_casualties(side)))} casualties')
@@ -0,0 +1,188 @@
+"""
+Battlefield mode: a Battle where every creature has a position on a 2D field.
+
+Creatures are kept in a SpatialGrid. A creature that is not engaged moves toward the nearest enemy, and is engaged with
+an enemy once one is within ENGAGE_DISTANCE, so deciding who engages whom only looks at the cells around each
+unengaged creature instead of at every pair of creatures. Only the creatures that might have found an opponent since the
+last assignment are looked at: those that moved, and those near an enemy that can now take on another opponent.
+Engaged creatures hold their position until they have no opponents left.
+"""
+from __future__ import annotations
+
+import math
+from typing import TYPE_CHECKING, Iterable, List, MutableMapping, Optional
+
+from core.action import ActionLoop
+from core.creature import Creature
+from core.creature.actions import CreatureAction
+from core.world.battle import Battle, DEFAULT_MAX_ENGAGEMENTS
+from core.world.grid import Position, SpatialGrid
+
+if TYPE_CHECKING:
+    from core.action import Action
+
+ENGAGE_DISTANCE = 2.0  # in metres, creatures closer than this to an enemy can engage them in melee
+MOVE_DISTANCE = 1.5  # in metres, the distance covered by one move action at the default action rate
+DEFAULT_SPACING = 1.0  # in metres, between creatures deployed in a block
+
+def get_block_positions(count: int, centre: Position, files: int, spacing: float = DEFAULT_SPACING) -> List[Position]:
+    """Positions for a block of creatures, with the given number of files (columns) and as many ranks as needed"""
+    ranks = math.ceil(count / files)
+    left = centre.x - (files - 1) * spacing / 2
+    top = centre.y - (ranks - 1) * spacing / 2
+    return [ Position(left + (i % files) * spacing, top + (i // files) * spacing) for i in range(count) ]
+
+class MoveAction(CreatureAction):
+    can_interrupt = True
+
+    def __init__(self, field: Battlefield, destination: Position):
+        self.field = field
+        self.destination = destination
+
+    def can_resolve(self) -> bool:
+        return self.protagonist.get_melee_opponent_count() == 0  # engaged creatures stand their ground
+
+    def resolve(self) -> Optional[Action]:
+        self.field.move_toward(self.protagonist, self.destination, MOVE_DISTANCE)
+        return None
+
+class Battlefield(Battle):
+    def __init__(self, loop: ActionLoop, *, max_engagements: int = DEFAULT_MAX_ENGAGEMENTS,
+                 engage_distance: float = ENGAGE_DISTANCE):
+        super().__init__(loop, max_engagements=max_engagements)
+        self.engage_distance = engage_distance
+        self.grid = SpatialGrid(engage_distance)
+        self._pending: MutableMapping[Creature, None] = {}  # unengaged creatures that should look for an opponent
+
+    def add_side(self, creatures: Iterable[Creature] = (), positions: Optional[Iterable[Position]] = None) -> int:
+        """Add a side, with each creature at the position given for it, or at the origin if no positions are given"""
+        creatures = list(creatures)
+        positions = list(positions) if positions is not None else [ Position(0.0, 0.0) ] * len(creatures)
+        if len(positions) != len(creatures):
+            raise ValueError(f'got {len(positions)} positions for {len(creatures)} creatures')
+
+        side = super().add_side()
+        for creature, position in zip(creatures, positions):
+            self.add_creature(creature, side, position)
+        return side
+
+    def add_creature(self, creature: Creature, side: int, position: Position = Position(0.0, 0.0)) -> None:
+        self.grid.add(creature, position)
+        super().add_creature(creature, side)
+
+    def get_position(self, creature: Creature) -> Position:
+        return self.grid.get_position(creature)
+
+    def retire(self, creature: Creature) -> None:
+        if creature in self.grid:
+            self.grid.remove(creature)
+        super().retire(creature)
+
+    def move_toward(self, creature: Creature, destination: Position, distance: float) -> None:
+        position = self.grid.get_position(creature)
+        # stop short of the destination, which is usually where an enemy is standing
+        distance = min(distance, position.distance(destination) - self.engage_distance/2)
+        if distance > 0:
+            self.grid.move(creature, position.step_toward(destination, distance))
+            self._pending[creature] = None
+            self._needs_assignment = True
+
+    def _update_index(self, creature: Creature) -> None:
+        prev_count = self._engagements.get(creature)
+        super()._update_index(creature)
+        count = self._engagements.get(creature)
+        if count is None or (prev_count is not None and count >= prev_count) or count >= self.max_engagements:
+            return
+
+        ## this creature can take on another opponent, so anyone unengaged nearby may be able to engage it
+        if count == 0:
+            self._pending[creature] = None
+        if creature in self.grid:
+            for other in self.grid.query_radius(self.grid.get_position(creature), self.engage_distance):
+                if self._engagements.get(other) == 0:
+                    self._pending[other] = None
+        self._needs_assignment = True
+
+    def assign_engagements(self) -> None:
+        self._needs_assignment = False
+        pending, self._pending = self._pending, {}
+        for creature in pending:
+            side = self._side_of.get(creature)
+            if side is None or self._engagements[creature] != 0:
+                continue  # engaged by an earlier assignment, or retired
+            opponent = self._find_opponent(creature, side)
+            if opponent is not None:
+                self.engage(creature, opponent)
+
+    def _is_enemy(self, creature: Creature, side: int) -> bool:
+        other_side = self.get_side(creature)
+        return other_side is not None and other_side != side
+
+    def _find_opponent(self, creature: Creature, side: int) -> Optional[Creature]:
+        """Find the least engaged enemy within reach that can take on another opponent, preferring the closest"""
+        position = self.grid.get_position(creature)
+        candidates = [
+            enemy for enemy in self.grid.query_radius(position, self.engage_distance)
+            if self._is_enemy(enemy, side) and self._engagements[enemy] < self.max_engagements
+        ]
+        return min(candidates, default=None, key=lambda enemy: (
+            self._engagements[enemy], position.distance(self.grid.get_position(enemy))
+        ))
+
+    def get_next_action(self, creature: Creature) -> Optional[CreatureAction]:
+        action = super().get_next_action(creature)
+        if action is None and creature.get_melee_opponent_count() == 0:
+            ## head for the nearest enemy that can take on another opponent, or failing that the nearest enemy
+            side = self.get_side(creature)
+            position = self.grid.get_position(creature)
+            enemy = self.grid.get_nearest(position, lambda other: (
+                self._is_enemy(other, side) and self._engagements[other] < self.max_engagements
+            ))
+            if enemy is None:
+                enemy = self.grid.get_nearest(position, lambda other: self._is_enemy(other, side))
+            if enemy is not None:
+                return MoveAction(self, self.grid.get_position(enemy))
+        return action
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from core.rng import RandomStream
+    from core.world.arena import try_equip_best_weapons
+
+    from defines.units.barbarians import CREATURE_GOBLIN_SPEARMAN, CREATURE_ORC_BARBARIAN
+    from defines.units.feudal import CREATURE_LEVY_SPEARMAN, CREATURE_SERGEANT_SPEARMAN
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    rng = RandomStream(seed)
+    loop = ActionLoop(rng)
+    field = Battlefield(loop)
+
+    def create_company(*templates):
+        for i in range(count):
+            creature = Creature(templates[i % len(templates)], rng=rng)
+            try_equip_best_weapons(creature)
+            yield creature
+
+    files = max(1, round(math.sqrt(count * 4)))
+    field.add_side(
+        create_company(CREATURE_GOBLIN_SPEARMAN, CREATURE_GOBLIN_SPEARMAN, CREATURE_ORC_BARBARIAN),
+        get_block_positions(count, Position(0.0, -10.0), files),
+    )
+    field.add_side(
+        create_company(CREATURE_LEVY_SPEARMAN, CREATURE_LEVY_SPEARMAN, CREATURE_SERGEANT_SPEARMAN),
+        get_block_positions(count, Position(0.0, +10.0), files),
+    )
+
+    start = time.perf_counter()
+    while not field.is_finished():
+        field.next_turn()
+        if loop.queued_action_count() == 0:
+            break
+    elapsed = time.perf_counter() - start
+
+    print(f'{loop.get_tick()} ticks in {elapsed:.1f}s (seed: {rng.entropy})')
+    for side in range(field.get_side_count()):
+        print(f'side {side}: {field.get_fighting_count(side)} standing, {len(list(field.get_casualties(side)))} casualties')
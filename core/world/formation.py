@@ -1,10 +1,556 @@
+"""
+Formations: many soldiers of the same template, simulated together.
+
+A Formation keeps the state of its soldiers in arrays, and takes everything that does not change over a fight from a
+few prototype Creatures, one for each rolled loadout. FormationMelee resolves melee between two formations a round at a
+time, with the attacks between each pair of loadouts at the same separation resolved together as arrays, following
+MeleeCombatResolver. Both soldiers in an engagement share one separation, which they change as the AI would and with
+the criticals that close or open the range.
+
+Not modelled: other critical effects, stuns, attacks of opportunity, weapon switching, the order of actions within a
+round, the effects of injuries on what a soldier can do, and mounts. python -m core.analysis.formation compares one on
+one fights against run_fight().
+"""
 from __future__ import annotations
-from typing import TYPE_CHECKING
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterable, List, MutableMapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.action import ActionLoop
+from core.constants import MeleeRange, Stance
+from core.creature import Creature
+from core.creature.traits import EvadeTrait
+from core.contest import Contest, DifficultyGrade, UnopposedResult, SKILL_ENDURANCE, SKILL_EVADE, SKILL_ACROBATICS
+from core.combat.criticals import CriticalUsage
+from core.combat.damage import ArmorTable, DamageType
+from core.combat.melee import MeleeSeparation, join_melee_combat
+from core.combat.resolver import get_parry_damage_mult
+from core.analysis.markov import (
+    RangeCritical, get_attack_choices, get_defence_choices, get_shield_block, get_range_change, get_range_critical,
+)
+from core.world.arena import try_equip_best_weapons
+from core.world.battle import DEFAULT_MAX_ENGAGEMENTS
+
 if TYPE_CHECKING:
+    from core.rng import RandomStream
     from core.creature.template import CreatureTemplate
+    from core.combat.attack import MeleeAttack
+
+MAX_LOADOUTS = 8  # the number of prototype creatures per formation, each with its own rolled loadout
+MAX_FORMATION_ROUNDS = 1000  # fights that take longer than this are called a draw
 
 class FormationTemplate:
     def __init__(self, name: str, creature: CreatureTemplate, mount: CreatureTemplate = None):
+        if mount is not None:
+            raise ValueError(f'{name}: mounted formations are not simulated yet')
         self.name = name
         self.creature = creature
         self.mount = mount  # mounted formations
+
+    def create(self, size: int, rng: RandomStream, *, loadouts: int = MAX_LOADOUTS) -> Formation:
+        return Formation(self, size, rng, loadouts=loadouts)
+
+class Formation:
+    def __init__(self, template: FormationTemplate, size: int, rng: RandomStream, *, loadouts: int = MAX_LOADOUTS):
+        self.template = template
+        self.size = size
+
+        self.prototypes: List[Creature] = []
+        for _ in range(max(1, min(size, loadouts))):
+            creature = Creature(template.creature, rng=rng)
+            try_equip_best_weapons(creature)
+            self.prototypes.append(creature)
+
+        self.bodyparts = list(self.prototypes[0].get_bodyparts())
+        if len(self.bodyparts) > 32:
+            raise ValueError(f'{template.creature.name} has too many body parts for the injury bitmask')
+
+        ## struct of arrays, one entry per soldier
+        self.loadout = (np.arange(size) % len(self.prototypes)).astype(np.int8)  # index into prototypes
+        self.health = np.full(size, self.max_health, dtype=np.float32)
+        self.stance = np.full(size, self.prototypes[0].max_stance.value, dtype=np.int8)
+        self.injured = np.zeros(size, dtype=np.uint32)  # bit i is set if bodyparts[i] is injured
+        self.conscious = np.ones(size, dtype=bool)
+        self.opponent = np.full(size, -1, dtype=np.int32)  # index into the enemy formation, or -1 if not engaged
+        self.separation = np.zeros(size, dtype=np.int8)  # the MeleeRange between a soldier and the enemy they are fighting
+
+    @property
+    def name(self) -> str:
+        return self.template.name
+
+    @property
+    def max_health(self) -> float:
+        return self.prototypes[0].max_health
+
+    def get_max_stance(self) -> np.ndarray:
+        return np.array([ creature.max_stance.value for creature in self.prototypes ], dtype=np.int8)[self.loadout]
+
+    def get_standing_count(self) -> int:
+        return int(np.count_nonzero(self.conscious))
+
+    def get_injured_count(self) -> int:
+        return int(np.count_nonzero(self.injured))
+
+    def is_defeated(self) -> bool:
+        return not self.conscious.any()
+
+    def __str__(self) -> str:
+        return f'{self.name} ({self.get_standing_count()}/{self.size})'
+
+
+## Difficulty
+
+_STANCE_GRADE = {
+    Stance.Prone     : DifficultyGrade.Formidable,
+    Stance.Crouching : DifficultyGrade.Hard,
+    Stance.Standing  : DifficultyGrade.Standard,
+    Stance.Mounted   : DifficultyGrade.Standard,
+}
+
+@lru_cache
+def _get_combat_modifier_table(step: int, critical: bool) -> np.ndarray:
+    table = np.zeros((len(Stance), 2), dtype=int)
+    for stance, grade in _STANCE_GRADE.items():
+        for serious in (0, 1):
+            modifier = grade.get_step(serious).get_step(step).to_modifier()
+            table[stance.value, serious] = modifier.critical if critical else modifier.contest
+    return table
+
+def _get_combat_modifiers(stance: np.ndarray, seriously_wounded: np.ndarray, step: int = 0,
+                          *, critical: bool = False) -> np.ndarray:
+    """Equivalent to get_combat_difficulty() for each soldier, as a contest modifier or as a modifier to crit totals"""
+    return _get_combat_modifier_table(step, critical)[stance, seriously_wounded.astype(int)]
+
+def _get_block_modifiers(seriously_wounded: np.ndarray) -> np.ndarray:
+    """Equivalent to get_block_difficulty() for each soldier, as a contest modifier"""
+    return np.where(seriously_wounded, DifficultyGrade.Standard.get_step(+1).contest_mod, DifficultyGrade.Standard.contest_mod)
+
+_INJURY_MODIFIERS = np.array([ DifficultyGrade.VeryEasy.get_step(step).contest_mod for step in range(len(DifficultyGrade)) ])
+
+
+## Separation
+
+def _set_separation(formation: Formation, enemy: Formation, soldiers: np.ndarray, separation: np.ndarray | int) -> None:
+    """Change the separation between soldiers and the enemies they are fighting, on both sides if they are fighting each other"""
+    formation.separation[soldiers] = separation
+    opponents = formation.opponent[soldiers]
+    mutual = enemy.opponent[opponents] == soldiers
+    enemy.separation[opponents[mutual]] = np.broadcast_to(separation, soldiers.shape)[mutual]
+
+class _RangeChange(NamedTuple):
+    chance: float  # the chance of trying to change range instead of attacking
+    separation: MeleeRange  # the separation it is changed to
+    success: float  # the chance that the opponent does not stop it
+
+
+## Critical Effects
+
+def _get_crit_levels(margin: np.ndarray) -> np.ndarray:
+    """Equivalent to get_crit_level() for each margin"""
+    return np.clip(np.trunc((margin - 1) / Contest.CRIT_THRESH), 0, Contest.MAX_CRIT).astype(int)
+
+def _get_crit_offset(creature: Creature, contest: Contest) -> int:
+    """The difference between the crit total and the contest total of a roll, not counting situational modifiers"""
+    skill_level = creature.get_skill_level(contest)
+    return contest.get_crit_modifier(skill_level) - contest.get_attribute_modifier(creature) - contest.get_skill_modifier(skill_level)
+
+
+## Attacks
+
+class _DefenceChoices(NamedTuple):
+    defences: Sequence[Optional[MeleeAttack]]
+    chances: np.ndarray
+    crit_offsets: Sequence[int]
+    range_crits: Sequence[RangeCritical]
+
+class _AttackTable:
+    """Everything about the attacks that soldiers with one loadout make against soldiers with another"""
+    def __init__(self, attacker: Creature, defender: Creature, separation: MeleeRange):
+        self.attacker = attacker
+        self.defender = defender
+
+        attacks = (attack for attack in attacker.get_melee_attacks() if attack.can_attack(separation))
+        choices = get_attack_choices(attacker, defender, attacks)
+        self.attacks: Sequence[MeleeAttack] = list(choices.keys())
+        self.attack_chances = np.array(list(choices.values()))
+        self.attack_crit_offsets = [ _get_crit_offset(attacker, attack.combat_test) for attack in self.attacks ]
+        attacker_target = attacker.mind.get_desired_melee_range(defender)
+        defender_target = defender.mind.get_desired_melee_range(attacker)
+        self.attack_range_crits = [
+            get_range_critical(attacker_target, separation, CriticalUsage.Offensive|CriticalUsage.Melee, attack.get_criticals())
+            for attack in self.attacks
+        ]
+
+        self.defences = []
+        for attack in self.attacks:
+            defences = list(get_defence_choices(defender, attack, separation).items())
+            self.defences.append(_DefenceChoices(
+                [ defence for defence, chance in defences ],
+                np.array([ chance for defence, chance in defences ]),
+                [ _get_crit_offset(defender, defence.combat_test) if defence is not None else 0 for defence, chance in defences ],
+                [
+                    get_range_critical(defender_target, separation, CriticalUsage.Defensive|CriticalUsage.Melee, defence.get_criticals())
+                    if defence is not None else RangeCritical(0.0, separation)
+                    for defence, chance in defences
+                ],
+            ))
+        self.can_evade = defender.has_trait(EvadeTrait)
+        self.evade_crit_offset = _get_crit_offset(defender, SKILL_EVADE)
+        self.shield = get_shield_block(defender, separation)
+
+        bodyparts = list(defender.get_bodyparts())
+        exposure = np.array([ bp.exposure for bp in bodyparts ], dtype=float)
+        self.hitloc_chances = exposure / exposure.sum()
+        self.armor_table = ArmorTable(defender)
+        self.injury_threshold = np.array([ 4/3 * bp.size * defender.max_health for bp in bodyparts ], dtype=float)
+        self.injury_bits = (np.uint32(1) << np.arange(len(bodyparts), dtype=np.uint32))
+
+        self.defender_size = float(defender.size)
+        self.resist_knockdown = defender.get_resist_knockdown_modifier().contest
+
+    def resolve(self, attackers: np.ndarray, defenders: np.ndarray,
+                formation: Formation, enemy: Formation, rng: np.random.Generator) -> None:
+        choice = rng.choice(len(self.attacks), size=len(attackers), p=self.attack_chances)
+        for index, attack in enumerate(self.attacks):
+            selected = np.flatnonzero(choice == index)
+            if len(selected) > 0:
+                self._resolve_attack(index, attack, attackers[selected], defenders[selected], formation, enemy, rng)
+
+    def _resolve_attack(self, index: int, attack: MeleeAttack, attackers: np.ndarray, defenders: np.ndarray,
+                        formation: Formation, enemy: Formation, rng: np.random.Generator) -> None:
+        n = len(attackers)
+        attacker_serious = formation.health[attackers] <= 0
+        attacker_stance = formation.stance[attackers]
+        defender_serious = enemy.health[defenders] <= 0
+        defender_stance = enemy.stance[defenders]
+
+        attack_base = attack.combat_test.roll_many(self.attacker, n, rng=rng)
+        attack_total = attack_base + _get_combat_modifiers(attacker_stance, attacker_serious)
+        success = np.zeros(n, dtype=bool)
+        damage_mult = np.zeros(n)
+
+        # crit totals are only needed for critical effects that change the separation
+        attack_range_crit = self.attack_range_crits[index]
+        choices = self.defences[index]
+        check_crits = attack_range_crit.chance > 0 or any(crit.chance > 0 for crit in choices.range_crits)
+        if check_crits:
+            attack_crit_base = attack_base + self.attack_crit_offsets[index]
+            attack_crit = np.zeros(n, dtype=int)
+
+        defence_choice = rng.choice(len(choices.defences), size=n, p=choices.chances)
+        for defence_index, defence in enumerate(choices.defences):
+            sel = np.flatnonzero(defence_choice == defence_index)
+            if len(sel) == 0:
+                continue
+            defend_modifier = _get_combat_modifiers(defender_stance[sel], defender_serious[sel])
+            if defence is not None:
+                defend_base = defence.combat_test.roll_many(self.defender, len(sel), rng=rng)
+                defend_total = defend_base + defend_modifier
+                success[sel] = attack_total[sel] > defend_total
+                damage_mult[sel] = np.where(success[sel], 1.0, get_parry_damage_mult(attack.force, defence.force))
+                if check_crits:
+                    margin = (
+                        attack_crit_base[sel] + _get_combat_modifiers(attacker_stance[sel], attacker_serious[sel], critical=True)
+                        - defend_base - choices.crit_offsets[defence_index]
+                        - _get_combat_modifiers(defender_stance[sel], defender_serious[sel], critical=True)
+                    )
+                    attack_crit[sel] = np.where(success[sel], _get_crit_levels(margin), 0)
+                    self._resolve_range_critical(
+                        choices.range_crits[defence_index], np.where(success[sel], 0, _get_crit_levels(-margin)),
+                        defender_stance[sel], attackers[sel], defenders[sel], formation, enemy, rng,
+                    )
+            elif self.can_evade:
+                evade_base = SKILL_EVADE.roll_many(self.defender, len(sel), rng=rng)
+                evade_total = evade_base + defend_modifier
+                success[sel] = attack_total[sel] > evade_total
+                damage_mult[sel] = success[sel]
+                if check_crits:
+                    margin = (
+                        attack_crit_base[sel] + _get_combat_modifiers(attacker_stance[sel], attacker_serious[sel], critical=True)
+                        - evade_base - self.evade_crit_offset
+                        - _get_combat_modifiers(defender_stance[sel], defender_serious[sel], critical=True)
+                    )
+                    attack_crit[sel] = np.where(success[sel], _get_crit_levels(margin), 0)
+            else:
+                attack_total[sel] = attack_base[sel] + _get_combat_modifiers(attacker_stance[sel], attacker_serious[sel], -1)
+                success[sel] = attack_total[sel] > UnopposedResult.DEFAULT_TARGET + defend_modifier
+                damage_mult[sel] = success[sel]
+                if check_crits:
+                    margin = (
+                        attack_crit_base[sel] + _get_combat_modifiers(attacker_stance[sel], attacker_serious[sel], -1, critical=True)
+                        - UnopposedResult.DEFAULT_TARGET - defend_modifier
+                    )
+                    attack_crit[sel] = np.where(success[sel], _get_crit_levels(margin), 0)
+
+        if check_crits:
+            self._resolve_range_critical(attack_range_crit, attack_crit, attacker_stance, attackers, defenders, formation, enemy, rng)
+
+        # the defender attempts to block whenever it would reduce the damage
+        if self.shield is not None:
+            block_mult = get_parry_damage_mult(attack.force, self.shield.force)
+            attempt = np.flatnonzero(damage_mult > block_mult)
+            if len(attempt) > 0:
+                block_total = (
+                    self.shield.combat_test.roll_many(self.defender, len(attempt), rng=rng)
+                    + _get_block_modifiers(defender_serious[attempt]) + self.shield.contest_modifier.contest
+                )
+                damage_mult[attempt[block_total > attack_total[attempt]]] = block_mult
+
+        hits = np.flatnonzero(damage_mult > 0)
+        if len(hits) == 0:
+            return
+        self._resolve_damage(attack, defenders[hits], attack_total[hits], damage_mult[hits], enemy, rng)
+
+    @staticmethod
+    def _resolve_range_critical(range_crit: RangeCritical, crit_level: np.ndarray, stance: np.ndarray,
+                                attackers: np.ndarray, defenders: np.ndarray,
+                                formation: Formation, enemy: Formation, rng: np.random.Generator) -> None:
+        """Change the separation between attackers and defenders, for the critical effects that would"""
+        if range_crit.chance <= 0:
+            return
+        check = np.flatnonzero((crit_level > 0) & (stance == Stance.Standing.value))
+        if len(check) == 0:
+            return
+
+        changed = check[rng.random(len(check)) < range_crit.get_change_chance(crit_level[check])]
+        _set_separation(formation, enemy, attackers[changed], range_crit.separation)
+
+    def _resolve_damage(self, attack: MeleeAttack, targets: np.ndarray, attack_total: np.ndarray,
+                        damage_mult: np.ndarray, enemy: Formation, rng: np.random.Generator) -> None:
+        n = len(targets)
+        hitloc = rng.choice(len(self.hitloc_chances), size=n, p=self.hitloc_chances)
+        damage = attack.damage.roll_many(n, rng) * damage_mult
+        armpen = attack.armpen.roll_many(n, rng) * damage_mult
+
+        wounds = self.armor_table.get_wounds(damage, armpen, hitloc)
+        wounded = wounds > 0
+
+        # injuries
+        injury_steps = (wounds / self.injury_threshold[hitloc] - 1.0).astype(int)
+        check = np.flatnonzero(wounded & (injury_steps > 0))
+        if len(check) > 0:
+            modifier = _INJURY_MODIFIERS[np.minimum(injury_steps[check], len(_INJURY_MODIFIERS) - 1)]
+            endurance_total = SKILL_ENDURANCE.roll_many(self.defender, len(check), rng=rng) + modifier
+            injured = check[endurance_total <= attack_total[check]]
+            np.bitwise_or.at(enemy.injured, targets[injured], self.injury_bits[hitloc[injured]])
+
+        # a soldier hit more than once in the same batch is tested against the health left after all of the hits
+        np.subtract.at(enemy.health, targets[wounded], wounds[wounded])
+        health = enemy.health[targets]
+        out = wounded & (health <= -enemy.max_health)  # always taken out of the fight, dead or not
+        check = np.flatnonzero(wounded & (health <= 0) & ~out)
+        if len(check) > 0:
+            endurance_total = SKILL_ENDURANCE.roll_many(self.defender, len(check), rng=rng)
+            out[check] = endurance_total <= attack_total[check]
+        enemy.conscious[targets[out]] = False
+        enemy.stance[targets[out]] = Stance.Prone.value
+
+        # knockdown, as in MeleeCombatResolver._resolve_knockdown()
+        size = self.defender_size
+        if attack.damtype == DamageType.Bludgeon:
+            knockdown_threshold = size * 2/3
+        elif attack.damtype == DamageType.Puncture:
+            knockdown_threshold = size * 3/2
+        else:
+            knockdown_threshold = size
+
+        knockdown = (damage + wounds)/2  # blocked damage is only counted as half for knockdown
+        check = np.flatnonzero(
+            enemy.conscious[targets] & (enemy.stance[targets] > Stance.Prone.value) & (knockdown >= knockdown_threshold)
+        )
+        if len(check) > 0:
+            modifier = np.where(
+                knockdown[check] >= size, np.trunc(size - knockdown[check]), DifficultyGrade.Easy.contest_mod
+            ) + self.resist_knockdown
+            acrobatics_total = SKILL_ACROBATICS.roll_many(self.defender, len(check), rng=rng) + modifier
+            knocked_down = check[acrobatics_total <= UnopposedResult.DEFAULT_TARGET]
+            enemy.stance[targets[knocked_down]] = Stance.Prone.value
+
+
+## Melee
+
+class FormationMelee:
+    def __init__(self, a: Formation, b: Formation, rng: RandomStream, *, max_engagements: int = DEFAULT_MAX_ENGAGEMENTS):
+        self.formations = (a, b)
+        self.max_engagements = max_engagements
+        self.rounds = 0
+        self._rng = rng.numpy()
+
+        # the prototypes are engaged with each other so that the AI can be asked about them
+        loop = ActionLoop(rng)
+        for creature in (*a.prototypes, *b.prototypes):
+            creature.set_action_loop(loop)
+        for creature in a.prototypes:
+            for opponent in b.prototypes:
+                join_melee_combat(creature, opponent)
+
+        # where an engagement between each pair of loadouts starts, as in join_melee_combat(), [side][loadout, enemy loadout]
+        start = np.array([
+            [ creature.get_melee_combat(opponent).get_separation() for opponent in b.prototypes ] for creature in a.prototypes
+        ], dtype=np.int8)
+        self._start_separation = (start, start.T)
+
+        max_rate = max(creature.get_action_rate() for formation in self.formations for creature in formation.prototypes)
+        self._act_chance = [
+            np.array([ creature.get_action_rate() / max_rate for creature in formation.prototypes ])
+            for formation in self.formations
+        ]
+        self._attack_tables: MutableMapping[Tuple[int, int, int, int], Optional[_AttackTable]] = {}
+        self._range_changes: MutableMapping[Tuple[int, int, int, int], _RangeChange] = {}
+
+    def _get_attack_table(self, side: int, attacker_loadout: int, defender_loadout: int, separation: int) -> Optional[_AttackTable]:
+        key = side, attacker_loadout, defender_loadout, separation
+        if key not in self._attack_tables:
+            attacker = self.formations[side].prototypes[attacker_loadout]
+            defender = self.formations[1 - side].prototypes[defender_loadout]
+            table = _AttackTable(attacker, defender, MeleeRange(separation))
+            self._attack_tables[key] = table if len(table.attacks) > 0 else None
+        return self._attack_tables[key]
+
+    def _get_range_change(self, side: int, loadout: int, enemy_loadout: int, separation: int) -> _RangeChange:
+        key = side, loadout, enemy_loadout, separation
+        if key not in self._range_changes:
+            creature = self.formations[side].prototypes[loadout]
+            opponent = self.formations[1 - side].prototypes[enemy_loadout]
+            max_range = max(separation, creature.get_melee_engage_distance(), opponent.get_melee_engage_distance())
+            ranges = list(MeleeRange.between(creature.get_melee_combat(opponent).get_min_separation(), max_range))
+            change = get_range_change(creature, opponent, ranges, ranges.index(separation))
+            # attacks of opportunity are not made, the opponent just lets them through
+            success = 1.0 if change.opportunity_attack else change.success
+            self._range_changes[key] = _RangeChange(change.chance, ranges[change.dest], success)
+        return self._range_changes[key]
+
+    def _group_by_separation(self, side: int, soldiers: np.ndarray) -> Iterable[Tuple[int, int, int, np.ndarray]]:
+        """Split soldiers by their loadout, the loadout of the enemy they are fighting, and their separation"""
+        formation, enemy = self.formations[side], self.formations[1 - side]
+        groups = np.stack([ formation.loadout[soldiers], enemy.loadout[formation.opponent[soldiers]], formation.separation[soldiers] ])
+        keys, group = np.unique(groups, axis=1, return_inverse=True)
+        group = group.reshape(-1)
+        for index, (loadout, enemy_loadout, separation) in enumerate(keys.T.tolist()):
+            yield loadout, enemy_loadout, separation, np.flatnonzero(group == index)
+
+    def is_finished(self) -> bool:
+        return any(formation.is_defeated() for formation in self.formations)
+
+    def get_winner(self) -> Optional[int]:
+        standing = [ side for side, formation in enumerate(self.formations) if not formation.is_defeated() ]
+        return standing[0] if len(standing) == 1 else None
+
+    def assign_engagements(self) -> None:
+        """Pair each soldier without an opponent with the enemy that the fewest soldiers are fighting"""
+        for side, formation in enumerate(self.formations):
+            enemy = self.formations[1 - side]
+            engaged = formation.opponent >= 0
+            lost = engaged & ~enemy.conscious[np.where(engaged, formation.opponent, 0)]
+            formation.opponent[lost | ~formation.conscious] = -1
+
+            free = np.flatnonzero(formation.conscious & (formation.opponent < 0))
+            if len(free) == 0:
+                continue
+            engaged_by = np.bincount(formation.opponent[formation.opponent >= 0], minlength=enemy.size)
+            for count in range(self.max_engagements):
+                targets = np.flatnonzero(enemy.conscious & (engaged_by == count))[:len(free)]
+                engaging = free[:len(targets)]
+                formation.opponent[engaging] = targets
+                formation.separation[engaging] = np.where(
+                    enemy.opponent[targets] == engaging,
+                    enemy.separation[targets],  # already being fought by the enemy, at the separation they are at
+                    self._start_separation[side][formation.loadout[engaging], enemy.loadout[targets]],
+                )
+                engaged_by[targets] += 1
+                free = free[len(targets):]
+                if len(free) == 0:
+                    break
+
+    def next_round(self) -> None:
+        self.assign_engagements()
+
+        attacks, range_changes = [], []
+        for side, formation in enumerate(self.formations):
+            acting = formation.conscious & (self._rng.random(formation.size) < self._act_chance[side][formation.loadout])
+
+            # knocked down soldiers spend their action getting up
+            getting_up = acting & (formation.stance == Stance.Prone.value)
+            formation.stance[getting_up] = formation.get_max_stance()[getting_up]
+
+            engaged = np.flatnonzero(acting & ~getting_up & (formation.opponent >= 0))
+            changing = self._choose_range_changes(side, engaged)
+            attacks.append(engaged[~changing])
+            range_changes.append(engaged[changing])
+
+        # both sides attack at the same time, so soldiers taken out this round still strike back
+        attacked = [ np.zeros(formation.size, dtype=bool) for formation in self.formations ]
+        for side, attackers in enumerate(attacks):
+            attacked[1 - side][self._resolve_attacks(side, attackers)] = True
+
+        # a soldier that is attacked while changing range has to defend instead, as the attack interrupts them
+        for side, soldiers in enumerate(range_changes):
+            formation = self.formations[side]
+            self._resolve_range_changes(side, soldiers[formation.conscious[soldiers] & ~attacked[side][soldiers]])
+        self.rounds += 1
+
+    def _choose_range_changes(self, side: int, soldiers: np.ndarray) -> np.ndarray:
+        """Which of the soldiers try to change range instead of attacking, as in CreatureMind._possibly_change_melee_range()"""
+        changing = np.zeros(len(soldiers), dtype=bool)
+        for loadout, enemy_loadout, separation, selected in self._group_by_separation(side, soldiers):
+            change = self._get_range_change(side, loadout, enemy_loadout, separation)
+            if change.chance > 0:
+                changing[selected] = self._rng.random(len(selected)) < change.chance
+        return changing
+
+    def _resolve_range_changes(self, side: int, soldiers: np.ndarray) -> None:
+        """As in ChangeMeleeRangeAction.resolve()"""
+        formation, enemy = self.formations[side], self.formations[1 - side]
+        for loadout, enemy_loadout, separation, selected in self._group_by_separation(side, soldiers):
+            change = self._get_range_change(side, loadout, enemy_loadout, separation)
+            success = selected[self._rng.random(len(selected)) < change.success]
+            _set_separation(formation, enemy, soldiers[success], change.separation)
+
+    def _resolve_attacks(self, side: int, attackers: np.ndarray) -> np.ndarray:
+        """Resolve attacks, and return the enemy soldiers that were attacked"""
+        formation, enemy = self.formations[side], self.formations[1 - side]
+        defenders = formation.opponent[attackers]
+
+        # resolve the attacks between each pair of loadouts at the same separation together
+        attacked = []
+        for attacker_loadout, defender_loadout, separation, selected in self._group_by_separation(side, attackers):
+            table = self._get_attack_table(side, attacker_loadout, defender_loadout, separation)
+            if table is not None:
+                table.resolve(attackers[selected], defenders[selected], formation, enemy, self._rng)
+                attacked.append(defenders[selected])
+        return np.concatenate(attacked) if len(attacked) > 0 else np.zeros(0, dtype=int)
+
+    def run(self, max_rounds: int = MAX_FORMATION_ROUNDS) -> Optional[int]:
+        """Fight until one of the formations is defeated, and return the index of the winner (None for a draw)"""
+        while not self.is_finished() and self.rounds < max_rounds:
+            self.next_round()
+        return self.get_winner()
+
+if __name__ == '__main__':
+    import sys
+    import time
+    from core.rng import RandomStream
+
+    from defines.units.barbarians import CREATURE_GOBLIN_SPEARMAN
+    from defines.units.feudal import CREATURE_LEVY_SPEARMAN
+
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    rng = RandomStream(seed)
+    formations = [
+        FormationTemplate('Goblin Spearmen', CREATURE_GOBLIN_SPEARMAN).create(size, rng),
+        FormationTemplate('Levy Spearmen', CREATURE_LEVY_SPEARMAN).create(size, rng),
+    ]
+    melee = FormationMelee(*formations, rng)
+
+    start = time.perf_counter()
+    winner = melee.run()
+    elapsed = time.perf_counter() - start
+
+    print(f'{melee.rounds} rounds in {elapsed:.2f}s (seed: {rng.entropy})')
+    for formation in formations:
+        print(f'{formation}: {formation.get_injured_count()} injured')
+    print(f'winner: {formations[winner].name if winner is not None else "none"}')
@@ -0,0 +1,134 @@
+"""
+A uniform grid spatial index for positions on a 2D battlefield.
+
+Space is divided into square cells. Each entity is filed under the cell that contains its position, so finding
+everything within a radius only needs to look at the cells that the radius overlaps, instead of every entity.
+"""
+from __future__ import annotations
+
+import math
+from typing import Any, Callable, Iterable, MutableMapping, NamedTuple, Optional, Tuple
+
+class Position(NamedTuple):
+    x: float
+    y: float
+
+    def distance(self, other: Position) -> float:
+        return math.hypot(other.x - self.x, other.y - self.y)
+
+    def step_toward(self, other: Position, distance: float) -> Position:
+        """Move toward the other position by the given distance, without going past it"""
+        total = self.distance(other)
+        if total <= distance:
+            return other
+        frac = distance / total
+        return Position(self.x + (other.x - self.x) * frac, self.y + (other.y - self.y) * frac)
+
+Cell = Tuple[int, int]
+
+class SpatialGrid:
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self._cells: MutableMapping[Cell, MutableMapping[Any, None]] = {}
+        self._positions: MutableMapping[Any, Position] = {}
+
+        # the range of cells that have ever been occupied, which bounds the search for the nearest entity
+        self._min_cell: Optional[Cell] = None
+        self._max_cell: Optional[Cell] = None
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __contains__(self, entity: Any) -> bool:
+        return entity in self._positions
+
+    def _get_cell(self, position: Position) -> Cell:
+        return math.floor(position.x / self.cell_size), math.floor(position.y / self.cell_size)
+
+    def _add_to_cell(self, entity: Any, cell: Cell) -> None:
+        self._cells.setdefault(cell, {})[entity] = None
+        if self._min_cell is None:
+            self._min_cell = self._max_cell = cell
+        else:
+            self._min_cell = (min(self._min_cell[0], cell[0]), min(self._min_cell[1], cell[1]))
+            self._max_cell = (max(self._max_cell[0], cell[0]), max(self._max_cell[1], cell[1]))
+
+    def _remove_from_cell(self, entity: Any, cell: Cell) -> None:
+        contents = self._cells[cell]
+        del contents[entity]
+        if len(contents) == 0:
+            del self._cells[cell]
+
+    def add(self, entity: Any, position: Position) -> None:
+        if entity in self._positions:
+            raise ValueError(f'{entity} is already in the grid')
+        self._positions[entity] = position
+        self._add_to_cell(entity, self._get_cell(position))
+
+    def remove(self, entity: Any) -> None:
+        position = self._positions.pop(entity)
+        self._remove_from_cell(entity, self._get_cell(position))
+
+    def move(self, entity: Any, position: Position) -> None:
+        prev_cell = self._get_cell(self._positions[entity])
+        cell = self._get_cell(position)
+        self._positions[entity] = position
+        if cell != prev_cell:
+            self._remove_from_cell(entity, prev_cell)
+            self._add_to_cell(entity, cell)
+
+    def get_position(self, entity: Any) -> Position:
+        return self._positions[entity]
+
+    def query_radius(self, centre: Position, radius: float) -> Iterable[Any]:
+        """All of the entities within the radius of the centre"""
+        min_x, min_y = self._get_cell(Position(centre.x - radius, centre.y - radius))
+        max_x, max_y = self._get_cell(Position(centre.x + radius, centre.y + radius))
+        for cx in range(min_x, max_x + 1):
+            for cy in range(min_y, max_y + 1):
+                contents = self._cells.get((cx, cy))
+                if contents is None:
+                    continue
+                for entity in contents:
+                    if centre.distance(self._positions[entity]) <= radius:
+                        yield entity
+
+    def _get_ring(self, centre: Cell, ring: int) -> Iterable[Cell]:
+        cx, cy = centre
+        if ring == 0:
+            yield centre
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield x, cy - ring
+            yield x, cy + ring
+        for y in range(cy - ring + 1, cy + ring):
+            yield cx - ring, y
+            yield cx + ring, y
+
+    def get_nearest(self, centre: Position, predicate: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        """The nearest entity to the centre that satisfies the predicate, searching outward one ring of cells at a time"""
+        if self._min_cell is None:
+            return None
+
+        centre_cell = self._get_cell(centre)
+        max_ring = max(
+            abs(centre_cell[0] - self._min_cell[0]), abs(centre_cell[0] - self._max_cell[0]),
+            abs(centre_cell[1] - self._min_cell[1]), abs(centre_cell[1] - self._max_cell[1]),
+        )
+
+        nearest, nearest_distance = None, math.inf
+        for ring in range(max_ring + 1):
+            # the centre can be anywhere in its cell, so anything in this ring or further is at least this far away
+            if nearest_distance <= (ring - 1) * self.cell_size:
+                break
+            for cell in self._get_ring(centre_cell, ring):
+                contents = self._cells.get(cell)
+                if contents is None:
+                    continue
+                for entity in contents:
+                    if predicate is not None and not predicate(entity):
+                        continue
+                    distance = centre.distance(self._positions[entity])
+                    if distance < nearest_distance:
+                        nearest, nearest_distance = entity, distance
+        return nearest